@@ -0,0 +1,131 @@
+import multiprocessing as mp
+from multiprocessing import shared_memory
+from typing import Dict, List, Optional, Tuple
+
+import numpy as np
+
+from SegmentTable import SegmentTable
+
+# per worker process state, set up once by _init_worker
+_worker_table: Optional[SegmentTable] = None
+_worker_buffers: Dict[str, shared_memory.SharedMemory] = {}
+
+
+def _attach(name: str) -> shared_memory.SharedMemory:
+    if (shm := _worker_buffers.get(name)) is None:
+        shm = shared_memory.SharedMemory(name=name)
+        _worker_buffers[name] = shm
+    return shm
+
+
+def _init_worker(table_name: str, num_segments: int):
+    global _worker_table
+    shm = _attach(table_name)
+    # breakpoints, slopes and intercepts are stored back to back, the table only holds views into the buffer
+    data = np.ndarray((3 * num_segments + 1,), dtype=np.float64, buffer=shm.buf)
+    _worker_table = SegmentTable(data[:num_segments + 1],
+                                 data[num_segments + 1:2 * num_segments + 1],
+                                 data[2 * num_segments + 1:])
+
+
+def _evaluate_chunk(task: Tuple[str, int, str, int, int, int]):
+    in_name, in_offset, out_name, out_offset, start, stop = task
+    n = stop - start
+    xs = np.ndarray((n,), dtype=np.float64, buffer=_attach(in_name).buf, offset=in_offset + 8 * start)
+    ys = np.ndarray((n,), dtype=np.float64, buffer=_attach(out_name).buf, offset=out_offset + 8 * start)
+    _worker_table.evaluate_array(xs, out=ys)
+
+
+class BatchEvaluator:
+    # Evaluates a SegmentTable over large arrays on a process pool. The table, the inputs and the outputs live in
+    # shared memory, only buffer names and slice bounds are sent to the workers.
+    # Arrays allocated with empty() are used in place, any other array is copied into a shared scratch buffer once.
+    def __init__(self, table: SegmentTable, workers: Optional[int] = None, chunks_per_worker: int = 4):
+        assert len(table) > 0, "Cannot evaluate a curve without segments"
+        self.workers = workers or mp.cpu_count()
+        self.chunks_per_worker = chunks_per_worker
+        self.__num_segments = len(table)
+        self.__table_shm = shared_memory.SharedMemory(create=True, size=8 * (3 * len(table) + 1))
+        data = np.ndarray((3 * len(table) + 1,), dtype=np.float64, buffer=self.__table_shm.buf)
+        data[:len(table) + 1] = table.breakpoints
+        data[len(table) + 1:2 * len(table) + 1] = table.slopes
+        data[2 * len(table) + 1:] = table.intercepts
+        del data
+
+        self.__buffers: List[Tuple[shared_memory.SharedMemory, int]] = []
+        self.__scratch: Dict[str, Optional[shared_memory.SharedMemory]] = {"in": None, "out": None}
+        self.__pool = mp.Pool(self.workers, initializer=_init_worker,
+                              initargs=(self.__table_shm.name, self.__num_segments))
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *_):
+        self.close()
+
+    def close(self):
+        if self.__pool is None:
+            return
+        self.__pool.close()
+        self.__pool.join()
+        self.__pool = None
+        for shm in [self.__table_shm, *(shm for shm, _ in self.__buffers), *filter(None, self.__scratch.values())]:
+            try:
+                shm.close()
+            except BufferError:
+                # arrays from empty() are still alive, their memory is released once they are garbage collected
+                pass
+            shm.unlink()
+
+    def empty(self, n: int) -> np.ndarray:
+        # the returned array must not outlive this evaluator
+        shm = shared_memory.SharedMemory(create=True, size=max(8 * n, 1))
+        arr = np.ndarray((n,), dtype=np.float64, buffer=shm.buf)
+        self.__buffers.append((shm, arr.ctypes.data))
+        return arr
+
+    def __locate(self, arr: np.ndarray) -> Optional[Tuple[str, int]]:
+        # find the shared buffer (and the offset into it) that backs arr, if any
+        if arr.dtype != np.float64 or not arr.flags.c_contiguous:
+            return None
+        address = arr.ctypes.data
+        for shm, base in self.__buffers:
+            if base <= address and address + arr.nbytes <= base + shm.size:
+                return shm.name, address - base
+        return None
+
+    def __scratch_array(self, key: str, n: int) -> Tuple[np.ndarray, str]:
+        shm = self.__scratch[key]
+        if shm is None or shm.size < 8 * n:
+            if shm is not None:
+                shm.close()
+                shm.unlink()
+            shm = shared_memory.SharedMemory(create=True, size=max(8 * n, 1))
+            self.__scratch[key] = shm
+        return np.ndarray((n,), dtype=np.float64, buffer=shm.buf), shm.name
+
+    def evaluate(self, xs: np.ndarray, out: Optional[np.ndarray] = None) -> np.ndarray:
+        assert self.__pool is not None, "BatchEvaluator is already closed"
+        xs = np.asarray(xs)
+        n = len(xs)
+        if out is None:
+            out = np.empty(n)
+        assert len(out) == n, "Output must have the same length as the input"
+
+        if (src := self.__locate(xs)) is None:
+            scratch, name = self.__scratch_array("in", n)
+            scratch[:] = xs
+            src = (name, 0)
+        copy_back = None
+        if (dst := self.__locate(out)) is None:
+            copy_back, name = self.__scratch_array("out", n)
+            dst = (name, 0)
+
+        num_chunks = min(n, self.workers * self.chunks_per_worker)
+        bounds = np.linspace(0, n, num_chunks + 1, dtype=np.int64) if num_chunks else []
+        tasks = [(*src, *dst, int(start), int(stop)) for start, stop in zip(bounds[:-1], bounds[1:]) if stop > start]
+        self.__pool.map(_evaluate_chunk, tasks)
+
+        if copy_back is not None:
+            out[:] = copy_back
+        return out
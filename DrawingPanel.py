@@ -1,9 +1,20 @@
+from Layer import Layer, Tail
+from PlotExporter import PlotExporter
 from UIStyle import UIStyle
 from misc import CanvasCoord, LocalCoord, Point, dist_line_point, dist_point_point, Line, float_to_str
-from typing import List, Optional, Literal, Tuple, Callable
+from SegmentTable import SegmentTable
+from SessionJournal import SessionJournal
+from History import Delta, History
+from typing import Deque, Dict, List, Optional, Literal, Tuple, Callable
 import tkinter as tk
+import bisect
+import collections
+import contextlib
+import itertools
+import math
 from enum import Enum, auto
 
+import numpy as np
 from scipy import interpolate
 
 
@@ -19,6 +30,41 @@ class SnapMode(Enum):
         return str(self.name).replace("_", " ")
 
 
+class Batch:
+    # Edits queued by DrawingPanel.batch(), they are validated and applied together when the batch is committed
+    def __init__(self):
+        self.added: List[Point] = []
+        # keyed by id(point), the last move of a point wins
+        self.moved: Dict[int, Tuple[Point, LocalCoord]] = {}
+        self.removed: Dict[int, Point] = {}
+        self.extrapolate_left: Optional[int] = None
+        self.extrapolate_right: Optional[int] = None
+
+    def __is_added(self, p: Point) -> bool:
+        return any(p is q for q in self.added)
+
+    def add(self, loc: LocalCoord) -> Point:
+        p = Point(loc)
+        self.added.append(p)
+        return p
+
+    def move(self, p: Point, loc: LocalCoord):
+        if self.__is_added(p):
+            p.loc = loc
+        else:
+            self.moved[id(p)] = (p, loc)
+
+    def remove(self, p: Point):
+        if self.__is_added(p):
+            self.added = [q for q in self.added if q is not p]
+        else:
+            self.moved.pop(id(p), None)
+            self.removed[id(p)] = p
+
+    def __len__(self):
+        return len(self.added) + len(self.moved) + len(self.removed)
+
+
 class DrawingPanel:
     def __init__(self, canvas: tk.Canvas, style: UIStyle):
         self.canvas = canvas
@@ -28,12 +74,18 @@ class DrawingPanel:
         self.grid_tag = "Grid"
         self.numbers_tag = "Number"
         self.axes_tag = "Axes"
+        self.extrapolate_tag = "Extrapolate"
 
         self.hit_box_extension = 3
+        # segments intersects_line tests at once
+        self.hit_test_chunk = 32
         self.width, self.height = self.canvas.winfo_reqwidth(), self.canvas.winfo_reqheight()
 
         self.zoom_level = 5
         self.num_zooms = 1
+        # zooming only scales the drawn items, the exact redraw follows once the wheel stopped for this long
+        self.zoom_redraw_delay = 150
+        self.__zoom_redraw_id = None
         self.__grid_spacing = 28
 
         self.snap_dist_points = self.grid_spacing // 4
@@ -41,64 +93,311 @@ class DrawingPanel:
 
         # SYNC WITH INFO PANEL
         self.snap_modes: List[SnapMode] = []
-        # extrapolate left by using the n leftmost points
-        self.__extrapolate_left: int = 2
-        # extrapolate right by using the n rightmost points
-        self.__extrapolate_right: int = 2
-        self.__extrapolate_store = None
+        # curves drawn over each other, each with its own points. Edits go to the active one
+        self.layers: List[Layer] = []
+        self.__layer_keys = itertools.count(1)
+        self.layer = self.add_layer()
+        # grid lines in view as (index, item) where the index counts grid lines from the origin
+        self.__grid_lines: Dict[str, Deque[Tuple[int, int]]] = {"X": collections.deque(), "Y": collections.deque()}
+        self.__replaying_history = False
+        # consecutive edits of one drag share this key, so they are undone together
+        self.__drag_id = 0
+        # StreamView drawing live samples on this panel, redrawn with the canvas
+        self.stream_view = None
 
         self.is_alt_dragging = False
         self.is_panning = False
         self.pan_start = CanvasCoord(-1, -1)
         self.alt_drag_start = CanvasCoord(-1, -1)
         self.origin = CanvasCoord(self.width // 2, self.height // 2)
-        self.__points: List[Point] = []
-
-        self.canvas.bind("<Button-1>", self.on_button1_click)
-        self.canvas.bind("<ButtonRelease-1>", self.on_button_release)
 
-        self.canvas.bind("<Control-Button-1>", self.on_drag)
-        self.canvas.bind("<Alt-Button-1>", self.on_alt_drag)
-
-        self.canvas.bind("<Button-2>", self.on_drag)
-        self.canvas.bind("<ButtonRelease-2>", self.on_button_release)
-        self.canvas.bind("<B2-Motion>", self.on_panning)
-        self.canvas.bind("<Button-3>", self.on_button3_click)
-        self.canvas.bind("<B3-Motion>", self.on_button3_click)
-
-        self.canvas.bind("<Configure>", self.on_resize)
+        # sequence -> handler, kept so the handlers can be rebound (e.g. by PerfMonitor)
+        self.bindings: Dict[str, Callable] = {
+            "<Button-1>": self.on_button1_click,
+            "<ButtonRelease-1>": self.on_button_release,
+            "<Control-Button-1>": self.on_drag,
+            "<Alt-Button-1>": self.on_alt_drag,
+            "<Button-2>": self.on_drag,
+            "<ButtonRelease-2>": self.on_button_release,
+            "<B2-Motion>": self.on_panning,
+            "<Button-3>": self.on_button3_click,
+            "<B3-Motion>": self.on_button3_click,
+            "<Configure>": self.on_resize,
+        }
+        for sequence, func in self.bindings.items():
+            self.canvas.bind(sequence, func)
         self.dragged_point: Optional[Point] = None
 
     @property
     def extrapolate_left(self):
-        return self.__extrapolate_left
+        return self.layer.extrapolate_left
 
     @extrapolate_left.setter
     def extrapolate_left(self, value):
-        self.__extrapolate_left = value
+        self.layer.extrapolate_left = value
         self.redraw_lines()
 
     @property
     def extrapolate_right(self):
-        return self.__extrapolate_right
+        return self.layer.extrapolate_right
 
     @extrapolate_right.setter
     def extrapolate_right(self, value):
-        self.__extrapolate_right = value
+        self.layer.extrapolate_right = value
         self.redraw_lines()
 
     @property
     def points(self):
-        self.__points.sort()
-        return self.__points
+        return self.layer.points
+
+    @property
+    def history(self) -> Optional[History]:
+        return self.layer.history
+
+    @history.setter
+    def history(self, value: Optional[History]):
+        self.layer.history = value
+
+    @property
+    def journal(self) -> Optional[SessionJournal]:
+        # records every edit of the active layer if a session is open
+        return self.layer.journal
+
+    @journal.setter
+    def journal(self, value: Optional[SessionJournal]):
+        self.layer.journal = value
+
+    @property
+    def num_points(self) -> int:
+        # unlike len(self.points) this never sorts
+        return len(self.layer.point_store)
+
+    @property
+    def y_index(self) -> List[Tuple[float, float]]:
+        return self.layer.y_index
+
+    def add_layer(self, name: Optional[str] = None) -> Layer:
+        # an empty curve, select_layer makes it the active one
+        key = next(self.__layer_keys)
+        layer = Layer(f"Curve {key}" if name is None else name, self.style.layer_style(len(self.layers)),
+                      f"Layer{key}")
+        self.layers.append(layer)
+        return layer
+
+    def select_layer(self, layer: Layer):
+        self.__end_drag()
+        self.layer = layer
+
+    def __end_drag(self):
+        # the dragged point may be gone after the edit, and a new drag must not merge into the undo entry of the old one
+        self.dragged_point = None
+        self.__drag_id += 1
+
+    def set_visible(self, layer: Layer, visible: bool):
+        # hidden items are not rendered, showing them again only redraws them if they went stale meanwhile
+        layer.visible = visible
+        if not visible:
+            self.canvas.itemconfig(layer.tag, state=tk.HIDDEN)
+        elif layer.dirty:
+            self.redraw_layer(layer)
+        else:
+            self.canvas.itemconfig(layer.tag, state=tk.NORMAL)
 
     @property
     def grid_spacing(self):
         return self.__grid_spacing - self.__zoom()
 
+    @property
+    def segment_table(self) -> SegmentTable:
+        return self.layer.segment_table
+
+    def __journal_changed(self):
+        if self.journal.should_compact:
+            table = self.segment_table
+            self.journal.compact(table.breakpoints, table.ys)
+
+    def __record(self, deltas: List[Delta], merge_key: Optional[int] = None, cleared: bool = False):
+        # every edit of __points ends up here once it is applied
+        if self.history is not None and not self.__replaying_history:
+            self.history.record(deltas, merge_key)
+        if self.journal is None:
+            return
+        if cleared:
+            self.journal.clear()
+        elif len(deltas) == 1:
+            old_x, _, new_x, new_y = deltas[0]
+            if math.isnan(old_x):
+                self.journal.add(new_x, new_y)
+            elif math.isnan(new_x):
+                self.journal.remove(old_x)
+            else:
+                self.journal.move(old_x, new_x, new_y)
+        else:
+            # edits of several points are journaled as removes followed by adds, so their order does not matter
+            for old_x, _, _, _ in deltas:
+                if not math.isnan(old_x):
+                    self.journal.remove(old_x)
+            for _, _, new_x, new_y in deltas:
+                if not math.isnan(new_x):
+                    self.journal.add(new_x, new_y)
+        self.__journal_changed()
+
+    def open_session(self, journal: SessionJournal):
+        xs, ys = journal.load()
+        layer = self.layer
+        layer.point_store = [Point(LocalCoord(x, y)) for x, y in zip(xs.tolist(), ys.tolist())]
+        layer.points_changed()
+        layer.y_index_store = None
+        layer.segment_table_store = SegmentTable.from_points(xs, ys)
+        self.journal = journal
+        if self.history is not None:
+            self.history.clear()
+        self.redraw_layer()
+
+    def close_session(self):
+        if self.journal is None:
+            return
+        table = self.segment_table
+        self.journal.close(table.breakpoints, table.ys)
+        self.journal = None
+
+    def add_point(self, p: Point, merge_key: Optional[int] = None):
+        self.layer.point_store.append(p)
+        self.layer.points_changed()
+        self.layer.update_y_index(None, p.loc)
+        self.__record([(math.nan, math.nan, p.loc.x, p.loc.y)], merge_key)
+
+    def __move(self, p: Point, loc: LocalCoord):
+        points = self.points
+        i = bisect.bisect_left(points, p.loc.x, key=lambda q: q.loc.x)
+        if i == len(points) or points[i] is not p:
+            raise ValueError(f"{p} is not a point of {self.layer.name}")
+        layer = self.layer
+        layer.update_y_index(p.loc, loc)
+        p.loc = loc
+        # as long as the point stays between its neighbours the table can be updated in place
+        if layer.segment_table_store is not None and len(points) > 1 and \
+                (i == 0 or points[i - 1].loc.x < loc.x) and (i == len(points) - 1 or loc.x < points[i + 1].loc.x):
+            layer.segment_table_store.move_breakpoint(i, loc.x, loc.y)
+            layer.lines_store = None
+            if layer.moved_breakpoints is not None:
+                layer.moved_breakpoints.add(i)
+        else:
+            self.layer.points_changed()
+
+    def move_point(self, p: Point, loc: LocalCoord, merge_key: Optional[int] = None):
+        old = p.loc
+        self.__move(p, loc)
+        self.__record([(old.x, old.y, loc.x, loc.y)], merge_key)
+
+    def remove_point(self, p: Point):
+        self.layer.point_store.remove(p)
+        self.layer.points_changed()
+        self.layer.update_y_index(p.loc, None)
+        self.__record([(p.loc.x, p.loc.y, math.nan, math.nan)])
+
+    @contextlib.contextmanager
+    def batch(self):
+        # Queue edits and apply them with a single table rebuild and redraw:
+        #     with drawing_panel.batch() as b:
+        #         b.add(LocalCoord(1, 2))
+        # Nothing is applied if the block raises, commit raises ValueError if the result would be invalid.
+        b = Batch()
+        yield b
+        self.__commit(b)
+
+    def __commit(self, b: Batch):
+        layer = self.layer
+        known = {id(p) for p in layer.point_store}
+        if any(key not in known for key in (*b.moved, *b.removed)):
+            raise ValueError("Batch moves or removes a point that is not on this panel")
+        for value in (b.extrapolate_left, b.extrapolate_right):
+            if value is not None and (not isinstance(value, int) or value < 0):
+                raise ValueError(f"Cannot extrapolate with {value} points")
+        kept = [p for p in layer.point_store if id(p) not in b.removed]
+        xs = [b.moved[id(p)][1].x if id(p) in b.moved else p.loc.x for p in kept] + [p.loc.x for p in b.added]
+        if len(set(xs)) != len(xs):
+            raise ValueError("Batch would put two points on the same x value")
+
+        deltas = [(p.loc.x, p.loc.y, math.nan, math.nan) for p in b.removed.values()] + \
+                 [(p.loc.x, p.loc.y, loc.x, loc.y) for p, loc in b.moved.values()] + \
+                 [(math.nan, math.nan, p.loc.x, p.loc.y) for p in b.added]
+        if len(b.moved) == 1 and not b.removed and not b.added:
+            # a single move can keep the segment table
+            self.__move(*next(iter(b.moved.values())))
+        else:
+            # a few edits are cheaper to apply to the y index than rebuilding it
+            if len(b) > 64:
+                layer.y_index_store = None
+            for p in b.removed.values():
+                self.layer.update_y_index(p.loc, None)
+            for p, loc in b.moved.values():
+                self.layer.update_y_index(p.loc, loc)
+                p.loc = loc
+            for p in b.added:
+                self.layer.update_y_index(None, p.loc)
+            layer.point_store = kept + b.added
+            self.layer.points_changed()
+        if b.extrapolate_left is not None:
+            layer.extrapolate_left = b.extrapolate_left
+        if b.extrapolate_right is not None:
+            layer.extrapolate_right = b.extrapolate_right
+        self.__record(deltas)
+
+        for p in b.removed.values():
+            if p.id is not None:
+                self.canvas.delete(p.id)
+        x0, x1 = layer.drawn_x
+        for p in (*(p for p, _ in b.moved.values()), *b.added):
+            if x0 <= p.loc.x < x1:
+                self.redraw_point(p)
+            elif p.id is not None:
+                self.canvas.delete(p.id)
+                p.id = None
+        self.update_lines()
+
+    def __apply_deltas(self, deltas: np.ndarray):
+        # applies rows of (from x, from y, to x, to y) as one batch, NaN means the point does not exist on that side
+        points = self.points
+        with self.batch() as b:
+            for old_x, _, new_x, new_y in deltas.tolist():
+                if math.isnan(old_x):
+                    b.add(LocalCoord(new_x, new_y))
+                    continue
+                p = points[bisect.bisect_left(points, old_x, key=lambda q: q.loc.x)]
+                if math.isnan(new_x):
+                    b.remove(p)
+                else:
+                    b.move(p, LocalCoord(new_x, new_y))
+
+    def undo(self):
+        if self.history is None or (deltas := self.history.undo()) is None:
+            return
+        self.__end_drag()
+        self.__replaying_history = True
+        try:
+            self.__apply_deltas(deltas)
+        finally:
+            self.__replaying_history = False
+
+    def redo(self):
+        if self.history is None or (deltas := self.history.redo()) is None:
+            return
+        self.__end_drag()
+        self.__replaying_history = True
+        try:
+            self.__apply_deltas(deltas)
+        finally:
+            self.__replaying_history = False
+
     def clear_canvas(self):
-        self.points.clear()
-        self.redraw_canvas()
+        layer = self.layer
+        deltas = [(p.loc.x, p.loc.y, math.nan, math.nan) for p in layer.point_store]
+        layer.point_store.clear()
+        layer.points_changed()
+        layer.y_index_store = None
+        self.__record(deltas, cleared=True)
+        self.redraw_layer()
 
     def __zoom(self, factor=None):
         if factor is None:
@@ -120,13 +419,19 @@ class DrawingPanel:
         factor = 1 if event.delta > 0 else -1
         cac = CanvasCoord(event.x, event.y)
         pre_local = self.to_local_coords(cac)
+        pre_scale = self.grid_spacing * self.zoom_level
         self.__zoom(factor)
         post_cac = self.to_canvas_coords(pre_local)  # keep mouse at same local coordinate as before the zoom
         dx = cac.x - post_cac.x
         dy = cac.y - post_cac.y
         self.origin.x += int(dx)
         self.origin.y += int(dy)
-        self.redraw_canvas()
+        # preview by scaling what is drawn around the cursor
+        ratio = (self.grid_spacing * self.zoom_level) / pre_scale
+        self.canvas.scale("all", cac.x, cac.y, ratio, ratio)
+        if self.__zoom_redraw_id is not None:
+            self.canvas.after_cancel(self.__zoom_redraw_id)
+        self.__zoom_redraw_id = self.canvas.after(self.zoom_redraw_delay, self.redraw_canvas)
 
     def on_resize(self, event):
         if event is not None and (event.width != self.width or event.height != self.height):
@@ -137,7 +442,7 @@ class DrawingPanel:
         cac = CanvasCoord(event.x, event.y)
         p = self.intersects_point(cac)
         if p is not None and self.dragged_point is None:
-            self.__points.remove(p)
+            self.remove_point(p)
             self.canvas.delete(p.id)
             self.redraw_lines()
 
@@ -149,6 +454,31 @@ class DrawingPanel:
         cac = CanvasCoord(scaled_x, scaled_y)
         return cac
 
+    def breakpoints_to_canvas(self, start: int = 0, stop: Optional[int] = None, layer: Optional[Layer] = None) \
+            -> Tuple[np.ndarray, np.ndarray]:
+        # to_canvas_coords for the breakpoints [start, stop) of the segment table at once
+        table = (self.layer if layer is None else layer).segment_table
+        scale = self.grid_spacing * self.zoom_level
+        return self.origin.x + table.breakpoints[start:stop] * scale, self.origin.y - table.ys[start:stop] * scale
+
+    def __visible_x(self) -> Tuple[float, float]:
+        # local x range of the canvas, widened so points partly in view are drawn too
+        r = self.style.point_radius
+        return self.to_local_coords(CanvasCoord(-r, 0)).x, self.to_local_coords(CanvasCoord(self.width + r, 0)).x
+
+    @staticmethod
+    def __points_between(layer: Layer, x0: float, x1: float) -> List[Point]:
+        points = layer.points
+        return points[bisect.bisect_left(points, x0, key=lambda q: q.loc.x):
+                      bisect.bisect_left(points, x1, key=lambda q: q.loc.x)]
+
+    def __visible_segments(self, layer: Layer) -> Tuple[int, int]:
+        # range of the indices of the segments overlapping the local x range of the canvas
+        x0, x1 = self.__visible_x()
+        breakpoints = layer.segment_table.breakpoints
+        return max(int(np.searchsorted(breakpoints, x0)) - 1, 0), min(int(np.searchsorted(breakpoints, x1)),
+                                                                      len(breakpoints) - 1)
+
     def to_local_coords(self, cac: CanvasCoord) -> LocalCoord:
         x = (cac.x - self.origin.x) / (self.grid_spacing * self.zoom_level)
         y = (cac.y - self.origin.y) / (self.grid_spacing * self.zoom_level)
@@ -181,20 +511,49 @@ class DrawingPanel:
 
     def redraw_grid(self):
         self.canvas.delete(self.grid_tag)
-        horiz_offset = self.origin.y % self.grid_spacing
-        vert_offset = self.origin.x % self.grid_spacing
-
-        for x in range(0 + vert_offset, self.width, self.grid_spacing):
-            grid = (x - self.origin.x) // self.grid_spacing
-            self.canvas.create_line(x, 0, x, self.height, fill=self.style.grid_color,
-                                    width=1 if grid % 5 != 0 else 2,
-                                    tags=(self.grid_tag + "Y", self.grid_tag))
-
-        for y in range(0 + horiz_offset, self.height, self.grid_spacing):
-            grid = -(y - self.origin.y) // self.grid_spacing
-            self.canvas.create_line(0, y, self.width, y, fill=self.style.grid_color,
-                                    width=1 if grid % 5 != 0 else 2,
-                                    tags=(self.grid_tag + "X", self.grid_tag))
+        spacing = self.grid_spacing
+        for lit, origin, size in (("Y", self.origin.x, self.width), ("X", self.origin.y, self.height)):
+            # the grid lines at canvas positions in [0, size)
+            ks = range(-(origin // spacing), -((origin - size) // spacing))
+            self.__grid_lines[lit] = collections.deque((k, self.__create_grid_line(lit, k)) for k in ks)
+
+    def __create_grid_line(self, lit: Literal["X", "Y"], k: int) -> int:
+        # the k-th vertical (Y) grid line right of the origin or horizontal (X) grid line below it
+        width = 1 if k % 5 != 0 else 2
+        if lit == "Y":
+            x = self.origin.x + k * self.grid_spacing
+            return self.canvas.create_line(x, 0, x, self.height, fill=self.style.grid_color, width=width,
+                                           tags=(self.grid_tag + "Y", self.grid_tag))
+        y = self.origin.y + k * self.grid_spacing
+        return self.canvas.create_line(0, y, self.width, y, fill=self.style.grid_color, width=width,
+                                       tags=(self.grid_tag + "X", self.grid_tag))
+
+    def __pan_grid(self, dx: int, dy: int):
+        # the lines span the canvas, so they only move across it
+        self.canvas.move(self.grid_tag + "Y", 0, -dy)
+        self.canvas.move(self.grid_tag + "X", -dx, 0)
+        spacing = self.grid_spacing
+        created = []
+        for lit, origin, size in (("Y", self.origin.x, self.width), ("X", self.origin.y, self.height)):
+            lines = self.__grid_lines[lit]
+            while lines and origin + lines[0][0] * spacing < 0:
+                self.canvas.delete(lines.popleft()[1])
+            while lines and origin + lines[-1][0] * spacing >= size:
+                self.canvas.delete(lines.pop()[1])
+            if not lines:
+                # moved further than the canvas is wide
+                self.redraw_grid()
+                self.canvas.tag_lower(self.grid_tag)
+                return
+            while origin + (k := lines[0][0] - 1) * spacing >= 0:
+                lines.appendleft((k, self.__create_grid_line(lit, k)))
+                created.append(lines[0][1])
+            while origin + (k := lines[-1][0] + 1) * spacing < size:
+                lines.append((k, self.__create_grid_line(lit, k)))
+                created.append(lines[-1][1])
+        # the grid stays below everything else
+        for item in created:
+            self.canvas.tag_lower(item)
 
     def blink_point(self, p: Point, blink_color="red"):
         if p.id is None:
@@ -203,131 +562,249 @@ class DrawingPanel:
             color = self.canvas.itemcget(p.id, "fill")
             if color == blink_color:
                 return
+            fill = self.layer.style.point_fill
             self.canvas.itemconfig(p.id, fill=blink_color)
-            self.canvas.after(1000, lambda: self.canvas.itemconfig(p.id, fill=self.style.point_fill))
+            self.canvas.after(1000, lambda: self.canvas.itemconfig(p.id, fill=fill))
 
-    def get_extrapolate(self) -> None | List[Tuple[CanvasCoord, CanvasCoord]]:
-        if self.__extrapolate_store is not None:
-            return self.__extrapolate_store
+    def get_extrapolate(self, layer: Optional[Layer] = None) -> None | List[Tuple[CanvasCoord, CanvasCoord]]:
+        layer = self.layer if layer is None else layer
+        if layer.extrapolate_store is not None:
+            return layer.extrapolate_store
 
         # Either segments or points
-        ep_coords: List[Tuple[CanvasCoord, CanvasCoord]] = []
-
-        extrapolate_left = min(self.extrapolate_left, len(self.points))
-        extrapolate_right = min(self.extrapolate_right, len(self.points))
-
-        def to_cac_xy(_points):
-            _cac_x = []
-            _cac_y = []
-            for _p in _points:
-                _cac = self.to_canvas_coords(_p.loc)
-                _cac_x.append(_cac.x)
-                _cac_y.append(_cac.y)
-            return _cac_x, _cac_y
-
-        def extrapolate(_xs, func):
-            coords = []
-            _x0 = _xs[0]
-            _y0 = float(func(_x0))
-            for i, _x1 in enumerate(_xs[1:]):
-                _y1 = float(func(_x1))
-                coords.append((CanvasCoord(_x0, _y0), CanvasCoord(_x1, _y1)))
-                _y0 = _y1
-                _x0 = _x1
-            return coords
+        ep_coords: List[Tuple[CanvasCoord, CanvasCoord]] = self.__tail_coords(layer, "left") + \
+            self.__tail_coords(layer, "right")
 
-        # if we only extrapolate 1 segment (2 Points) don't use scipy:
-        if extrapolate_left == 2:
-            # get leftmost two points (self.points are always ordered)
-            line = Line(self.points[0].loc, self.points[1].loc)
-            f = line.get_function()
-            # the location of the left border of the x-axis
-            loc = self.to_local_coords(CanvasCoord(0, self.origin.y))
-            loc.y = f(loc.x)
-            cac0 = self.to_canvas_coords(loc)
-            cac1 = self.to_canvas_coords(line.p0)
-            ep_coords.append((cac0, cac1))
-        elif extrapolate_left > 2:
-            cac_x, cac_y = to_cac_xy(self.points[:self.extrapolate_left])
-            # extrapolate each pixel on the canvas left of leftmost point
-            xs = range(0, int(cac_x[0]) - 1)
-            if xs.start < xs.stop:
-                f = interpolate.interp1d(cac_x, cac_y, kind="quadratic", fill_value="extrapolate", copy=False,
-                                         assume_sorted=True)
-                extr = extrapolate(xs, f)
-                # make the extrapolated points connect to the leftmost point
-                leftmost_point = CanvasCoord(int(cac_x[0]), int(cac_y[0]))
-                rightmost_extr_point = extr[-1][1]
-                extr.append((leftmost_point, rightmost_extr_point))
-                ep_coords += extr
-        if extrapolate_right == 2:
-            line = Line(self.points[-2].loc, self.points[-1].loc)
-            f = line.get_function()
-            loc = self.to_local_coords(CanvasCoord(self.width, self.origin.y))
-            loc.y = f(loc.x)
-            cac0 = self.to_canvas_coords(loc)
-            cac1 = self.to_canvas_coords(line.p1)
-            ep_coords.append((cac0, cac1))
-        elif extrapolate_right > 2:
-            cac_x, cac_y = to_cac_xy(self.points[-self.extrapolate_right:])
-            # extrapolate each pixel on the canvas right of rightmost point
-            xs = range(int(cac_x[-1]), self.width)
-            if xs.start < xs.stop:
-                f = interpolate.interp1d(cac_x, cac_y, kind="quadratic", fill_value="extrapolate", copy=False,
-                                         assume_sorted=True)
-                ep_coords += extrapolate(xs, f)
-
-        self.__extrapolate_store = ep_coords
+        layer.extrapolate_store = ep_coords
 
         return ep_coords
 
-    def redraw_lines(self):
-        self.canvas.delete(Line.tag())
-        self.__extrapolate_store = None
-        lines = self.get_lines()
-        for line in lines:
-            cac0: CanvasCoord = self.to_canvas_coords(line.p0)
-            cac1: CanvasCoord = self.to_canvas_coords(line.p1)
-            line.id = self.canvas.create_line(cac0.x, cac0.y, cac1.x, cac1.y, smooth=True, splinesteps=1,
-                                              width=self.style.segment_width,
-                                              fill=self.style.default_segment_fill,
-                                              tags=Line.tag())
-
-        def draw_extrapolate(cac0, cac1):
-            _id = self.canvas.create_line(cac0.x, cac0.y, cac1.x, cac1.y, smooth=True, splinesteps=1,
-                                          width=self.style.segment_width,
-                                          fill=self.style.extrapolate_segment_fill,
-                                          tags=(Line.tag()))
-
-        if (res := self.get_extrapolate()) is not None:
-            for val in res:
-                draw_extrapolate(*val)
+    @staticmethod
+    def __tail_points(layer: Layer, side: Literal["left", "right"]) -> int:
+        return min(layer.extrapolate_left if side == "left" else layer.extrapolate_right, len(layer.points))
+
+    def __tail_columns(self, layer: Layer, side: Literal["left", "right"]) -> range:
+        # extrapolate each pixel on the canvas left of the leftmost or right of the rightmost point
+        if side == "left":
+            return range(0, int(self.to_canvas_coords(layer.points[0].loc).x) - 1)
+        return range(int(self.to_canvas_coords(layer.points[-1].loc).x), self.width)
+
+    def __tail_coords(self, layer: Layer, side: Literal["left", "right"], columns: Optional[range] = None) \
+            -> List[Tuple[CanvasCoord, CanvasCoord]]:
+        # the extrapolation on one side. Beyond two points there is a segment per pixel column, if columns are given
+        # only for those and without the segment joining the leftmost point
+        n = self.__tail_points(layer, side)
+        points = layer.points
+        # if we only extrapolate 1 segment (2 Points) don't use scipy:
+        if n == 2:
+            # the outermost segment of the table is the line through the outermost two points
+            table = layer.segment_table
+            i = 0 if side == "left" else -1
+            # the location of the border of the x-axis
+            loc = self.to_local_coords(CanvasCoord(0 if side == "left" else self.width, self.origin.y))
+            loc.y = float(table.slopes[i] * loc.x + table.intercepts[i])
+            return [(self.to_canvas_coords(loc), self.to_canvas_coords(points[i].loc))]
+        if n < 2:
+            return []
+        xs = self.__tail_columns(layer, side) if columns is None else columns
+        if len(xs) < 2:
+            return []
+        cacs = [self.to_canvas_coords(p.loc) for p in (points[:n] if side == "left" else points[-n:])]
+        f = interpolate.interp1d([cac.x for cac in cacs], [cac.y for cac in cacs], kind="quadratic",
+                                 fill_value="extrapolate", copy=False, assume_sorted=True)
+        ys = f(xs).tolist()
+        coords = [(CanvasCoord(x0, y0), CanvasCoord(x1, y1)) for x0, y0, x1, y1 in zip(xs, ys, xs[1:], ys[1:])]
+        if side == "left" and columns is None:
+            # make the extrapolated points connect to the leftmost point
+            coords.append((CanvasCoord(int(cacs[0].x), int(cacs[0].y)), coords[-1][1]))
+        return coords
+
+    def __create_segments(self, layer: Layer, start: int, stop: int):
+        if start >= stop:
+            return
+        cac_xs, cac_ys = self.breakpoints_to_canvas(start, stop + 1, layer)
+        for k, x0, y0, x1, y1 in zip(range(start, stop), cac_xs[:-1].tolist(), cac_ys[:-1].tolist(),
+                                     cac_xs[1:].tolist(), cac_ys[1:].tolist()):
+            if k not in layer.line_ids:
+                layer.line_ids[k] = self.canvas.create_line(x0, y0, x1, y1, smooth=True, splinesteps=1,
+                                                            width=layer.style.segment_width,
+                                                            fill=layer.style.default_segment_fill,
+                                                            tags=layer.tags(Line.tag()))
+
+    def redraw_lines(self, layer: Optional[Layer] = None):
+        layer = self.layer if layer is None else layer
+        if not layer.visible:
+            layer.dirty = True
+            return
+        self.canvas.delete(layer.tag + Line.tag())
+        layer.extrapolate_store = None
+        layer.line_ids = {}
+        layer.drawn_segments = self.__visible_segments(layer)
+        self.__create_segments(layer, *layer.drawn_segments)
+        layer.moved_breakpoints = set()
+        self.redraw_extrapolate(layer)
+
+    def redraw_extrapolate(self, layer: Optional[Layer] = None):
+        layer = self.layer if layer is None else layer
+        if not layer.visible:
+            layer.dirty = True
+            return
+        self.canvas.delete(layer.tag + self.extrapolate_tag)
+        layer.extrapolate_store = None
+        layer.tails = {}
+        self.__redraw_tail(layer, "left")
+        self.__redraw_tail(layer, "right")
 
         # make sure points are always on top!
         self.canvas.tag_raise(Point.tag())
 
-    def redraw_points(self):
-        self.canvas.delete(Point.tag())
-        for p in self.points:
-            self.redraw_point(p)
-
-    def redraw_point(self, p: Point):
+    def __draw_extrapolate(self, layer: Layer, cac0: CanvasCoord, cac1: CanvasCoord) -> int:
+        return self.canvas.create_line(cac0.x, cac0.y, cac1.x, cac1.y, smooth=True, splinesteps=1,
+                                       width=layer.style.segment_width,
+                                       fill=layer.style.extrapolate_segment_fill,
+                                       tags=layer.tags(Line.tag(), self.extrapolate_tag))
+
+    def __redraw_tail(self, layer: Layer, side: Literal["left", "right"]):
+        if (tail := layer.tails.get(side)) is not None and tail.items:
+            self.canvas.delete(*tail.items)
+        coords = self.__tail_coords(layer, side)
+        tail = layer.tails[side] = Tail(int(coords[0][0].x) if coords else 0)
+        tail.items.extend(self.__draw_extrapolate(layer, cac0, cac1) for cac0, cac1 in coords)
+
+    def __pan_tail(self, layer: Layer, side: Literal["left", "right"], dx: int):
+        # the items were moved along, only the end at the canvas edge has to follow
+        tail = layer.tails.get(side)
+        n = self.__tail_points(layer, side)
+        if tail is None or n < 2:
+            return
+        if n == 2 and len(tail.items) == 1:
+            (cac0, cac1), = self.__tail_coords(layer, side)
+            self.canvas.coords(tail.items[0], cac0.x, cac0.y, cac1.x, cac1.y)
+            return
+        tail.first += dx
+        columns = self.__tail_columns(layer, side)
+        if n > 2 and len(columns) >= 2 and len(tail.items) >= 2:
+            if side == "left" and tail.first + len(tail.items) - 1 == columns.stop - 1:
+                # the last item joins the leftmost point
+                while tail.first < columns.start:
+                    self.canvas.delete(tail.items.popleft())
+                    tail.first += 1
+                if tail.first > columns.start:
+                    coords = self.__tail_coords(layer, side, range(columns.start, tail.first + 1))
+                    tail.items.extendleft(self.__draw_extrapolate(layer, cac0, cac1) for cac0, cac1 in reversed(coords))
+                    tail.first = columns.start
+                return
+            if side == "right" and tail.first == columns.start:
+                last = tail.first + len(tail.items)
+                while last > columns.stop - 1:
+                    self.canvas.delete(tail.items.pop())
+                    last -= 1
+                if last < columns.stop - 1:
+                    coords = self.__tail_coords(layer, side, range(last, columns.stop))
+                    tail.items.extend(self.__draw_extrapolate(layer, cac0, cac1) for cac0, cac1 in coords)
+                return
+        # the tail appeared, vanished or its point crossed the canvas edge
+        self.__redraw_tail(layer, side)
+
+    def update_lines(self, layer: Optional[Layer] = None):
+        # like redraw_lines, but if points were only moved in place just their adjacent segments are updated
+        layer = self.layer if layer is None else layer
+        if layer.moved_breakpoints is None or not layer.visible:
+            self.redraw_lines(layer)
+            return
+        moved, layer.moved_breakpoints = layer.moved_breakpoints, set()
+        if not moved:
+            return
+        n = len(layer.segment_table.breakpoints)
+        lo, hi = self.__visible_segments(layer)
+        for k in {k for i in moved for k in (i - 1, i) if 0 <= k < n - 1}:
+            if (item := layer.line_ids.get(k)) is not None:
+                cac_xs, cac_ys = self.breakpoints_to_canvas(k, k + 2, layer)
+                self.canvas.coords(item, cac_xs[0], cac_ys[0], cac_xs[1], cac_ys[1])
+            elif lo <= k < hi:
+                # moved into view
+                self.__create_segments(layer, k, k + 1)
+                self.canvas.tag_raise(Point.tag())
+        # the extrapolation only depends on the outermost points
+        if any(i < layer.extrapolate_left or i >= n - layer.extrapolate_right for i in moved):
+            self.redraw_extrapolate(layer)
+
+    def redraw_points(self, layer: Optional[Layer] = None):
+        layer = self.layer if layer is None else layer
+        if not layer.visible:
+            layer.dirty = True
+            return
+        self.canvas.delete(layer.tag + Point.tag())
+        for p in self.__points_between(layer, *layer.drawn_x):
+            p.id = None
+        layer.drawn_x = self.__visible_x()
+        for p in self.__points_between(layer, *layer.drawn_x):
+            self.redraw_point(p, layer)
+
+    def redraw_layer(self, layer: Optional[Layer] = None):
+        layer = self.layer if layer is None else layer
+        self.redraw_points(layer)
+        self.redraw_lines(layer)
+        if layer.visible:
+            layer.dirty = False
+
+    def __pan_points(self, layer: Layer):
+        (x0, x1), (new_x0, new_x1) = layer.drawn_x, self.__visible_x()
+        layer.drawn_x = (new_x0, new_x1)
+        for p in itertools.chain(self.__points_between(layer, x0, min(x1, new_x0)),
+                                 self.__points_between(layer, max(x0, new_x1), x1)):
+            if p.id is not None:
+                self.canvas.delete(p.id)
+                p.id = None
+        for p in itertools.chain(self.__points_between(layer, new_x0, min(new_x1, x0)),
+                                 self.__points_between(layer, max(new_x0, x1), new_x1)):
+            self.redraw_point(p, layer)
+
+    def __pan_segments(self, layer: Layer):
+        (lo, hi), (new_lo, new_hi) = layer.drawn_segments, self.__visible_segments(layer)
+        layer.drawn_segments = (new_lo, new_hi)
+        for k in itertools.chain(range(lo, min(hi, new_lo)), range(max(lo, new_hi), hi)):
+            if (item := layer.line_ids.pop(k, None)) is not None:
+                self.canvas.delete(item)
+        self.__create_segments(layer, new_lo, min(new_hi, lo))
+        self.__create_segments(layer, max(new_lo, hi), new_hi)
+
+    def __pan_layer(self, layer: Layer, dx: int):
+        if not layer.visible:
+            # its hidden items were moved along, but nothing entered or left the view
+            layer.dirty = True
+            return
+        self.__pan_points(layer)
+        if layer.moved_breakpoints is None:
+            self.redraw_lines(layer)
+            return
+        self.__pan_segments(layer)
+        layer.extrapolate_store = None
+        self.__pan_tail(layer, "left", dx)
+        self.__pan_tail(layer, "right", dx)
+
+    def redraw_point(self, p: Point, layer: Optional[Layer] = None):
+        layer = self.layer if layer is None else layer
+        if not layer.visible:
+            layer.dirty = True
+            return
         cac = self.to_canvas_coords(p.loc)
         if p.id is not None:
             self.canvas.delete(p.id)
 
-        id_ = self.canvas.create_oval(cac.x - self.style.point_radius,
-                                      cac.y - self.style.point_radius,
-                                      cac.x + self.style.point_radius,
-                                      cac.y + self.style.point_radius, fill=self.style.point_fill, tags=Point.tag())
+        style = layer.style
+        id_ = self.canvas.create_oval(cac.x - style.point_radius,
+                                      cac.y - style.point_radius,
+                                      cac.x + style.point_radius,
+                                      cac.y + style.point_radius, fill=style.point_fill, tags=layer.tags(Point.tag()))
         p.id = id_
 
     def redraw_axes(self):
         self.canvas.delete(self.axes_tag)
         self.canvas.create_line(0, self.origin.y, self.width, self.origin.y, fill=self.style.axes_color, width=2,
-                                tags=self.axes_tag)
+                                tags=(self.axes_tag + "X", self.axes_tag))
         self.canvas.create_line(self.origin.x, 0, self.origin.x, self.height, fill=self.style.axes_color, width=2,
-                                tags=self.axes_tag)
+                                tags=(self.axes_tag + "Y", self.axes_tag))
 
     def on_drag(self, event):
         self.is_panning = True
@@ -342,9 +819,9 @@ class DrawingPanel:
             cac = CanvasCoord(event.x, event.y)
             if (res := self.snap_and_verify(cac)) is None:
                 return
-            self.dragged_point.loc = res[1]
+            self.move_point(self.dragged_point, res[1], merge_key=self.__drag_id)
             self.redraw_point(self.dragged_point)
-            self.redraw_lines()
+            self.update_lines()
         elif self.is_panning:
             self.on_panning(event)
         elif self.is_alt_dragging:
@@ -353,10 +830,31 @@ class DrawingPanel:
     def on_panning(self, event):
         dx = event.x - self.pan_start.x
         dy = event.y - self.pan_start.y
+        self.pan_start = CanvasCoord(event.x, event.y)
+        self.pan(dx, dy)
+
+    def pan(self, dx: int, dy: int):
+        # A pan only translates, so everything drawn is moved at once and only what enters or leaves the view through
+        # its edges is created or deleted
         self.origin.x += dx
         self.origin.y += dy
-        self.pan_start = CanvasCoord(event.x, event.y)
-        self.redraw_canvas()
+        if self.__zoom_redraw_id is not None or not self.__grid_lines["X"]:
+            # what is drawn is only a zoom preview, or nothing is drawn yet
+            self.redraw_canvas()
+            return
+        if dx == 0 and dy == 0:
+            return
+        self.canvas.move("all", dx, dy)
+        self.__pan_grid(dx, dy)
+        self.canvas.move(self.axes_tag + "X", -dx, 0)
+        self.canvas.move(self.axes_tag + "Y", 0, -dy)
+        # the numbers stick to the canvas edges while the axes are out of view, there are only a few anyway
+        self.redraw_numbers()
+        self.canvas.tag_raise(self.numbers_tag, self.axes_tag)
+        for layer in self.layers:
+            self.__pan_layer(layer, dx)
+        # make sure points are always on top!
+        self.canvas.tag_raise(Point.tag())
 
     def on_alt_dragging(self, _):
         pass
@@ -365,10 +863,8 @@ class DrawingPanel:
     def snap_and_verify(self, cac: CanvasCoord) -> Optional[Tuple[CanvasCoord, LocalCoord]]:
         new_cac = cac
         if SnapMode.Closest_Y in self.snap_modes:
-            sp_y = next(self.get_snap_y_points(cac, self.snap_dist_points), None)
-            if sp_y is not None:
-                sp_y_cac = self.to_canvas_coords(sp_y.loc)
-                new_cac.y = sp_y_cac.y
+            if (y := self.get_closest_y(cac, self.snap_dist_points)) is not None:
+                new_cac.y = self.to_canvas_coords(LocalCoord(0, y)).y
 
         def grid_coords(lit: Literal["X", "Y"]) -> List[Tuple[CanvasCoord, CanvasCoord]]:
             # find the coords of the Y or X grid lines and cast them to CanvasCoord
@@ -417,12 +913,8 @@ class DrawingPanel:
         self.is_alt_dragging = False
         self.is_panning = False
 
-    def get_lines(self):
-        lines: List[Line] = []
-        for i, left in enumerate(self.points[:-1]):
-            right: Point = self.points[i + 1]
-            lines.append(Line(left.loc, right.loc))
-        return lines
+    def get_lines(self) -> List[Line]:
+        return self.layer.get_lines()
 
     def intersects_point(self, cac: CanvasCoord) -> Optional[Point]:
         for p in self.points:
@@ -432,24 +924,33 @@ class DrawingPanel:
 
     def intersects_line(self, cac: CanvasCoord, consider_extension: bool = False) -> Optional[Line]:
         dw = self.style.segment_width + self.hit_box_extension
-        lines = self.get_lines()
-        for line in lines:
-            cac0: CanvasCoord = self.to_canvas_coords(line.p0)
-            cac1: CanvasCoord = self.to_canvas_coords(line.p1)
-            if dist_line_point(cac0, cac1, cac) <= dw:
-                return line
-
-            # if consider_extension and (res := self.get_extrapolate()) is not None:
-            #    pass
-            """cac0_l, cac1_l, cac0_r, cac1_r = res
-            if cac0_l and cac1_l and dist_line_point(cac0_l, cac1_l, cac) <= dw:
-                return Line(self.to_local_coords(cac0_l), self.to_local_coords(cac1_l))
-    
-            if cac0_r and cac1_r and dist_line_point(cac0_r, cac1_r, cac) <= dw:
-                return Line(self.to_local_coords(cac0_r), self.to_local_coords(cac1_r))"""
+        table = self.segment_table
+        if len(table) == 0:
+            return None
+        # only segments reaching into the x window of the hit distance can be close enough. dist_line_point against
+        # those, a chunk at a time so dense curves do not allocate more per event
+        lo, hi = table.segment_index(np.array([self.to_local_coords(CanvasCoord(cac.x - dw, 0)).x,
+                                               self.to_local_coords(CanvasCoord(cac.x + dw, 0)).x])).tolist()
+        for start in range(lo, hi + 1, self.hit_test_chunk):
+            cac_xs, cac_ys = self.breakpoints_to_canvas(start, min(start + self.hit_test_chunk, hi + 1) + 1)
+            px, py = np.diff(cac_xs), np.diff(cac_ys)
+            u = np.clip(((cac.x - cac_xs[:-1]) * px + (cac.y - cac_ys[:-1]) * py) / (px * px + py * py), 0, 1)
+            dist = np.hypot(cac_xs[:-1] + u * px - cac.x, cac_ys[:-1] + u * py - cac.y)
+            if len(hits := np.flatnonzero(dist <= dw)) > 0:
+                return table.line(start + int(hits[0]))
+        if consider_extension and (tails := self.get_extrapolate()):
+            # the tails run from left to right, one segment per pixel column beyond two points
+            i = bisect.bisect_left(tails, cac.x - dw, key=lambda c: max(c[0].x, c[1].x))
+            while i < len(tails) and min(tails[i][0].x, tails[i][1].x) <= cac.x + dw:
+                cac0, cac1 = tails[i]
+                if cac0 != cac1 and dist_line_point(cac0, cac1, cac) <= dw:
+                    return Line(self.to_local_coords(cac0), self.to_local_coords(cac1))
+                i += 1
+        return None
 
     def on_button1_click(self, event):
         cac = CanvasCoord(event.x, event.y)
+        self.__drag_id += 1
         if (p := self.intersects_point(cac)) is not None:
             self.dragged_point = p
             return
@@ -457,7 +958,7 @@ class DrawingPanel:
         if (res := self.snap_and_verify(cac)) is not None:
             new_loc = res[1]
             p = Point(new_loc)
-            self.__points.append(p)
+            self.add_point(p, merge_key=self.__drag_id)
             self.dragged_point = p
             self.redraw_point(p)
             self.redraw_lines()
@@ -465,10 +966,22 @@ class DrawingPanel:
     def get_x_collision(self, loc: LocalCoord):
         return filter(lambda p: p != self.dragged_point and loc.x == p.loc.x, self.points)
 
-    def get_snap_y_points(self, cac: CanvasCoord, snap_dist):
-        return filter(
-            lambda p: p != self.dragged_point and abs(cac.y - self.to_canvas_coords(p.loc).y) <= snap_dist,
-            self.points)
+    def get_closest_y(self, cac: CanvasCoord, snap_dist) -> Optional[float]:
+        # local y of the point closest to cac in y, if it is at most snap_dist away. The dragged point does not count
+        y_index = self.y_index
+        y = self.to_local_coords(cac).y
+        i = bisect.bisect_left(y_index, (y, -math.inf))
+        dragged = (self.dragged_point.loc.y, self.dragged_point.loc.x) if self.dragged_point is not None else None
+        # the nearest entries below and above, skipping the dragged point
+        below = i - 1 if i - 1 < 0 or y_index[i - 1] != dragged else i - 2
+        above = i if i >= len(y_index) or y_index[i] != dragged else i + 1
+        candidates = [y_index[j][0] for j in (below, above) if 0 <= j < len(y_index)]
+        if not candidates:
+            return None
+        closest = min(candidates, key=lambda c: abs(c - y))
+        if abs(closest - y) * self.grid_spacing * self.zoom_level > snap_dist:
+            return None
+        return closest
 
     def closest_grid_point(self, cac: CanvasCoord) -> CanvasCoord:
         x_offset = self.origin.x % self.grid_spacing
@@ -485,9 +998,24 @@ class DrawingPanel:
         min_dist = min([(corner, dist_point_point(corner, cac)) for corner in corners], key=lambda t: t[1])
         return min_dist[0]
 
+    def plot_exporter(self) -> PlotExporter:
+        # the view as it is, for writing it to SVG or PostScript
+        plot = PlotExporter(self.width, self.height, (self.origin.x, self.origin.y), self.grid_spacing,
+                            self.zoom_level, self.style)
+        for layer in self.layers:
+            if layer.visible and len(layer.segment_table) > 0:
+                plot.add_curve(layer.segment_table, layer.style, layer.extrapolate_left, layer.extrapolate_right)
+        return plot
+
     def redraw_canvas(self):
+        if self.__zoom_redraw_id is not None:
+            # this is the exact redraw a zoom was waiting for
+            self.canvas.after_cancel(self.__zoom_redraw_id)
+            self.__zoom_redraw_id = None
         self.redraw_grid()
         self.redraw_axes()
         self.redraw_numbers()
-        self.redraw_points()
-        self.redraw_lines()
+        for layer in self.layers:
+            self.redraw_layer(layer)
+        if self.stream_view is not None:
+            self.stream_view.redraw()
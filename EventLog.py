@@ -0,0 +1,74 @@
+import json
+import time
+from typing import Dict, List, Optional, Tuple
+
+from DrawingPanel import DrawingPanel, SnapMode
+from misc import LocalCoord
+
+
+class EventLog:
+    # Raw input events of a session, so the same gesture sequence can be replayed against DrawingPanel and InfoPanel
+    # (see benchmarks/replay.py). The header holds the state the events start from: view, settings and points.
+    # sequence, seconds since start, type, x, y, num, delta, state, keysym, width, height
+    Event = Tuple[str, float, str, int, int, int, int, int, str, int, int]
+    VERSION = 1
+
+    def __init__(self, header: Optional[Dict] = None, events: Optional[List[Event]] = None):
+        self.header = header or {}
+        self.events: List[EventLog.Event] = events or []
+        self.__start = time.perf_counter()
+
+    @classmethod
+    def start(cls, drawing_panel: DrawingPanel) -> "EventLog":
+        points = drawing_panel.points
+        return cls({
+            "version": cls.VERSION,
+            "width": drawing_panel.width,
+            "height": drawing_panel.height,
+            "origin": [drawing_panel.origin.x, drawing_panel.origin.y],
+            "zoom_level": drawing_panel.zoom_level,
+            "num_zooms": drawing_panel.num_zooms,
+            "snap_modes": [mode.name for mode in drawing_panel.snap_modes],
+            "extrapolate": [drawing_panel.extrapolate_left, drawing_panel.extrapolate_right],
+            "xs": [p.loc.x for p in points],
+            "ys": [p.loc.y for p in points],
+        })
+
+    def apply_header(self, drawing_panel: DrawingPanel):
+        # puts a fresh DrawingPanel into the state the log was recorded from
+        h = self.header
+        drawing_panel.width, drawing_panel.height = h["width"], h["height"]
+        drawing_panel.origin.x, drawing_panel.origin.y = h["origin"]
+        drawing_panel.zoom_level, drawing_panel.num_zooms = h["zoom_level"], h["num_zooms"]
+        drawing_panel.snap_modes = [SnapMode[name] for name in h["snap_modes"]]
+        drawing_panel.extrapolate_left, drawing_panel.extrapolate_right = h["extrapolate"]
+        with drawing_panel.batch() as b:
+            for x, y in zip(h["xs"], h["ys"]):
+                b.add(LocalCoord(x, y))
+        if drawing_panel.history is not None:
+            drawing_panel.history.clear()
+        drawing_panel.redraw_canvas()
+
+    def record(self, sequence: str, event):
+        def to_int(v) -> int:
+            # tkinter reports fields that do not apply to an event as "??"
+            return v if isinstance(v, int) else 0
+
+        # str() of tkinter's EventType is its number, replay_tk needs the name
+        event_type = getattr(event.type, "name", str(event.type))
+        self.events.append((sequence, time.perf_counter() - self.__start, event_type, to_int(event.x),
+                            to_int(event.y), to_int(event.num), to_int(event.delta), to_int(event.state),
+                            event.keysym if event.keysym != "??" else "", to_int(event.width),
+                            to_int(event.height)))
+
+    def write(self, path: str):
+        with open(path, "w") as f:
+            json.dump({"header": self.header, "events": self.events}, f)
+
+    @classmethod
+    def load(cls, path: str) -> "EventLog":
+        with open(path) as f:
+            data = json.load(f)
+        if data["header"].get("version") != cls.VERSION:
+            raise ValueError(f"{path} is not an event log of version {cls.VERSION}")
+        return cls(data["header"], [tuple(e) for e in data["events"]])
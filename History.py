@@ -0,0 +1,80 @@
+import collections
+from typing import Deque, List, Optional, Tuple
+
+import numpy as np
+
+# one row per changed point: old x, old y, new x, new y. NaN coordinates mean the point did not exist before
+# (it was added) or does not exist afterwards (it was removed)
+Delta = Tuple[float, float, float, float]
+
+
+class HistoryEntry:
+    # Python object overhead of an entry, estimated
+    OVERHEAD = 200
+
+    def __init__(self, deltas: np.ndarray, merge_key: Optional[int]):
+        self.deltas = deltas
+        self.merge_key = merge_key
+
+    @property
+    def nbytes(self) -> int:
+        return self.OVERHEAD + self.deltas.nbytes
+
+
+class History:
+    # Undo/redo stack of point deltas. Entries only store the changed points, the oldest entries are dropped once
+    # the stack exceeds max_bytes.
+    def __init__(self, max_bytes: int = 16 * 1024 * 1024):
+        self.max_bytes = max_bytes
+        self.__undo: Deque[HistoryEntry] = collections.deque()
+        self.__redo: List[HistoryEntry] = []
+        self.__nbytes = 0
+
+    @property
+    def nbytes(self) -> int:
+        return self.__nbytes
+
+    def __len__(self):
+        return len(self.__undo)
+
+    def record(self, deltas: List[Delta], merge_key: Optional[int] = None):
+        # Consecutive single point edits with the same merge_key (e.g. all moves of one drag) become one entry
+        if not deltas:
+            return
+        self.__redo.clear()
+        if merge_key is not None and len(deltas) == 1 and self.__undo:
+            last = self.__undo[-1]
+            old_x, old_y, new_x, new_y = deltas[0]
+            if last.merge_key == merge_key and len(last.deltas) == 1 and \
+                    last.deltas[0, 2] == old_x and last.deltas[0, 3] == old_y:
+                last.deltas[0, 2:] = new_x, new_y
+                return
+        entry = HistoryEntry(np.array(deltas, dtype=np.float64).reshape(-1, 4), merge_key)
+        self.__undo.append(entry)
+        self.__nbytes += entry.nbytes
+        while self.__nbytes > self.max_bytes and len(self.__undo) > 1:
+            self.__nbytes -= self.__undo.popleft().nbytes
+
+    def undo(self) -> Optional[np.ndarray]:
+        # the deltas of the undone entry with old and new swapped, ready to be applied
+        if not self.__undo:
+            return None
+        entry = self.__undo.pop()
+        self.__nbytes -= entry.nbytes
+        self.__redo.append(entry)
+        return entry.deltas[:, [2, 3, 0, 1]]
+
+    def redo(self) -> Optional[np.ndarray]:
+        if not self.__redo:
+            return None
+        entry = self.__redo.pop()
+        # redone entries must never merge with new edits
+        entry.merge_key = None
+        self.__undo.append(entry)
+        self.__nbytes += entry.nbytes
+        return entry.deltas
+
+    def clear(self):
+        self.__undo.clear()
+        self.__redo.clear()
+        self.__nbytes = 0
@@ -1,16 +1,21 @@
+import inspect
+import os
 import threading
 import tkinter as tk
-from typing import Dict, Optional, Tuple, Literal
+from typing import Callable, Dict, Optional, Tuple, Literal
 
 from UIStyle import UIStyle
-from misc import CheckBox, CanvasCoord, Point, LocalCoord, transition_bg, hex_to_rgb, float_to_str
+from misc import CheckBox, CanvasCoord, LocalCoord, transition_bg, hex_to_rgb, float_to_str
 
 from DrawingPanel import DrawingPanel, SnapMode
+from PerfMonitor import PerfMonitor
 
 
 class InfoPanel:
-    def __init__(self, canvas: tk.Canvas, drawing_panel: DrawingPanel, style: UIStyle):
+    def __init__(self, canvas: tk.Canvas, drawing_panel: DrawingPanel, style: UIStyle,
+                 perf_monitor: Optional[PerfMonitor] = None):
         self.drawing_panel = drawing_panel
+        self.perf_monitor = perf_monitor
         self.canvas = canvas
         self.style = style
 
@@ -26,6 +31,11 @@ class InfoPanel:
         self.snap_checkboxes: Dict[SnapMode, CheckBox] = self.__init_snap_checkboxes()
         self.__place_snap_checkboxes()
 
+        self.style.init_heading_label(text="Layers", master=self.canvas).grid(row=self.__get_next_row(), column=1,
+                                                                              pady=5)
+        self.layer_menu, self.add_layer_btn, self.layer_visible = self.__init_layers()
+        self.__place_layers()
+
         self.style.init_heading_label(text="Points", master=self.canvas).grid(row=self.__get_next_row(),
                                                                               column=1,
                                                                               pady=5)
@@ -48,14 +58,45 @@ class InfoPanel:
                                                                     state="readonly"), self.style.init_entry(
             master=self.canvas, state="readonly"), self.style.init_entry(master=self.canvas, state="readonly")
 
+        self.val_integral = self.style.init_entry(master=self.canvas, state="readonly")
+        self.val_inverse = self.style.init_entry(master=self.canvas, state="readonly")
+        # f^-1(y) is only computed while this is checked
+        self.show_inverse = self.style.init_checkbox(master=self.canvas)
+        self.show_inverse.configure(command=lambda is_checked: None if is_checked else self.set_readonly_text(
+            self.val_inverse, ""))
         self.__place_coords()
 
-        self.export_btn, self.func_name = self.__init_export_func()
+        self.max_error = self.style.init_entry(master=self.canvas)
+        self.set_text(self.max_error, 0)
+        self.val_error, self.val_segments = self.style.init_entry(master=self.canvas,
+                                                                  state="readonly"), self.style.init_entry(
+            master=self.canvas, state="readonly")
+        self.__place_simplification()
+
+        # range and resolution of lookup-table exports, empty entries stand for the outermost breakpoints and 1024
+        self.lut_min, self.lut_max, self.lut_samples = (self.style.init_entry(master=self.canvas) for _ in range(3))
+        self.__place_sampling()
+
+        self.export_btn, self.func_name, self.exporter, self.export_scope = self.__init_export_func()
+        row = self.__get_next_row()
+        self.style.init_label(master=self.canvas, text="Exporter").grid(row=row, column=0, pady=(5, 0))
+        self.exporter.grid(row=row, column=1, columnspan=2, sticky=tk.N + tk.S + tk.W + tk.E, pady=(5, 0),
+                           padx=(self.padx, self.padx))
+        row = self.__get_next_row()
+        self.style.init_label(master=self.canvas, text="Layers").grid(row=row, column=0, pady=(5, 0))
+        self.export_scope.grid(row=row, column=1, columnspan=2, sticky=tk.N + tk.S + tk.W + tk.E, pady=(5, 0),
+                               padx=(self.padx, self.padx))
         row = self.__get_next_row()
         self.export_btn.grid(row=row, column=2, sticky=tk.N + tk.S + tk.W + tk.E, pady=5, padx=self.padx)
         self.func_name.grid(row=row, column=0, columnspan=2, sticky=tk.N + tk.S + tk.W + tk.E, pady=5,
                             padx=(self.padx, 0))
 
+        # hidden until toggled, only refreshed while visible
+        self.perf_label = self.style.init_label(master=self.canvas, justify=tk.LEFT)
+        self.perf_label.grid(row=self.__get_next_row(), columnspan=3, sticky=tk.W, padx=self.padx, pady=5)
+        self.perf_label.grid_remove()
+        self.__perf_refresh_id: Optional[str] = None
+
         self.canvas.configure(bg=self.style.info_panel_bg_color)
 
     def __get_next_row(self):
@@ -123,6 +164,45 @@ class InfoPanel:
             else:
                 cb.set_checked(False)
 
+    def __init_layers(self):
+        selected_layer = tk.StringVar(master=self.canvas, value=self.drawing_panel.layer.name)
+        layer_menu = self.style.init_option_menu(self.canvas, selected_layer, self.drawing_panel.layer.name)
+        visible = self.style.init_checkbox(master=self.canvas)
+        visible.set_checked(self.drawing_panel.layer.visible)
+
+        def select(name: str):
+            layer = next(layer for layer in self.drawing_panel.layers if layer.name == name)
+            self.drawing_panel.select_layer(layer)
+            # sync with the settings of the active layer
+            visible.set_checked(layer.visible)
+            for entry, value in ((self.extrapolate_left, layer.extrapolate_left),
+                                 (self.extrapolate_right, layer.extrapolate_right)):
+                self.clear_text(entry)
+                self.set_text(entry, value)
+
+        def add(*_):
+            if self.ui_lock.locked():
+                return
+            layer = self.drawing_panel.add_layer()
+            layer_menu["menu"].add_command(label=layer.name, command=tk._setit(selected_layer, layer.name, select))
+            selected_layer.set(layer.name)
+            select(layer.name)
+
+        layer_menu["menu"].entryconfigure(0, command=tk._setit(selected_layer, self.drawing_panel.layer.name, select))
+        visible.configure(command=lambda is_checked: self.drawing_panel.set_visible(self.drawing_panel.layer,
+                                                                                    is_checked))
+        add_btn = self.style.init_button(master=self.canvas)
+        add_btn.configure(text="ADD", command=add)
+        return layer_menu, add_btn, visible
+
+    def __place_layers(self):
+        row = self.__get_next_row()
+        self.layer_menu.grid(row=row, column=0, columnspan=2, sticky=tk.N + tk.S + tk.W + tk.E, padx=(self.padx, 0))
+        self.add_layer_btn.grid(row=row, column=2, sticky=tk.N + tk.S + tk.W + tk.E, padx=self.padx)
+        row = self.__get_next_row()
+        self.style.init_label(master=self.canvas, text="Visible").grid(row=row, column=0, pady=(5, 0))
+        self.layer_visible.grid(row=row, column=1, pady=(5, 0))
+
     def __place_coords(self):
         row = self.__get_next_row()
         self.style.init_label(master=self.canvas, text="x").grid(row=row, column=0)
@@ -132,11 +212,63 @@ class InfoPanel:
         self.val_x.grid(row=row, column=0, sticky=tk.N + tk.S + tk.W + tk.E, pady=(5, 0), padx=(self.padx, 0))
         self.val_y.grid(row=row, column=1, sticky=tk.N + tk.S + tk.W + tk.E, pady=(5, 0), padx=self.padx)
         self.val_fx.grid(row=row, column=2, sticky=tk.N + tk.S + tk.W + tk.E, pady=(5, 0), padx=(0, self.padx))
+        # integral from the leftmost point up to x
+        row = self.__get_next_row()
+        self.style.init_label(master=self.canvas, text="\u222bf(x)").grid(row=row, column=0, pady=(5, 0))
+        self.val_integral.grid(row=row, column=1, columnspan=2, sticky=tk.N + tk.S + tk.W + tk.E, pady=(5, 0),
+                               padx=(self.padx, self.padx))
+        # x of the curve at the y of the cursor
+        row = self.__get_next_row()
+        self.style.init_label(master=self.canvas, text="f\u207b\u00b9(y)").grid(row=row, column=0, pady=(5, 0))
+        self.val_inverse.grid(row=row, column=1, sticky=tk.N + tk.S + tk.W + tk.E, pady=(5, 0), padx=self.padx)
+        self.show_inverse.grid(row=row, column=2, pady=(5, 0))
+
+    def __place_simplification(self):
+        row = self.__get_next_row()
+        self.style.init_label(master=self.canvas, text="Max Error").grid(row=row, column=0)
+        self.style.init_label(master=self.canvas, text="Error").grid(row=row, column=1)
+        self.style.init_label(master=self.canvas, text="#Segments").grid(row=row, column=2)
+        row = self.__get_next_row()
+        self.max_error.grid(row=row, column=0, sticky=tk.N + tk.S + tk.W + tk.E, pady=(5, 0), padx=(self.padx, 0))
+        self.val_error.grid(row=row, column=1, sticky=tk.N + tk.S + tk.W + tk.E, pady=(5, 0), padx=self.padx)
+        self.val_segments.grid(row=row, column=2, sticky=tk.N + tk.S + tk.W + tk.E, pady=(5, 0), padx=(0, self.padx))
+
+    def __place_sampling(self):
+        row = self.__get_next_row()
+        self.style.init_label(master=self.canvas, text="LUT From").grid(row=row, column=0, pady=(5, 0))
+        self.style.init_label(master=self.canvas, text="LUT To").grid(row=row, column=1, pady=(5, 0))
+        self.style.init_label(master=self.canvas, text="#Samples").grid(row=row, column=2, pady=(5, 0))
+        row = self.__get_next_row()
+        self.lut_min.grid(row=row, column=0, sticky=tk.N + tk.S + tk.W + tk.E, pady=(5, 0), padx=(self.padx, 0))
+        self.lut_max.grid(row=row, column=1, sticky=tk.N + tk.S + tk.W + tk.E, pady=(5, 0), padx=self.padx)
+        self.lut_samples.grid(row=row, column=2, sticky=tk.N + tk.S + tk.W + tk.E, pady=(5, 0), padx=(0, self.padx))
+
+    def set_readonly_text(self, entry: tk.Entry, text):
+        entry.configure(state=tk.NORMAL)
+        self.clear_text(entry)
+        self.set_text(entry, text)
+        entry.configure(state="readonly")
 
     def on_motion(self, event):
         x, y = event.x, event.y
         self.update_loc_label(x, y)
 
+    def toggle_perf_monitor(self, *_):
+        if self.perf_monitor is None:
+            return
+        if self.perf_monitor.toggle():
+            self.perf_label.grid()
+            self.__refresh_perf()
+        else:
+            self.perf_label.grid_remove()
+            if self.__perf_refresh_id is not None:
+                self.canvas.after_cancel(self.__perf_refresh_id)
+                self.__perf_refresh_id = None
+
+    def __refresh_perf(self):
+        self.perf_label.configure(text=self.perf_monitor.report())
+        self.__perf_refresh_id = self.canvas.after(250, self.__refresh_perf)
+
     def invalid_entry(self, entry):
         transition_bg(entry, hex_to_rgb(self.style.invalid_color),
                       hex_to_rgb(self.style.accent_color), 10, self.ui_lock)
@@ -182,10 +314,8 @@ class InfoPanel:
             x = enter_x.get()
             y = enter_y.get()
             if (loc := cast(x, y)) is not None:
-                p = Point(loc)
-                self.drawing_panel.points.append(p)
-                self.drawing_panel.redraw_lines()
-                self.drawing_panel.redraw_point(p)
+                with self.drawing_panel.batch() as batch:
+                    batch.add(loc)
 
         enter_x = self.style.init_entry(master=self.canvas)
         self.set_text(enter_x, "x")
@@ -214,52 +344,120 @@ class InfoPanel:
     def update_loc_label(self, x, y):
         cac = CanvasCoord(x, y)
         loc = self.drawing_panel.to_local_coords(cac)
-        new_x, new_y, fx = loc.x, loc.y, None
+        new_x, new_y, fx, integral = loc.x, loc.y, None, None
 
         if (p := self.drawing_panel.dragged_point) is not None or (p := self.drawing_panel.intersects_point(cac)):
             new_x, new_y = p.loc.x, p.loc.y
 
+        # the line hit may be a segment of an extrapolation tail, which the segment table does not know
         if (line := self.drawing_panel.intersects_line(cac, True)) is not None:
             fx = line.get_function()(new_x)
 
-        self.val_x.configure(state=tk.NORMAL)
-        self.clear_text(self.val_x)
-        self.set_text(self.val_x, float_to_str(new_x, self.max_digits))
-        self.val_x.configure(state="readonly")
-
-        self.val_y.configure(state=tk.NORMAL)
-        self.clear_text(self.val_y)
-        self.set_text(self.val_y, float_to_str(new_y, self.max_digits))
-        self.val_y.configure(state="readonly")
+        if len(self.drawing_panel.segment_table) > 0:
+            integral = self.drawing_panel.segment_table.antiderivative(new_x)
 
-        self.val_fx.configure(state=tk.NORMAL)
-        self.clear_text(self.val_fx)
-        self.set_text(self.val_fx, float_to_str(fx, self.max_digits))
-        self.val_fx.configure(state="readonly")
+        self.set_readonly_text(self.val_x, float_to_str(new_x, self.max_digits))
+        self.set_readonly_text(self.val_y, float_to_str(new_y, self.max_digits))
+        self.set_readonly_text(self.val_fx, float_to_str(fx, self.max_digits))
+        self.set_readonly_text(self.val_integral, float_to_str(integral, self.max_digits))
+        if self.show_inverse.get_checked():
+            inverse = self.drawing_panel.segment_table.inverse(new_y) if integral is not None else None
+            self.set_readonly_text(self.val_inverse, float_to_str(inverse, self.max_digits))
 
     def __init_export_func(self):
-        # TODO iterate all children from FunctionExporter and add to dropdown or smth
+        from function_exporters.CompiledFunctionCache import CompiledFunctionCache
+        from function_exporters.FunctionExporter import FunctionExporter
+        # importing the exporters registers them as subclasses of FunctionExporter
         from function_exporters.FunctionExporterPy import FunctionExporterPy
+        from function_exporters.FunctionExporterPyIntegral import FunctionExporterPyIntegral
+        from function_exporters.FunctionExporterPyInverse import FunctionExporterPyInverse
+        from function_exporters.FunctionExporterNumPyInverse import FunctionExporterNumPyInverse
+        from function_exporters.FunctionExporterPyLUT import FunctionExporterPyLUT
+        from function_exporters.FunctionExporterNumPyLUT import FunctionExporterNumPyLUT
+        from function_exporters.FunctionExporterPyProfiled import FunctionExporterPyProfiled
+        from function_exporters.FunctionExporterPyGuided import FunctionExporterPyGuided
+        from function_exporters.FunctionExporterBin import FunctionExporterBin
+
+        exporters = {exporter.name(): exporter for exporter in FunctionExporter.__subclasses__()}
+        selected_exporter = tk.StringVar(master=self.canvas, value=FunctionExporterPy.name())
+        exporter_menu = self.style.init_option_menu(self.canvas, selected_exporter, *exporters)
+
+        # export the active layer, or every layer as a function of its own named after its position
+        scopes = ("Active", "All")
+        selected_scope = tk.StringVar(master=self.canvas, value=scopes[0])
+        scope_menu = self.style.init_option_menu(self.canvas, selected_scope, *scopes)
 
         enter_func_name = self.style.init_entry(master=self.canvas)
         self.set_text(enter_func_name, "FUNCTION IDENTIFIER")
 
+        def parse(entry: tk.Entry, cast: Callable):
+            # None if the entry is empty, marks the entry and raises ValueError if it does not parse
+            text = entry.get().strip()
+            try:
+                return cast(text) if text else None
+            except ValueError:
+                self.invalid_entry(entry)
+                raise
+
         def btn_click(*_):
             if self.ui_lock.locked():
                 return
             func_name = enter_func_name.get()
-            if func_name.isidentifier():
-                s = FunctionExporterPy.to_function(self.drawing_panel.get_lines(), func_name)
-                print(s)
-            else:
+            if not func_name.isidentifier():
                 self.invalid_entry(enter_func_name)
+                return
+            try:
+                max_error = float(self.max_error.get())
+            except ValueError:
+                self.invalid_entry(self.max_error)
+                return
+            try:
+                sampling = {"x_min": parse(self.lut_min, float), "x_max": parse(self.lut_max, float),
+                            "num_samples": parse(self.lut_samples, int)}
+            except ValueError:
+                return
+            exporter = exporters[selected_exporter.get()]
+            # only the keyword arguments the exporter takes, unset ones keep its defaults
+            parameters = inspect.signature(exporter.to_function).parameters
+            options = {k: v for k, v in sampling.items() if v is not None and k in parameters}
+            all_layers = selected_scope.get() == scopes[1]
+            layers = self.drawing_panel.layers if all_layers else [self.drawing_panel.layer]
+            # drop breakpoints the curve can do without before any exporter sees it
+            simplified = [layer.segment_table.simplified(max_error) for layer in layers]
+            self.set_readonly_text(self.val_segments, sum(len(table) for table, _ in simplified))
+            exported = []
+            # the exports deviate from the drawn curves by at most the simplification and the exporter's own error
+            errors = [0.]
+            for i, (table, simplify_error) in enumerate(simplified, 1):
+                if len(table) == 0:
+                    continue
+                name = f"{func_name}_{i}" if all_layers else func_name
+                try:
+                    errors.append(simplify_error + exporter.error(table, **options))
+                    # unchanged curves come from the cache, which also serves FunctionExporter.compiled elsewhere
+                    s = CompiledFunctionCache.default().export(exporter, table, name, **options)
+                    exported.append((name, table, s))
+                except ValueError as e:
+                    # the exporter does not support this curve or these options
+                    print(e)
+                    self.invalid_entry(self.lut_min if options else enter_func_name)
+                    return
+            self.set_readonly_text(self.val_error, float_to_str(max(errors), self.max_digits))
+            for name, table, s in exported:
+                if isinstance(s, bytes):
+                    path = os.path.abspath(f"{name}.wtfseg")
+                    with open(path, "wb") as f:
+                        f.write(s)
+                    print(f"Wrote {len(table)} segments to {path}")
+                else:
+                    print(s)
 
         export_btn = self.style.init_button(master=self.canvas)
         export_btn.configure(text="EXPORT", command=btn_click)
         enter_func_name.bind("<FocusIn>", lambda _: self.clear_text(enter_func_name, "FUNCTION IDENTIFIER"))
         enter_func_name.bind("<FocusOut>", lambda _: self.set_text(enter_func_name, "FUNCTION IDENTIFIER"))
         enter_func_name.bind("<Return>", btn_click)
-        return export_btn, enter_func_name
+        return export_btn, enter_func_name, exporter_menu, scope_menu
 
     def __place_extrapolate_entries(self):
         row = self.__get_next_row()
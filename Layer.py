@@ -0,0 +1,100 @@
+import bisect
+import collections
+from typing import Deque, Dict, List, Optional, Set, Tuple
+
+from History import History
+from SegmentTable import SegmentTable
+from SessionJournal import SessionJournal
+from UIStyle import UIStyle
+from misc import Line, LocalCoord, Point
+
+
+class Tail:
+    # Canvas items of the extrapolation on one side of the points. Beyond two points there is one item per pixel
+    # column and the first one starts at pixel column first, so a pan only adds or deletes items at the canvas edge
+    def __init__(self, first: int = 0):
+        self.first = first
+        self.items: Deque[int] = collections.deque()
+
+
+class Layer:
+    # One curve of a DrawingPanel: its points, the caches derived from them, undo history, extrapolation settings,
+    # style and the canvas items drawn for it. Every item carries the shared tags (e.g. Point.tag()) and the same
+    # tags prefixed with the tag of the layer, so one layer is redrawn or hidden without touching the others
+    def __init__(self, name: str, style: UIStyle, tag: str):
+        self.name = name
+        self.style = style
+        self.tag = tag
+        # hidden layers are neither drawn nor moved along, their items are only hidden
+        self.visible = True
+        # the items no longer match the points or the view, e.g. the layer was edited or panned while hidden
+        self.dirty = False
+        # extrapolate left by using the n leftmost points
+        self.extrapolate_left: int = 2
+        # extrapolate right by using the n rightmost points
+        self.extrapolate_right: int = 2
+        self.history: Optional[History] = History()
+        # records every edit of point_store if a session is open
+        self.journal: Optional[SessionJournal] = None
+        # every mutation of point_store has to go through the *_point methods of DrawingPanel
+        self.point_store: List[Point] = []
+        self.points_sorted = True
+        # derived from point_store, None means dirty
+        self.segment_table_store: Optional[SegmentTable] = None
+        self.lines_store: Optional[List[Line]] = None
+        self.extrapolate_store = None
+        # (y, x) of every point sorted by y for Closest_Y, None means it has to be rebuilt. Single point edits update it
+        # in place, since x values are unique every entry is too
+        self.y_index_store: Optional[List[Tuple[float, float]]] = None
+        # canvas items of the segments by their index, and the breakpoints moved in place since they were drawn.
+        # None means the segments changed structurally and update_lines has to redraw all of them
+        self.line_ids: Dict[int, int] = {}
+        self.moved_breakpoints: Optional[Set[int]] = None
+        # only what is in view is drawn: the local x range points were drawn for, the range of segment indices drawn
+        # and the extrapolation on each side
+        self.drawn_x: Tuple[float, float] = (0., 0.)
+        self.drawn_segments: Tuple[int, int] = (0, 0)
+        self.tails: Dict[str, Tail] = {}
+
+    def tags(self, *tags: str) -> Tuple[str, ...]:
+        return (*tags, self.tag, *(self.tag + tag for tag in tags))
+
+    @property
+    def points(self) -> List[Point]:
+        if not self.points_sorted:
+            # sorting by key compares floats instead of calling Point.__lt__ for every pair
+            self.point_store.sort(key=lambda p: p.loc.x)
+            self.points_sorted = True
+        return self.point_store
+
+    @property
+    def segment_table(self) -> SegmentTable:
+        if self.segment_table_store is None:
+            points = self.points
+            self.segment_table_store = SegmentTable.from_points([p.loc.x for p in points], [p.loc.y for p in points])
+        return self.segment_table_store
+
+    @property
+    def y_index(self) -> List[Tuple[float, float]]:
+        if self.y_index_store is None:
+            self.y_index_store = sorted((p.loc.y, p.loc.x) for p in self.point_store)
+        return self.y_index_store
+
+    def update_y_index(self, old: Optional[LocalCoord], new: Optional[LocalCoord]):
+        if self.y_index_store is None:
+            return
+        if old is not None:
+            del self.y_index_store[bisect.bisect_left(self.y_index_store, (old.y, old.x))]
+        if new is not None:
+            bisect.insort(self.y_index_store, (new.y, new.x))
+
+    def get_lines(self) -> List[Line]:
+        if self.lines_store is None:
+            self.lines_store = self.segment_table.to_lines()
+        return self.lines_store
+
+    def points_changed(self):
+        self.points_sorted = False
+        self.moved_breakpoints = None
+        self.segment_table_store = None
+        self.lines_store = None
@@ -0,0 +1,175 @@
+import collections
+import time
+from typing import Callable, Deque, Dict, List, Optional, Set, Tuple
+
+import numpy as np
+
+from EventLog import EventLog
+from TraceRecorder import TraceRecorder
+
+
+class PerfMonitor:
+    # Rolling latencies of event handlers and redraw methods plus the frame time, i.e. from the first handler of an
+    # event until Tk is idle again (after redrawing the canvas). The timing wrappers are only installed while the
+    # monitor is enabled, otherwise the original callables are bound and the monitor costs nothing.
+    # upper bounds of the histogram buckets in ms, the last bucket takes everything above
+    BUCKETS_MS = (1, 2, 4, 8, 16, 32, 64)
+    FRAME = "frame"
+
+    def __init__(self, window: int = 256):
+        self.window = window
+        self.latencies: Dict[str, Deque[float]] = {}
+        # receives every span while set, see TraceRecorder
+        self.trace: Optional[TraceRecorder] = None
+        # receives every handled event while set
+        self.events: Optional[EventLog] = None
+        self.__enabled_by: Set[str] = set()
+        self.__installed = False
+        self.__bindings: List[Tuple[object, str, str, Callable]] = []
+        # obj, attribute, name, category, original (None if obj did not define the attribute itself)
+        self.__methods: List[Tuple[object, str, str, str, Optional[object]]] = []
+        self.__layers: Dict[str, str] = {}
+        self.__canvas = None
+        self.__frame_start: Optional[float] = None
+        self.__depth = 0
+
+    @property
+    def enabled(self) -> bool:
+        return self.__installed
+
+    def add_binding(self, widget, sequence: str, func: Callable, name: Optional[str] = None):
+        # binds func to sequence on widget, like widget.bind, and times it while enabled
+        name = name or func.__name__
+        self.__bindings.append((widget, sequence, name, func))
+        widget.bind(sequence, self.__timed_handler(widget, sequence, name, func) if self.enabled else func)
+
+    def add_methods(self, obj, names: List[str], prefix: Optional[str] = None, category: str = "method"):
+        # obj may also be a class, e.g. to time static methods
+        for method in names:
+            name = f"{prefix}.{method}" if prefix else method
+            self.__methods.append((obj, method, name, category, vars(obj).get(method)))
+            if self.enabled:
+                setattr(obj, method, self.__timed(name, category, getattr(obj, method)))
+
+    def set_layers(self, canvas, layers: Dict[str, str]):
+        # layer name -> canvas tag, used to count the canvas items per layer
+        self.__canvas = canvas
+        self.__layers = layers
+
+    def enable(self, reason: str = "overlay"):
+        # stays enabled until every reason it was enabled for is disabled again
+        self.__enabled_by.add(reason)
+        if self.__installed:
+            return
+        self.__installed = True
+        for widget, sequence, name, func in self.__bindings:
+            widget.bind(sequence, self.__timed_handler(widget, sequence, name, func))
+        for obj, method, name, category, _ in self.__methods:
+            setattr(obj, method, self.__timed(name, category, getattr(obj, method)))
+
+    def disable(self, reason: str = "overlay"):
+        self.__enabled_by.discard(reason)
+        if not self.__installed or self.__enabled_by:
+            return
+        self.__installed = False
+        for widget, sequence, _, func in self.__bindings:
+            widget.bind(sequence, func)
+        for obj, method, _, _, original in self.__methods:
+            if original is None:
+                # uncovers the method of the class again
+                delattr(obj, method)
+            else:
+                setattr(obj, method, original)
+        self.__frame_start = None
+        self.__depth = 0
+
+    def toggle(self, reason: str = "overlay") -> bool:
+        self.disable(reason) if reason in self.__enabled_by else self.enable(reason)
+        return reason in self.__enabled_by
+
+    def record(self, name: str, seconds: float):
+        if (samples := self.latencies.get(name)) is None:
+            samples = self.latencies[name] = collections.deque(maxlen=self.window)
+        samples.append(seconds)
+
+    def record_span(self, name: str, category: str, start: float, end: float, args: Optional[Dict] = None):
+        # a span the caller timed itself while enabled, e.g. to add args like whether an export came from the cache
+        if not self.enabled:
+            return
+        self.record(name, end - start)
+        if self.trace is not None:
+            self.trace.span(name, category, start, end, args)
+            if self.__depth == 0 and self.__frame_start is None:
+                self.trace.sample()
+
+    def __timed(self, name: str, category: str, func: Callable) -> Callable:
+        def timed(*args, **kwargs):
+            self.__depth += 1
+            start = time.perf_counter()
+            try:
+                return func(*args, **kwargs)
+            finally:
+                end = time.perf_counter()
+                self.__depth -= 1
+                self.record(name, end - start)
+                if self.trace is not None:
+                    self.trace.span(name, category, start, end)
+                    if self.__depth == 0 and self.__frame_start is None:
+                        # outside of a frame, e.g. a button command, otherwise the frame samples once it ended
+                        self.trace.sample()
+
+        return timed
+
+    def __timed_handler(self, widget, sequence: str, name: str, func: Callable) -> Callable:
+        timed = self.__timed(name, "handler", func)
+
+        def handler(event):
+            if self.events is not None:
+                self.events.record(sequence, event)
+            if self.__frame_start is None:
+                # Tk redraws in idle callbacks that were registered before ours, so this ends after the redraw
+                self.__frame_start = time.perf_counter()
+                widget.after_idle(self.__end_frame)
+            return timed(event)
+
+        return handler
+
+    def __end_frame(self):
+        if self.__frame_start is not None:
+            end = time.perf_counter()
+            self.record(self.FRAME, end - self.__frame_start)
+            if self.trace is not None:
+                self.trace.span(self.FRAME, "frame", self.__frame_start, end)
+            self.__frame_start = None
+            if self.trace is not None:
+                self.trace.sample()
+
+    def histogram(self, name: str) -> np.ndarray:
+        samples_ms = np.array(self.latencies.get(name, ())) * 1000
+        return np.bincount(np.searchsorted(self.BUCKETS_MS, samples_ms), minlength=len(self.BUCKETS_MS) + 1)
+
+    def stats(self) -> List[Tuple[str, int, float, float, float]]:
+        # name, number of samples, p50, p95 and max in ms, slowest first
+        result = []
+        for name, samples in self.latencies.items():
+            samples_ms = np.array(samples) * 1000
+            p50, p95 = np.percentile(samples_ms, [50, 95])
+            result.append((name, len(samples_ms), float(p50), float(p95), float(samples_ms.max())))
+        return sorted(result, key=lambda t: t[3], reverse=True)
+
+    def item_counts(self) -> Dict[str, int]:
+        if self.__canvas is None:
+            return {}
+        return {layer: len(self.__canvas.find_withtag(tag)) for layer, tag in self.__layers.items()}
+
+    def report(self, width: int = 38) -> str:
+        bars = " ▁▂▃▄▅▆▇█"
+        name_width = width - 22
+        lines = [f"{'ms':<{name_width}}{'p50':>6}{'p95':>6}{'max':>6} hist"]
+        for name, _, p50, p95, max_ms in self.stats():
+            counts = self.histogram(name)
+            spark = "".join(bars[int(np.ceil(c / counts.max() * (len(bars) - 1)))] for c in counts)
+            lines.append(f"{name[:name_width]:<{name_width}}{p50:>6.1f}{p95:>6.1f}{max_ms:>6.1f} {spark}")
+        counts = [f"{layer} {count}" for layer, count in self.item_counts().items()]
+        lines.append("items: " + ", ".join(counts))
+        return "\n".join(lines)
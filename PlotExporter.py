@@ -0,0 +1,300 @@
+import argparse
+import dataclasses
+import math
+import os
+from typing import IO, Iterator, List, Tuple
+
+import numpy as np
+from scipy import interpolate
+
+from misc import float_to_str, hex_to_rgb
+from SegmentTable import SegmentTable
+from UIStyle import UIStyle
+
+# X11 colors as Tk knows them, for the color names UIStyle uses
+NAMED_COLORS = {"black": (0, 0, 0), "white": (255, 255, 255), "gray": (190, 190, 190), "grey": (190, 190, 190),
+                "yellow": (255, 255, 0), "red": (255, 0, 0)}
+
+
+@dataclasses.dataclass
+class PlotCurve:
+    table: SegmentTable
+    style: UIStyle
+    extrapolate_left: int = 2
+    extrapolate_right: int = 2
+
+
+class SvgWriter:
+    def __init__(self, f: IO[str], width: int, height: int, background: str):
+        self.f = f
+        f.write(f'<svg xmlns="http://www.w3.org/2000/svg" width="{width}" height="{height}" '
+                f'viewBox="0 0 {width} {height}">\n')
+        f.write(f'<rect width="{width}" height="{height}" fill="{background}"/>\n')
+
+    def line(self, x0: float, y0: float, x1: float, y1: float, color: str, width: float):
+        self.f.write(f'<line x1="{x0:.2f}" y1="{y0:.2f}" x2="{x1:.2f}" y2="{y1:.2f}" stroke="{color}" '
+                     f'stroke-width="{width}"/>\n')
+
+    def text(self, x: float, y: float, text: str, color: str, font: Tuple[str, int]):
+        self.f.write(f'<text x="{x:.2f}" y="{y:.2f}" fill="{color}" font-family="{font[0]}" font-size="{font[1]}" '
+                     f'text-anchor="middle" dominant-baseline="central">{text}</text>\n')
+
+    def begin_path(self, color: str, width: float):
+        self.f.write(f'<polyline fill="none" stroke="{color}" stroke-width="{width}" stroke-linejoin="round" '
+                     f'stroke-linecap="round" points="')
+
+    def vertices(self, xs: np.ndarray, ys: np.ndarray):
+        self.f.write(" ".join(f"{x:.2f},{y:.2f}" for x, y in zip(xs.tolist(), ys.tolist())) + " ")
+
+    def end_path(self):
+        self.f.write('"/>\n')
+
+    def close(self):
+        self.f.write("</svg>\n")
+
+
+class PostScriptWriter:
+    # Encapsulated PostScript in canvas coordinates, y is flipped once at the start and back for text.
+    # Paths are stroked every MAX_PATH vertices since interpreters limit their length
+    MAX_PATH = 1000
+
+    def __init__(self, f: IO[str], width: int, height: int, background: str):
+        self.f = f
+        self.__num_vertices = 0
+        f.write(f"%!PS-Adobe-3.0 EPSF-3.0\n%%BoundingBox: 0 0 {width} {height}\n")
+        f.write(f"0 {height} translate 1 -1 scale 1 setlinejoin 1 setlinecap\n")
+        f.write(f"{self.color(background)} setrgbcolor 0 0 {width} {height} rectfill\n")
+
+    @staticmethod
+    def color(color: str) -> str:
+        rgb = hex_to_rgb(color) if color.startswith("#") else NAMED_COLORS.get(color.lower())
+        if rgb is None:
+            raise ValueError(f"Unknown color {color}")
+        return " ".join(f"{c / 255:.3f}" for c in rgb)
+
+    def line(self, x0: float, y0: float, x1: float, y1: float, color: str, width: float):
+        self.f.write(f"{self.color(color)} setrgbcolor {width} setlinewidth "
+                     f"newpath {x0:.2f} {y0:.2f} moveto {x1:.2f} {y1:.2f} lineto stroke\n")
+
+    def text(self, x: float, y: float, text: str, color: str, font: Tuple[str, int]):
+        # the labels are numbers, nothing to escape. Centered like anchor="center" on the canvas
+        self.f.write(f"{self.color(color)} setrgbcolor /Courier findfont {font[1]} scalefont setfont "
+                     f"gsave {x:.2f} {y:.2f} translate 1 -1 scale ({text}) dup stringwidth pop 2 div neg "
+                     f"{-font[1] / 3:.2f} moveto show grestore\n")
+
+    def begin_path(self, color: str, width: float):
+        self.f.write(f"{self.color(color)} setrgbcolor {width} setlinewidth newpath\n")
+        self.__num_vertices = 0
+
+    def vertices(self, xs: np.ndarray, ys: np.ndarray):
+        lines = []
+        for x, y in zip(xs.tolist(), ys.tolist()):
+            if self.__num_vertices == 0:
+                lines.append(f"{x:.2f} {y:.2f} moveto")
+            else:
+                lines.append(f"{x:.2f} {y:.2f} lineto")
+                if self.__num_vertices % self.MAX_PATH == 0:
+                    lines.append("currentpoint stroke moveto")
+            self.__num_vertices += 1
+        self.f.write("\n".join(lines) + "\n")
+
+    def end_path(self):
+        self.f.write("stroke\n")
+
+    def close(self):
+        self.f.write("showpage\n%%EOF\n")
+
+
+class PlotExporter:
+    # Writes grid, axes, numbers and curves the way DrawingPanel draws them to SVG or PostScript, straight from the
+    # segment tables. Nothing of Tk is used, it runs without a display. Only the breakpoints in view are read, a chunk
+    # at a time, and each pixel column keeps just its lowest and highest vertex. So the file stays within about two
+    # vertices per column however many points a curve has, and memory does not grow with them either.
+    def __init__(self, width: int, height: int, origin: Tuple[float, float], grid_spacing: float,
+                 zoom_level: float, style: UIStyle, chunk: int = 1 << 16):
+        self.width = width
+        self.height = height
+        self.origin = origin
+        self.grid_spacing = grid_spacing
+        self.zoom_level = zoom_level
+        self.style = style
+        # breakpoints read at once
+        self.chunk = chunk
+        self.curves: List[PlotCurve] = []
+
+    @staticmethod
+    def fit(tables: List[SegmentTable], width: int, height: int, style: UIStyle, chunk: int = 1 << 16) \
+            -> "PlotExporter":
+        # a view that shows the breakpoints of all tables, zoomed in steps like DrawingPanel so the numbers stay round
+        xs, ys = [], []
+        for table in tables:
+            xs += [float(table.breakpoints[0]), float(table.breakpoints[-1])]
+            for start in range(0, len(table.breakpoints), chunk):
+                chunk_ys = PlotExporter.__ys(table, start, min(start + chunk, len(table.breakpoints)))
+                ys += [float(chunk_ys.min()), float(chunk_ys.max())]
+        x_span, y_span = max(xs) - min(xs), max(ys) - min(ys)
+        # 5% margin on every side
+        scale = 0.9 * min(width / x_span if x_span > 0 else math.inf, height / y_span if y_span > 0 else math.inf)
+        if math.isinf(scale):
+            scale = 28 * 5
+        # zoom levels are 5 * 2^j, grid lines 14 to 28 pixels apart
+        zoom_level = 5 * 2 ** math.floor(math.log2(scale / (14 * 5)))
+        grid_spacing = math.floor(scale / zoom_level)
+        scale = grid_spacing * zoom_level
+        origin = (width / 2 - (min(xs) + max(xs)) / 2 * scale, height / 2 + (min(ys) + max(ys)) / 2 * scale)
+        return PlotExporter(width, height, origin, grid_spacing, zoom_level, style, chunk)
+
+    def add_curve(self, table: SegmentTable, style: UIStyle, extrapolate_left: int = 2, extrapolate_right: int = 2):
+        assert len(table) > 0, "Cannot plot a curve without segments"
+        self.curves.append(PlotCurve(table, style, extrapolate_left, extrapolate_right))
+
+    def write(self, path: str):
+        # PostScript if the path ends in .ps or .eps, else SVG
+        with open(path, "w") as f:
+            postscript = os.path.splitext(path)[1].lower() in (".ps", ".eps")
+            writer_type = PostScriptWriter if postscript else SvgWriter
+            writer = writer_type(f, self.width, self.height, self.style.canvas_bg_color)
+            self.__write_grid(writer)
+            for curve in self.curves:
+                self.__write_curve(writer, curve)
+            writer.close()
+
+    @property
+    def scale(self) -> float:
+        return self.grid_spacing * self.zoom_level
+
+    def __write_grid(self, writer):
+        style = self.style
+        s = self.grid_spacing
+        ox, oy = self.origin
+        # the k-th grid line right of the origin or below it, in [0, size)
+        columns = range(math.ceil(-ox / s), math.ceil((self.width - ox) / s))
+        rows = range(math.ceil(-oy / s), math.ceil((self.height - oy) / s))
+        for k in columns:
+            writer.line(ox + k * s, 0, ox + k * s, self.height, style.grid_color, 2 if k % 5 == 0 else 1)
+        for k in rows:
+            writer.line(0, oy + k * s, self.width, oy + k * s, style.grid_color, 2 if k % 5 == 0 else 1)
+        writer.line(0, oy, self.width, oy, style.axes_color, 2)
+        writer.line(ox, 0, ox, self.height, style.axes_color, 2)
+        for k in columns:
+            if k != 0 and k % 5 == 0:
+                t = float_to_str(k / self.zoom_level)
+                writer.text(ox + k * s, min(max(oy + 15, 15), self.height - 15), t, style.text_color,
+                            style.font_small)
+        for k in rows:
+            if k != 0 and k % 5 == 0:
+                t = float_to_str(-k / self.zoom_level)
+                writer.text(min(max(ox + len(t) * 5, len(t) * 5), self.width - len(t) * 5), oy + k * s, t,
+                            style.text_color, style.font_small)
+
+    @staticmethod
+    def __ys(table: SegmentTable, start: int, stop: int) -> np.ndarray:
+        # y of the breakpoints [start, stop) without building table.ys, e.g. for tables mapped from a file
+        segments = np.minimum(np.arange(start, stop), len(table) - 1)
+        return table.slopes[segments] * table.breakpoints[start:stop] + table.intercepts[segments]
+
+    @staticmethod
+    def __reduce(cx: np.ndarray, cy: np.ndarray) -> Tuple[np.ndarray, np.ndarray]:
+        # the lowest and the highest vertex of every pixel column, in the order of x
+        columns = np.floor(cx)
+        starts = np.flatnonzero(np.concatenate([[True], columns[1:] != columns[:-1]]))
+        stops = np.append(starts[1:], len(cx))
+        # within each column by y
+        order = np.lexsort((cy, columns))
+        low, high = order[starts], order[stops - 1]
+        idx = np.stack([np.minimum(low, high), np.maximum(low, high)], axis=1).ravel()
+        # a column of one vertex has it twice
+        idx = idx[np.concatenate([[True], idx[1:] != idx[:-1]])]
+        return cx[idx], cy[idx]
+
+    def __curve_vertices(self, table: SegmentTable) -> Iterator[Tuple[np.ndarray, np.ndarray]]:
+        # canvas coordinates of the breakpoints of the segments in view, reduced a chunk at a time
+        scale = self.scale
+        ox, oy = self.origin
+        r = self.style.point_radius
+        breakpoints = table.breakpoints
+        start = max(int(np.searchsorted(breakpoints, (-r - ox) / scale)) - 1, 0)
+        stop = min(int(np.searchsorted(breakpoints, (self.width + r - ox) / scale)) + 1, len(breakpoints))
+        # the vertices of the last column of the previous chunk, the column may go on
+        carry_x, carry_y = np.empty(0), np.empty(0)
+        for a in range(start, stop, self.chunk):
+            b = min(a + self.chunk, stop)
+            cx = np.concatenate([carry_x, ox + breakpoints[a:b] * scale])
+            cy = np.concatenate([carry_y, oy - self.__ys(table, a, b) * scale])
+            cx, cy = self.__reduce(cx, cy)
+            if b == stop:
+                yield cx, cy
+                break
+            k = int(np.searchsorted(cx, np.floor(cx[-1])))
+            carry_x, carry_y = cx[k:], cy[k:]
+            yield cx[:k], cy[:k]
+
+    def __tail_vertices(self, curve: PlotCurve, side: str) -> Tuple[np.ndarray, np.ndarray]:
+        # the extrapolation on one side like DrawingPanel draws it: beyond two points a vertex per pixel column from
+        # the quadratic through the outermost points, else the outermost segment
+        table = curve.table
+        num_points = len(table.breakpoints)
+        n = min(curve.extrapolate_left if side == "left" else curve.extrapolate_right, num_points)
+        if n < 2:
+            return np.empty(0), np.empty(0)
+        scale = self.scale
+        ox, oy = self.origin
+        start, stop = (0, n) if side == "left" else (num_points - n, num_points)
+        cx = ox + table.breakpoints[start:stop] * scale
+        cy = oy - self.__ys(table, start, stop) * scale
+        if n == 2:
+            i = 0 if side == "left" else -1
+            edge_x = 0 if side == "left" else self.width
+            edge_y = oy - (table.slopes[i] * (edge_x - ox) / scale + table.intercepts[i]) * scale
+            if side == "left":
+                return np.array([edge_x, cx[0]]), np.array([edge_y, cy[0]])
+            return np.array([cx[-1], edge_x]), np.array([cy[-1], edge_y])
+        if side == "left":
+            columns = np.arange(0, int(cx[0]) - 1, dtype=np.float64)
+        else:
+            columns = np.arange(int(cx[-1]), self.width, dtype=np.float64)
+        if len(columns) < 2:
+            return np.empty(0), np.empty(0)
+        f = interpolate.interp1d(cx, cy, kind="quadratic", fill_value="extrapolate", copy=False, assume_sorted=True)
+        ys = f(columns)
+        if side == "left":
+            # connects to the leftmost point
+            return np.append(columns, int(cx[0])), np.append(ys, int(cy[0]))
+        return columns, ys
+
+    def __write_curve(self, writer, curve: PlotCurve):
+        style = curve.style
+        writer.begin_path(style.default_segment_fill, style.segment_width)
+        for cx, cy in self.__curve_vertices(curve.table):
+            if len(cx) > 0:
+                writer.vertices(cx, cy)
+        writer.end_path()
+        for side in ("left", "right"):
+            cx, cy = self.__tail_vertices(curve, side)
+            if len(cx) >= 2:
+                writer.begin_path(style.extrapolate_segment_fill, style.segment_width)
+                writer.vertices(cx, cy)
+                writer.end_path()
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Plot segment tables written by the Binary exporter to SVG or "
+                                                 "PostScript, without a display")
+    parser.add_argument("tables", nargs="+", help=".wtfseg files, each one a curve")
+    parser.add_argument("-o", "--output", required=True, help="the plot, PostScript if it ends in .ps or .eps")
+    parser.add_argument("--width", type=int, default=800)
+    parser.add_argument("--height", type=int, default=600)
+    args = parser.parse_args()
+
+    from function_exporters.FunctionExporterBin import FunctionExporterBin
+    # mapped, so the curves are read a chunk at a time instead of all at once
+    tables = [FunctionExporterBin.load(path) for path in args.tables]
+    style = UIStyle()
+    plot = PlotExporter.fit(tables, args.width, args.height, style)
+    for i, table in enumerate(tables):
+        plot.add_curve(table, style.layer_style(i))
+    plot.write(args.output)
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,58 @@
+from typing import Tuple
+
+import numpy as np
+
+
+class SampleRing:
+    # Fixed capacity buffer of (x, y) samples, appending beyond the capacity overwrites the oldest samples in place.
+    # Samples are addressed by their sequence number, i.e. the number of samples appended before them, so readers can
+    # tell which samples are new since they last looked and which were evicted meanwhile.
+    def __init__(self, capacity: int):
+        self.capacity = capacity
+        self.xs = np.empty(capacity, dtype=np.float64)
+        self.ys = np.empty(capacity, dtype=np.float64)
+        # sequence number of the next sample
+        self.end = 0
+
+    def __len__(self):
+        return self.end - self.start
+
+    @property
+    def start(self) -> int:
+        # sequence number of the oldest sample still stored
+        return max(0, self.end - self.capacity)
+
+    def extend(self, xs: np.ndarray, ys: np.ndarray):
+        n = len(xs)
+        if n > self.capacity:
+            # only the newest samples would survive anyway
+            self.end += n - self.capacity
+            xs, ys, n = xs[-self.capacity:], ys[-self.capacity:], self.capacity
+        begin = self.end % self.capacity
+        first = min(n, self.capacity - begin)
+        self.xs[begin:begin + first], self.ys[begin:begin + first] = xs[:first], ys[:first]
+        self.xs[:n - first], self.ys[:n - first] = xs[first:], ys[first:]
+        self.end += n
+
+    def get(self, start: int, end: int) -> Tuple[np.ndarray, np.ndarray]:
+        # copies of the samples with sequence numbers in [start, end), clipped to the stored ones
+        start, end = max(start, self.start), min(end, self.end)
+        if start >= end:
+            return np.empty(0), np.empty(0)
+        idx = np.arange(start, end) % self.capacity
+        return self.xs[idx], self.ys[idx]
+
+    def last(self) -> Tuple[float, float]:
+        i = (self.end - 1) % self.capacity
+        return float(self.xs[i]), float(self.ys[i])
+
+    def search(self, x: float) -> int:
+        # sequence number of the first stored sample with an x >= x, assuming the xs increase
+        lo, hi = self.start, self.end
+        while lo < hi:
+            mid = (lo + hi) // 2
+            if self.xs[mid % self.capacity] < x:
+                lo = mid + 1
+            else:
+                hi = mid
+        return lo
@@ -0,0 +1,241 @@
+import dataclasses
+
+from misc import Line, LocalCoord
+from typing import List, Optional, Sequence, Tuple
+
+import numpy as np
+
+
+@dataclasses.dataclass
+class MonotoneRun:
+    # segments first..last (inclusive) are all strictly increasing (sign 1) or decreasing (sign -1)
+    first: int
+    last: int
+    sign: int
+    # sign * y of the breakpoints first..last + 1, ascending
+    keys: np.ndarray
+
+
+class SegmentTable:
+    # Piecewise linear model of a curve. Segment i spans [breakpoints[i], breakpoints[i + 1]] and is
+    # y = slopes[i] * x + intercepts[i]. The first and the last segment are unbounded to the left and right,
+    # exactly like the function FunctionExporterPy emits.
+    def __init__(self, breakpoints: np.ndarray, slopes: np.ndarray, intercepts: np.ndarray,
+                 ys: Optional[np.ndarray] = None):
+        assert len(slopes) == len(intercepts), "Need exactly one intercept per slope"
+        assert len(slopes) == 0 or len(breakpoints) == len(slopes) + 1, "Need exactly one breakpoint more than segments"
+        self.breakpoints = breakpoints
+        self.slopes = slopes
+        self.intercepts = intercepts
+        # the exact y values of the breakpoints if known, else they are derived from the segments on first use
+        self.__ys = ys
+        # areas[i] is the integral from breakpoints[0] to breakpoints[i], built on first use
+        self.__areas: Optional[np.ndarray] = None
+        # strictly monotone runs of segments for the inverse, built on first use
+        self.__runs: Optional[List[MonotoneRun]] = None
+
+    @staticmethod
+    def from_points(xs: Sequence[float], ys: Sequence[float]) -> "SegmentTable":
+        xs = np.asarray(xs, dtype=np.float64)
+        ys = np.asarray(ys, dtype=np.float64)
+        if len(xs) < 2:
+            return SegmentTable(xs.copy(), np.empty(0), np.empty(0), ys.copy())
+        slopes = np.diff(ys) / np.diff(xs)
+        intercepts = ys[:-1] - slopes * xs[:-1]
+        return SegmentTable(xs.copy(), slopes, intercepts, ys.copy())
+
+    @staticmethod
+    def from_lines(lines: List[Line]) -> "SegmentTable":
+        lines = sorted(lines, key=lambda l: l.p0.x)
+        if not lines:
+            return SegmentTable.from_points([], [])
+        xs = [line.p0.x for line in lines] + [lines[-1].p1.x]
+        ys = [line.p0.y for line in lines] + [lines[-1].p1.y]
+        return SegmentTable.from_points(xs, ys)
+
+    def __len__(self):
+        return len(self.slopes)
+
+    def copy(self) -> "SegmentTable":
+        # the same segments in arrays of its own, unaffected by later move_breakpoint calls on this table
+        return SegmentTable(self.breakpoints.copy(), self.slopes.copy(), self.intercepts.copy(), self.ys.copy())
+
+    @property
+    def ys(self) -> np.ndarray:
+        if self.__ys is None:
+            if len(self) == 0:
+                return np.empty(0)
+            ys = np.empty(len(self.breakpoints))
+            ys[:-1] = self.slopes * self.breakpoints[:-1] + self.intercepts
+            ys[-1] = self.slopes[-1] * self.breakpoints[-1] + self.intercepts[-1]
+            self.__ys = ys
+        return self.__ys
+
+    @property
+    def areas(self) -> np.ndarray:
+        if self.__areas is None:
+            areas = np.zeros(len(self.breakpoints))
+            if len(self) > 0:
+                ys = self.ys
+                np.cumsum((ys[:-1] + ys[1:]) / 2 * np.diff(self.breakpoints), out=areas[1:])
+            self.__areas = areas
+        return self.__areas
+
+    def line(self, i: int) -> Line:
+        ys = self.ys
+        return Line(LocalCoord(float(self.breakpoints[i]), float(ys[i])),
+                    LocalCoord(float(self.breakpoints[i + 1]), float(ys[i + 1])))
+
+    def to_lines(self) -> List[Line]:
+        return [self.line(i) for i in range(len(self))]
+
+    def stringify_segment(self, i: int) -> str:
+        return f"lambda x: {float(self.slopes[i])} * x + {float(self.intercepts[i])}"
+
+    def segment_index(self, x):
+        # x on an inner breakpoint belongs to the segment left of it, the outer segments take everything beyond
+        return np.searchsorted(self.breakpoints[1:-1], x, side="left")
+
+    def evaluate(self, x: float) -> float:
+        assert len(self) > 0, "Cannot evaluate a curve without segments"
+        i = self.segment_index(x)
+        return float(self.slopes[i] * x + self.intercepts[i])
+
+    def evaluate_array(self, xs: np.ndarray, out: np.ndarray | None = None) -> np.ndarray:
+        assert len(self) > 0, "Cannot evaluate a curve without segments"
+        idx = self.segment_index(xs)
+        out = np.multiply(self.slopes[idx], xs, out=out)
+        out += self.intercepts[idx]
+        return out
+
+    def simplified(self, max_error: float) -> Tuple["SegmentTable", float]:
+        # Ramer-Douglas-Peucker on the breakpoints, measuring the vertical distance since that is exactly the error
+        # of the exported function. The two outermost segments are kept as they are because they extend to infinity.
+        # Returns the simplified table, always a new one, and the achieved maximum absolute error.
+        n = len(self.breakpoints)
+        if n <= 4:
+            return self.copy(), 0.
+        xs, ys = self.breakpoints, self.ys
+        keep = np.zeros(n, dtype=bool)
+        keep[[0, 1, n - 2, n - 1]] = True
+        stack = [(1, n - 2)]
+        while stack:
+            i, j = stack.pop()
+            if j - i < 2:
+                continue
+            chord = ys[i] + (ys[j] - ys[i]) * (xs[i + 1:j] - xs[i]) / (xs[j] - xs[i])
+            dev = np.abs(ys[i + 1:j] - chord)
+            k = int(np.argmax(dev))
+            if dev[k] > max_error:
+                k += i + 1
+                keep[k] = True
+                stack.append((i, k))
+                stack.append((k, j))
+
+        table = SegmentTable.from_points(xs[keep], ys[keep])
+        # both curves are piecewise linear, so the largest deviation is found at one of the original breakpoints
+        error = float(np.max(np.abs(table.evaluate_array(xs) - ys)))
+        return table, error
+
+    def sampled(self, x_min: float, x_max: float, num_samples: int) -> Tuple[np.ndarray, float]:
+        # The curve at num_samples evenly spaced x from x_min to x_max, for lookup tables that interpolate linearly
+        # between the samples and use the outer segments beyond them. The range has to cover the inner breakpoints.
+        # Returns the samples and the maximum absolute error of such a lookup table.
+        assert len(self) > 0, "Cannot sample a curve without segments"
+        if num_samples < 2 or not x_min < x_max:
+            raise ValueError(f"Cannot sample [{x_min}, {x_max}] with {num_samples} samples")
+        inner = self.breakpoints[1:-1]
+        if len(inner) > 0 and (inner[0] < x_min or inner[-1] > x_max):
+            raise ValueError(f"[{x_min}, {x_max}] does not cover the breakpoints from {inner[0]} to {inner[-1]}")
+        ys = self.evaluate_array(np.linspace(x_min, x_max, num_samples))
+        # both curves are piecewise linear, so the largest deviation is found at one of the breakpoints in range
+        xs = self.breakpoints[(self.breakpoints >= x_min) & (self.breakpoints <= x_max)]
+        t = (xs - x_min) * ((num_samples - 1) / (x_max - x_min))
+        i = np.minimum(t.astype(np.intp), num_samples - 2)
+        error = float(np.max(np.abs(ys[i] + (t - i) * (ys[i + 1] - ys[i]) - self.evaluate_array(xs)), initial=0.))
+        return ys, error
+
+    def antiderivative(self, x: float) -> float:
+        # integral from breakpoints[0] to x, negative left of it. The outer segments are integrated exactly
+        # along their unbounded extension
+        assert len(self) > 0, "Cannot integrate a curve without segments"
+        i = self.segment_index(x)
+        x0 = self.breakpoints[i]
+        y0 = self.ys[i]
+        return float(self.areas[i] + (x - x0) * (2 * y0 + self.slopes[i] * (x - x0)) / 2)
+
+    def antiderivative_array(self, xs: np.ndarray) -> np.ndarray:
+        assert len(self) > 0, "Cannot integrate a curve without segments"
+        idx = self.segment_index(xs)
+        dx = xs - self.breakpoints[idx]
+        return self.areas[idx] + dx * (2 * self.ys[idx] + self.slopes[idx] * dx) / 2
+
+    def integral(self, a: float, b: float) -> float:
+        return self.antiderivative(b) - self.antiderivative(a)
+
+    @property
+    def monotone_runs(self) -> List[MonotoneRun]:
+        if self.__runs is None:
+            runs = []
+            if len(self) > 0:
+                ys = self.ys
+                signs = np.sign(np.diff(ys)).astype(np.int64)
+                starts = np.flatnonzero(np.diff(signs, prepend=0))
+                for first, last in zip(starts.tolist(), (np.append(starts[1:], len(self)) - 1).tolist()):
+                    # flat segments have no inverse
+                    if (sign := int(signs[first])) != 0:
+                        runs.append(MonotoneRun(first, last, sign, sign * ys[first:last + 2]))
+            self.__runs = runs
+        return self.__runs
+
+    @property
+    def is_monotone(self) -> bool:
+        runs = self.monotone_runs
+        return len(runs) == 1 and runs[0].first == 0 and runs[0].last == len(self) - 1
+
+    def __run_segment_index(self, run: MonotoneRun, ys):
+        # like segment_index but over the y values of one run, the outer segments of the table again take
+        # everything beyond their breakpoints. -1 where the run does not cover y
+        keys = ys * run.sign
+        idx = run.first + np.searchsorted(run.keys[1:-1], keys, side="left")
+        # left of the run, only fine if the first segment of the run is the unbounded first segment of the table
+        # and it extends to the correct side
+        outside = (keys < run.keys[0]) if run.first > 0 else np.zeros_like(keys, dtype=bool)
+        if run.last < len(self) - 1:
+            outside |= keys > run.keys[-1]
+        return np.where(outside, -1, idx)
+
+    def inverse(self, y: float) -> Optional[float]:
+        # the smallest x with f(x) = y that lies on a strictly monotone segment, None if there is none
+        for run in self.monotone_runs:
+            if (i := int(self.__run_segment_index(run, y))) >= 0:
+                return float(self.breakpoints[i] + (y - self.ys[i]) / self.slopes[i])
+        return None
+
+    def inverse_array(self, ys: np.ndarray) -> np.ndarray:
+        xs = np.full(np.shape(ys), np.nan)
+        for run in self.monotone_runs:
+            idx = self.__run_segment_index(run, ys)
+            todo = (idx >= 0) & np.isnan(xs)
+            i = idx[todo]
+            xs[todo] = self.breakpoints[i] + (ys[todo] - self.ys[i]) / self.slopes[i]
+        return xs
+
+    def move_breakpoint(self, i: int, x: float, y: float):
+        # Moves breakpoint i without changing the order of the breakpoints. Only the two adjacent segments are
+        # recomputed and the prefix areas right of i are shifted by the change in area.
+        assert 0 <= i < len(self.breakpoints), "Breakpoint index out of range"
+        assert i == 0 or self.breakpoints[i - 1] < x, "Moving a breakpoint must keep the order"
+        assert i == len(self.breakpoints) - 1 or x < self.breakpoints[i + 1], "Moving a breakpoint must keep the order"
+        xs, ys = self.breakpoints, self.ys
+        xs[i] = x
+        ys[i] = y
+        self.__runs = None
+        for k in (i - 1, i):
+            if not 0 <= k < len(self):
+                continue
+            self.slopes[k] = (ys[k + 1] - ys[k]) / (xs[k + 1] - xs[k])
+            self.intercepts[k] = ys[k] - self.slopes[k] * xs[k]
+            if self.__areas is not None:
+                area = (ys[k] + ys[k + 1]) / 2 * (xs[k + 1] - xs[k])
+                self.__areas[k + 1:] += area - (self.__areas[k + 1] - self.__areas[k])
@@ -0,0 +1,150 @@
+import os
+import struct
+from typing import Optional, Tuple
+
+import numpy as np
+
+
+class SessionJournal:
+    # Persists the points of a DrawingPanel in a session directory:
+    #   snapshot.bin: header (magic, generation, n) followed by n float64 xs and n float64 ys
+    #   journal.bin: header (magic, generation) followed by fixed size records of every edit since the snapshot
+    # Points are identified by their x value since no two points may share it. A journal only applies to the
+    # snapshot of the same generation, compact() writes a new snapshot before it starts a new journal, so a crash
+    # in between never replays edits twice. A torn record at the end of the journal is ignored.
+    SNAPSHOT_MAGIC = b"WTFSNAP\0"
+    JOURNAL_MAGIC = b"WTFJRNL\0"
+    SNAPSHOT_HEADER = struct.Struct("<8sQQ")
+    JOURNAL_HEADER = struct.Struct("<8sQ")
+    # op, a, b, c. RECORD_STRUCT is used for writing single records, RECORD for reading the whole journal at once
+    RECORD = np.dtype([("op", "<u1"), ("a", "<f8"), ("b", "<f8"), ("c", "<f8")])
+    RECORD_STRUCT = struct.Struct("<Bddd")
+
+    ADD = 1  # x, y
+    MOVE = 2  # old x, new x, new y
+    REMOVE = 3  # x
+    CLEAR = 4
+
+    def __init__(self, path: str, snapshot_every: int = 10_000):
+        self.path = path
+        self.snapshot_every = snapshot_every
+        os.makedirs(path, exist_ok=True)
+        self.__snapshot_path = os.path.join(path, "snapshot.bin")
+        self.__journal_path = os.path.join(path, "journal.bin")
+        self.__generation = 0
+        self.__num_records = 0
+        self.__journal = None
+
+    @property
+    def should_compact(self) -> bool:
+        return self.__num_records >= self.snapshot_every
+
+    def load(self) -> Tuple[np.ndarray, np.ndarray]:
+        # returns the xs and ys of the session sorted by x and opens the journal for appending
+        xs, ys = np.empty(0), np.empty(0)
+        if os.path.exists(self.__snapshot_path):
+            with open(self.__snapshot_path, "rb") as f:
+                magic, self.__generation, n = self.SNAPSHOT_HEADER.unpack(f.read(self.SNAPSHOT_HEADER.size))
+                if magic != self.SNAPSHOT_MAGIC:
+                    raise ValueError(f"{self.__snapshot_path} is not a session snapshot")
+                data = np.fromfile(f, dtype="<f8", count=2 * n)
+                if len(data) != 2 * n:
+                    raise ValueError(f"{self.__snapshot_path} is truncated")
+            xs, ys = data[:n], data[n:]
+
+        records = self.__read_journal()
+        self.__num_records = len(records)
+        if len(records) > 0:
+            # replaying needs lookups by x, the snapshot part is only turned into a dict if there is a tail at all
+            points = dict(zip(xs.tolist(), ys.tolist()))
+            for op, a, b, c in records.tolist():
+                if op == self.ADD:
+                    points[a] = b
+                elif op == self.MOVE:
+                    points.pop(a, None)
+                    points[b] = c
+                elif op == self.REMOVE:
+                    points.pop(a, None)
+                elif op == self.CLEAR:
+                    points.clear()
+            xs = np.fromiter(points.keys(), dtype=np.float64, count=len(points))
+            ys = np.fromiter(points.values(), dtype=np.float64, count=len(points))
+
+        order = np.argsort(xs, kind="stable")
+        self.__open_journal()
+        return xs[order], ys[order]
+
+    def __read_journal(self) -> np.ndarray:
+        if not os.path.exists(self.__journal_path):
+            return np.empty(0, dtype=self.RECORD)
+        with open(self.__journal_path, "rb") as f:
+            header = f.read(self.JOURNAL_HEADER.size)
+            if len(header) < self.JOURNAL_HEADER.size:
+                return np.empty(0, dtype=self.RECORD)
+            magic, generation = self.JOURNAL_HEADER.unpack(header)
+            if magic != self.JOURNAL_MAGIC:
+                raise ValueError(f"{self.__journal_path} is not a session journal")
+            if generation != self.__generation:
+                # left over from before the last compaction, already part of the snapshot
+                return np.empty(0, dtype=self.RECORD)
+            data = f.read()
+        # drop a torn record at the end
+        usable = len(data) - len(data) % self.RECORD.itemsize
+        return np.frombuffer(data, dtype=self.RECORD, count=usable // self.RECORD.itemsize)
+
+    def __open_journal(self):
+        if self.__journal is not None:
+            self.__journal.close()
+        if self.__num_records == 0:
+            # also covers a stale journal of an older generation
+            with open(self.__journal_path + ".tmp", "wb") as f:
+                f.write(self.JOURNAL_HEADER.pack(self.JOURNAL_MAGIC, self.__generation))
+                f.flush()
+                os.fsync(f.fileno())
+            os.replace(self.__journal_path + ".tmp", self.__journal_path)
+        else:
+            # cut off a torn record so new records stay aligned
+            with open(self.__journal_path, "r+b") as f:
+                f.truncate(self.JOURNAL_HEADER.size + self.__num_records * self.RECORD.itemsize)
+        self.__journal = open(self.__journal_path, "ab")
+
+    def __append(self, op: int, a: float = 0., b: float = 0., c: float = 0.):
+        assert self.__journal is not None, "Call load() before recording edits"
+        self.__journal.write(self.RECORD_STRUCT.pack(op, a, b, c))
+        self.__journal.flush()
+        self.__num_records += 1
+
+    def add(self, x: float, y: float):
+        self.__append(self.ADD, x, y)
+
+    def move(self, old_x: float, x: float, y: float):
+        self.__append(self.MOVE, old_x, x, y)
+
+    def remove(self, x: float):
+        self.__append(self.REMOVE, x)
+
+    def clear(self):
+        self.__append(self.CLEAR)
+
+    def compact(self, xs: np.ndarray, ys: np.ndarray):
+        # writes the current points as the snapshot of the next generation and starts an empty journal for it
+        xs = np.asarray(xs, dtype="<f8")
+        ys = np.asarray(ys, dtype="<f8")
+        with open(self.__snapshot_path + ".tmp", "wb") as f:
+            f.write(self.SNAPSHOT_HEADER.pack(self.SNAPSHOT_MAGIC, self.__generation + 1, len(xs)))
+            f.write(xs.tobytes())
+            f.write(ys.tobytes())
+            f.flush()
+            os.fsync(f.fileno())
+        os.replace(self.__snapshot_path + ".tmp", self.__snapshot_path)
+        self.__generation += 1
+        self.__num_records = 0
+        self.__open_journal()
+
+    def close(self, xs: Optional[np.ndarray] = None, ys: Optional[np.ndarray] = None):
+        # compacts first if the current points are given, so the next load() does not have to replay anything
+        if xs is not None and ys is not None and self.__num_records > 0:
+            self.compact(xs, ys)
+        if self.__journal is not None:
+            self.__journal.close()
+            self.__journal = None
@@ -0,0 +1,95 @@
+import queue
+import threading
+import time
+from typing import IO, Optional, Tuple, Union
+
+import numpy as np
+
+
+class StreamSource:
+    # Reads samples from a pipe or a (tailed) file on a thread of its own and hands them out in chunks, so parsing
+    # never runs on the Tk thread. Each line holds "x y", or only "y" in which case x is the number of the sample.
+    def __init__(self, file: Union[str, IO[str]], follow: bool = False, max_chunk: int = 4096,
+                 max_delay: float = 0.01):
+        # a path is opened by the reader thread, opening a named pipe blocks until there is a writer
+        self.file = file
+        # keep reading at the end of the file, like tail -f
+        self.follow = follow
+        self.max_chunk = max_chunk
+        # a chunk is handed out after this many seconds even if it is not full
+        self.max_delay = max_delay
+        self.chunks: queue.SimpleQueue = queue.SimpleQueue()
+        self.__stop = threading.Event()
+        self.__num_samples = 0
+        self.__thread = threading.Thread(target=self.__run, name="StreamSource", daemon=True)
+
+    def start(self) -> "StreamSource":
+        self.__thread.start()
+        return self
+
+    def stop(self):
+        self.__stop.set()
+
+    @property
+    def running(self) -> bool:
+        return self.__thread.is_alive()
+
+    def poll(self) -> Optional[Tuple[np.ndarray, np.ndarray]]:
+        # next chunk of xs and ys if there is one, never blocks
+        try:
+            return self.chunks.get_nowait()
+        except queue.Empty:
+            return None
+
+    def __run(self):
+        if isinstance(self.file, str):
+            with open(self.file) as f:
+                self.file = f
+                self.__read()
+        else:
+            self.__read()
+
+    def __read(self):
+        lines = []
+        # a line the writer is still in the middle of
+        partial = ""
+        deadline = time.perf_counter() + self.max_delay
+        while not self.__stop.is_set():
+            line = self.file.readline()
+            if line.endswith("\n"):
+                lines.append(partial + line)
+                partial = ""
+            elif line:
+                partial += line
+            elif not self.follow:
+                break
+            else:
+                # at the end of the file, wait for it to grow
+                time.sleep(self.max_delay / 2)
+            if lines and (len(lines) >= self.max_chunk or time.perf_counter() >= deadline):
+                self.__emit(lines)
+                lines = []
+            if not lines:
+                deadline = time.perf_counter() + self.max_delay
+        self.__emit(lines + [partial])
+
+    def __emit(self, lines):
+        values = []
+        for line in lines:
+            try:
+                values.append([float(v) for v in line.split()[:2]])
+            except ValueError:
+                # e.g. a header
+                pass
+        if (columns := next((len(v) for v in values if v), None)) is None:
+            return
+        # all rows need as many columns as the first one
+        values = [v for v in values if len(v) == columns]
+        data = np.array(values, dtype=np.float64)
+        if data.shape[1] == 1:
+            xs = np.arange(self.__num_samples, self.__num_samples + len(data), dtype=np.float64)
+            ys = data[:, 0]
+        else:
+            xs, ys = data[:, 0], data[:, 1]
+        self.__num_samples += len(data)
+        self.chunks.put((xs, ys))
@@ -0,0 +1,104 @@
+import collections
+from typing import Deque, Tuple
+
+import numpy as np
+
+from DrawingPanel import DrawingPanel
+from SampleRing import SampleRing
+from StreamSource import StreamSource
+
+
+class StreamView:
+    # Draws the samples of a StreamSource on a DrawingPanel, apart from its editable points. Every frame, only the
+    # samples appended since the last frame become a new polyline. The view pans along so the newest sample stays at the
+    # right edge, and polylines that left the x-window are deleted. Samples are kept in a SampleRing, so old ones are
+    # evicted without reallocating.
+    tag = "Stream"
+
+    def __init__(self, drawing_panel: DrawingPanel, source: StreamSource, capacity: int = 1 << 17,
+                 window: float = 10., frame_ms: int = 16, max_chunks_per_frame: int = 64, margin: int = 20):
+        self.drawing_panel = drawing_panel
+        self.source = source
+        self.ring = SampleRing(capacity)
+        # width of the visible x range in local units
+        self.window = window
+        # pan along with the newest sample
+        self.follow = True
+        self.frame_ms = frame_ms
+        # bounds the work of a frame if the source is faster than the UI, the rest waits for the next frame
+        self.max_chunks_per_frame = max_chunks_per_frame
+        # canvas pixels between the newest sample and the right edge
+        self.margin = margin
+        # canvas item, x of its last sample
+        self.__items: Deque[Tuple[int, float]] = collections.deque()
+        # sequence number after the last drawn sample
+        self.__drawn = 0
+        self.__after_id = None
+        drawing_panel.stream_view = self
+
+    def start(self):
+        self.source.start()
+        self.__after_id = self.drawing_panel.canvas.after(self.frame_ms, self.__frame)
+
+    def stop(self):
+        self.source.stop()
+        if self.__after_id is not None:
+            self.drawing_panel.canvas.after_cancel(self.__after_id)
+            self.__after_id = None
+
+    def __frame(self):
+        self.poll()
+        self.__after_id = self.drawing_panel.canvas.after(self.frame_ms, self.__frame)
+
+    def poll(self):
+        # takes what the source read meanwhile and draws it, never waits for the source
+        for _ in range(self.max_chunks_per_frame):
+            if (chunk := self.source.poll()) is None:
+                break
+            self.ring.extend(*chunk)
+        if self.ring.end == self.__drawn:
+            return
+        if self.follow and not self.drawing_panel.is_panning:
+            self.__follow()
+        self.__draw_new()
+        self.__evict()
+
+    def redraw(self):
+        # draws all samples in the window again, e.g. after the view was zoomed
+        self.drawing_panel.canvas.delete(self.tag)
+        self.__items.clear()
+        if len(self.ring) == 0:
+            return
+        self.__drawn = self.ring.start
+        self.__draw_new()
+
+    def __follow(self):
+        panel = self.drawing_panel
+        x, _ = self.ring.last()
+        dx = int(panel.width - self.margin - x * panel.grid_spacing * panel.zoom_level - panel.origin.x)
+        # the samples already drawn move along with everything else
+        panel.pan(dx, 0)
+
+    def __draw_new(self):
+        panel = self.drawing_panel
+        # starts at the last drawn sample so the polylines connect, but not left of the window
+        start = max(self.__drawn, self.ring.search(self.ring.last()[0] - self.window)) - 1
+        xs, ys = self.ring.get(start, self.ring.end)
+        self.__drawn = self.ring.end
+        if len(xs) < 2:
+            return
+        scale = panel.grid_spacing * panel.zoom_level
+        coords = np.empty(2 * len(xs))
+        coords[0::2] = panel.origin.x + xs * scale
+        coords[1::2] = panel.origin.y - ys * scale
+        item = panel.canvas.create_line(*coords.tolist(), fill=panel.style.stream_fill,
+                                        width=panel.style.stream_width, tags=self.tag)
+        self.__items.append((item, float(xs[-1])))
+        # below the curve traced over it, above the grid
+        panel.canvas.tag_lower(self.tag)
+        panel.canvas.tag_lower(panel.grid_tag)
+
+    def __evict(self):
+        left = self.ring.last()[0] - self.window
+        while self.__items and self.__items[0][1] < left:
+            self.drawing_panel.canvas.delete(self.__items.popleft()[0])
@@ -0,0 +1,84 @@
+import collections
+import json
+import math
+import os
+import time
+from typing import Callable, Deque, Dict, List, Optional, Tuple
+
+
+class TraceRecorder:
+    # Collects the spans of a PerfMonitor in the Chrome trace event format, readable by Perfetto and
+    # chrome://tracing. Spans are kept as plain tuples in a ring of the given capacity, the oldest are dropped once it
+    # is full. Converting them to JSON only happens in write(), never while recording.
+    # tid of the frame spans, they overlap the handler spans so they get a track of their own
+    FRAME_TID = 1
+
+    def __init__(self, capacity: int = 200_000, counter_interval: float = 0.1):
+        # args of the spans, e.g. the number of points
+        self.args: Optional[Callable[[], Dict]] = None
+        # e.g. the number of canvas items per layer, sampled at most every counter_interval seconds
+        self.counters: Optional[Callable[[], Dict]] = None
+        self.counter_interval = counter_interval
+        # phase, name, category, start, duration in seconds, args
+        self.__events: Deque[Tuple[str, str, str, float, float, Optional[Dict]]] = collections.deque(maxlen=capacity)
+        self.__recorded = 0
+        self.__origin = time.perf_counter()
+        # shared by the spans since the last sample, which fills it in
+        self.__pending_args: Dict = {}
+        self.__own_args: List[Dict] = []
+        self.__last_counters = -math.inf
+
+    def __len__(self):
+        return len(self.__events)
+
+    @property
+    def dropped(self) -> int:
+        return self.__recorded - len(self.__events)
+
+    def span(self, name: str, category: str, start: float, end: float, args: Optional[Dict] = None):
+        # args of its own, the ones of the next sample are added to them
+        if args is not None:
+            self.__own_args.append(args)
+        self.__events.append(("X", name, category, start, end - start,
+                              self.__pending_args if args is None else args))
+        self.__recorded += 1
+
+    def sample(self):
+        # Gathers the args of the spans recorded since the last call and, if due, the counters. The monitor calls it
+        # once the spans and the frame around them have taken their end time, so this does not count into any of them
+        now = time.perf_counter()
+        if self.args is not None:
+            self.__pending_args.update(self.args())
+            for args in self.__own_args:
+                for k, v in self.__pending_args.items():
+                    args.setdefault(k, v)
+        self.__pending_args = {}
+        self.__own_args = []
+        if self.counters is not None and now - self.__last_counters >= self.counter_interval:
+            self.__events.append(("C", "canvas items", "counter", now, 0., self.counters()))
+            self.__recorded += 1
+            self.__last_counters = now
+
+    def clear(self):
+        self.__events.clear()
+        self.__recorded = 0
+
+    def events(self) -> List[Dict]:
+        pid = os.getpid()
+        result = []
+        for phase, name, category, start, duration, args in self.__events:
+            event = {"name": name, "cat": category, "ph": phase, "ts": (start - self.__origin) * 1e6, "pid": pid,
+                     "tid": self.FRAME_TID if category == "frame" else 0}
+            if phase == "X":
+                event["dur"] = duration * 1e6
+            if args:
+                event["args"] = args
+            result.append(event)
+        return result
+
+    def write(self, path: str):
+        metadata = [{"name": "thread_name", "ph": "M", "pid": os.getpid(), "tid": tid, "args": {"name": name}}
+                    for tid, name in ((0, "Tk"), (self.FRAME_TID, "frames"))]
+        with open(path, "w") as f:
+            json.dump({"traceEvents": metadata + self.events(), "displayTimeUnit": "ms",
+                       "otherData": {"dropped": self.dropped}}, f)
@@ -1,3 +1,4 @@
+import copy
 import tkinter as tk
 from dataclasses import dataclass
 from tkinter import ttk
@@ -13,6 +14,10 @@ class UIStyle:
     point_radius = 5
     default_segment_fill = "white"
     extrapolate_segment_fill = "yellow"
+    # segment and extrapolation fill of the further curve layers, the first one uses the fills above
+    layer_fills = (("#FF851B", "#FFC48F"), ("#2ECC40", "#9BE8A5"), ("#39CCCC", "#A8E9E9"), ("#F012BE", "#F79BE1"))
+    stream_fill = "#7FDBFF"
+    stream_width = 1
     segment_width = 3
     label_width = 10
     axes_color = "black"
@@ -43,3 +48,20 @@ class UIStyle:
 
         self.init_label = lambda **kwargs: \
             ttk.Label(font=self.font_small, foreground=self.text_color, background=self.info_panel_bg_color, **kwargs)
+
+        def init_option_menu(master, variable, *values):
+            menu = tk.OptionMenu(master, variable, *values)
+            menu.configure(font=self.font_small, bg=self.accent_color, activebackground=self.accent_color,
+                           relief=tk.FLAT, highlightthickness=0)
+            menu["menu"].configure(font=self.font_small, bg=self.accent_color)
+            return menu
+
+        self.init_option_menu = init_option_menu
+
+    def layer_style(self, i: int) -> "UIStyle":
+        # style of the i-th curve layer
+        style = copy.copy(self)
+        if i > 0:
+            fills = self.layer_fills[(i - 1) % len(self.layer_fills)]
+            style.default_segment_fill, style.extrapolate_segment_fill = fills
+        return style
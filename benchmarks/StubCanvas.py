@@ -0,0 +1,159 @@
+import collections
+import itertools
+from typing import Callable, Dict, Iterator, List, Optional, Tuple
+
+
+class StubCanvas:
+    # In-memory stand-in for the tk.Canvas calls DrawingPanel makes. Items are kept in a dict, every call is
+    # counted in calls so benchmarks can report how much Tk work an operation would cause.
+    def __init__(self, width: int = 800, height: int = 600):
+        self.width = width
+        self.height = height
+        self.items: Dict[int, dict] = {}
+        self.calls: collections.Counter = collections.Counter()
+        self.bindings: Dict[str, Callable] = {}
+        self.__ids = itertools.count(1)
+        # virtual time in seconds, after() callbacks become due relative to it
+        self.now = 0.
+        self.__afters: Dict[str, Tuple[float, Callable, tuple]] = {}
+        self.__after_ids = itertools.count(1)
+
+    def reset_calls(self):
+        self.calls.clear()
+
+    # widget
+    def config(self, **_):
+        self.calls["config"] += 1
+
+    configure = config
+
+    def winfo_reqwidth(self) -> int:
+        return self.width
+
+    def winfo_reqheight(self) -> int:
+        return self.height
+
+    def bind(self, sequence: str, func: Callable, *_):
+        self.bindings[sequence] = func
+
+    def after(self, ms: int, func: Callable = None, *args) -> str:
+        self.calls["after"] += 1
+        after_id = f"after#{next(self.__after_ids)}"
+        self.__afters[after_id] = (self.now + ms / 1000, func, args)
+        return after_id
+
+    def after_idle(self, func: Callable, *args) -> str:
+        return self.after(0, func, *args)
+
+    def after_cancel(self, after_id: str):
+        self.calls["after_cancel"] += 1
+        self.__afters.pop(after_id, None)
+
+    def run_afters(self, until: Optional[float] = None):
+        # runs the pending callbacks due by until (all of them if None) in order, like the Tk event loop would
+        while self.__afters:
+            after_id = min(self.__afters, key=lambda a: self.__afters[a][0])
+            due, func, args = self.__afters[after_id]
+            if until is not None and due > until:
+                return
+            del self.__afters[after_id]
+            if func is not None:
+                func(*args)
+
+    # items
+    def __create(self, kind: str, coords: tuple, options: dict) -> int:
+        self.calls[f"create_{kind}"] += 1
+        tags = options.pop("tags", ())
+        tags = (tags,) if isinstance(tags, str) else tuple(tags)
+        item_id = next(self.__ids)
+        self.items[item_id] = {"kind": kind, "coords": [float(c) for c in coords], "tags": tags, "options": options}
+        return item_id
+
+    def create_line(self, *coords, **options) -> int:
+        return self.__create("line", coords, options)
+
+    def create_oval(self, *coords, **options) -> int:
+        return self.__create("oval", coords, options)
+
+    def create_text(self, *coords, **options) -> int:
+        return self.__create("text", coords, options)
+
+    def create_rectangle(self, *coords, **options) -> int:
+        return self.__create("rectangle", coords, options)
+
+    def __find(self, tag_or_id) -> List[int]:
+        if isinstance(tag_or_id, int):
+            return [tag_or_id] if tag_or_id in self.items else []
+        if tag_or_id == "all":
+            return list(self.items)
+        return [item_id for item_id, item in self.items.items() if tag_or_id in item["tags"]]
+
+    def __iter_found(self, tag_or_id) -> Iterator[int]:
+        # like __find without building a list, so the stub does not add allocations of its own to what benchmarks
+        # measure. Only for calls that do not add or delete items
+        if isinstance(tag_or_id, int):
+            if tag_or_id in self.items:
+                yield tag_or_id
+        elif tag_or_id == "all":
+            yield from self.items
+        else:
+            for item_id, item in self.items.items():
+                if tag_or_id in item["tags"]:
+                    yield item_id
+
+    def find_withtag(self, tag_or_id) -> Tuple[int, ...]:
+        self.calls["find_withtag"] += 1
+        return tuple(self.__find(tag_or_id))
+
+    def delete(self, *tags_or_ids):
+        self.calls["delete"] += 1
+        for tag_or_id in tags_or_ids:
+            for item_id in self.__find(tag_or_id):
+                del self.items[item_id]
+
+    def coords(self, tag_or_id, *coords):
+        self.calls["coords"] += 1
+        item_ids = self.__find(tag_or_id)
+        if not coords:
+            return list(self.items[item_ids[0]]["coords"]) if item_ids else []
+        if len(coords) == 1:
+            coords = coords[0]
+        for item_id in item_ids[:1]:
+            self.items[item_id]["coords"] = [float(c) for c in coords]
+
+    def move(self, tag_or_id, dx: float, dy: float):
+        self.calls["move"] += 1
+        for item_id in self.__iter_found(tag_or_id):
+            c = self.items[item_id]["coords"]
+            for i in range(0, len(c), 2):
+                c[i] += dx
+                c[i + 1] += dy
+
+    def scale(self, tag_or_id, x0: float, y0: float, sx: float, sy: float):
+        self.calls["scale"] += 1
+        for item_id in self.__iter_found(tag_or_id):
+            c = self.items[item_id]["coords"]
+            for i in range(0, len(c), 2):
+                c[i] = x0 + (c[i] - x0) * sx
+                c[i + 1] = y0 + (c[i + 1] - y0) * sy
+
+    def itemconfig(self, tag_or_id, **options):
+        self.calls["itemconfig"] += 1
+        for item_id in self.__iter_found(tag_or_id):
+            self.items[item_id]["options"].update(options)
+
+    def itemcget(self, tag_or_id, option: str):
+        self.calls["itemcget"] += 1
+        item_ids = self.__find(tag_or_id)
+        return self.items[item_ids[0]]["options"].get(option) if item_ids else ""
+
+    def tag_raise(self, *_):
+        self.calls["tag_raise"] += 1
+
+    def tag_lower(self, *_):
+        self.calls["tag_lower"] += 1
+
+    def addtag_withtag(self, new_tag: str, tag_or_id):
+        self.calls["addtag_withtag"] += 1
+        for item_id in self.__iter_found(tag_or_id):
+            self.items[item_id]["tags"] += (new_tag,)
@@ -0,0 +1,27 @@
+from typing import Dict
+
+from DrawingPanel import DrawingPanel
+from InfoPanel import InfoPanel
+
+
+class StubCheckBox:
+    def __init__(self, checked: bool):
+        self.checked = checked
+
+    def get_checked(self) -> bool:
+        return self.checked
+
+
+class StubInfoPanel(InfoPanel):
+    # InfoPanel without widgets: the readout is computed as usual, the texts of the entries are only kept in texts
+    def __init__(self, drawing_panel: DrawingPanel, show_inverse: bool = True):
+        self.drawing_panel = drawing_panel
+        self.perf_monitor = None
+        self.max_digits = 10
+        self.texts: Dict[str, str] = {}
+        self.val_x, self.val_y, self.val_fx = "x", "y", "f(x)"
+        self.val_integral, self.val_inverse = "integral", "inverse"
+        self.show_inverse = StubCheckBox(show_inverse)
+
+    def set_readonly_text(self, entry, text):
+        self.texts[entry] = text
@@ -0,0 +1,145 @@
+import argparse
+import gc
+import json
+import os
+import sys
+import tracemalloc
+from typing import Callable, Dict
+
+import numpy as np
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from benchmarks.bench_drawing_panel import event, git_commit, make_panel
+from benchmarks.StubInfoPanel import StubInfoPanel
+from DrawingPanel import DrawingPanel, SnapMode
+from misc import CanvasCoord
+
+# handler -> number of points -> KiB a single event may allocate at its peak. Measured with some headroom, lower
+# them when a handler gets leaner so regressions are caught before they show up as GC pauses
+BUDGETS_KIB: Dict[str, Dict[int, float]] = {
+    "on_button1_move": {10: 8, 1_000: 8, 10_000: 8},
+    "on_button1_move[Horizontal]": {10: 16, 1_000: 16, 10_000: 16},
+    "update_loc_label": {10: 8, 1_000: 8, 10_000: 8},
+    "on_panning": {10: 8, 1_000: 8, 10_000: 8},
+}
+# bytes an event may leave allocated behind, averaged over all events of a case
+RETAINED_BUDGET = 64
+
+
+def cases(panel: DrawingPanel) -> Dict[str, Callable[[int], None]]:
+    canvas = panel.canvas
+    info_panel = StubInfoPanel(panel)
+    rng = np.random.default_rng(0)
+    xs = rng.uniform(0, canvas.width, 1024).tolist()
+    ys = rng.uniform(0, canvas.height, 1024).tolist()
+    # drag the point closest to the center up and down
+    dragged = min(panel.points, key=lambda p: abs(panel.to_canvas_coords(p.loc).x - canvas.width / 2))
+    start = panel.to_canvas_coords(dragged.loc)
+
+    def on_button1_move(mode=None):
+        def fn(i):
+            panel.snap_modes = [mode] if mode is not None else []
+            panel.dragged_point = dragged
+            panel.on_button1_move(event(start.x, start.y + (i % 20) - 10))
+            panel.dragged_point = None
+            panel.snap_modes = []
+
+        return fn
+
+    def update_loc_label(i):
+        info_panel.update_loc_label(xs[i % 1024], ys[i % 1024])
+
+    def on_panning(i):
+        # wiggle back and forth so the view stays where the points are
+        panel.pan_start = CanvasCoord(100, 100)
+        panel.on_panning(event(100 + (1 if i % 2 == 0 else -1), 100))
+
+    return {
+        "on_button1_move": on_button1_move(),
+        "on_button1_move[Horizontal]": on_button1_move(SnapMode.Horizontal),
+        "update_loc_label": update_loc_label,
+        "on_panning": on_panning,
+    }
+
+
+def traced_without_canvas() -> int:
+    # the items of StubCanvas stand in for memory Tk would hold, e.g. its dict grows once enough items were replaced
+    snapshot = tracemalloc.take_snapshot().filter_traces([tracemalloc.Filter(False, "*StubCanvas.py")])
+    return sum(stat.size for stat in snapshot.statistics("filename"))
+
+
+def measure(fn: Callable[[int], None], panel: DrawingPanel, num_events: int) -> Dict:
+    def run(i):
+        fn(i)
+        # e.g. blinking points, Tk would run them eventually
+        panel.canvas.run_afters()
+
+    # caches and lazily built structures are not what we are after
+    for i in range(2):
+        run(i)
+    gc.collect()
+    base = traced_without_canvas()
+    # the snapshot leaves garbage behind, it should not count as collections of the handler
+    gc.collect()
+    collections = gc.get_stats()[0]["collections"]
+    # preallocated, so the measurement itself does not allocate per event
+    peaks = np.zeros(num_events, dtype=np.int64)
+    for i in range(num_events):
+        table_size = sys.getsizeof(panel.canvas.items)
+        before = tracemalloc.get_traced_memory()[0]
+        tracemalloc.reset_peak()
+        run(i)
+        peaks[i] = tracemalloc.get_traced_memory()[1] - before
+        # the peak cannot be filtered like the snapshots, but the one large allocation of StubCanvas is its item dict
+        # growing, which stands in for memory Tk would hold
+        if (grown_size := sys.getsizeof(panel.canvas.items)) != table_size:
+            peaks[i] -= grown_size
+    collections = gc.get_stats()[0]["collections"] - collections
+    # garbage in reference cycles is not retained, it only adds to the collections
+    gc.collect()
+    retained = traced_without_canvas() - base
+    return {"events": num_events, "peak_kib": float(peaks.max()) / 1024, "mean_peak_kib": float(peaks.mean()) / 1024,
+            "retained_bytes_per_event": retained / num_events,
+            "gen0_collections_per_event": collections / num_events}
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Allocations per event of the interactive handlers, fails if a "
+                                                 "handler exceeds its budget")
+    parser.add_argument("--points", type=int, nargs="+", default=[10, 1_000, 10_000])
+    parser.add_argument("--events", type=int, default=100, help="simulated events per case")
+    parser.add_argument("--filter", default="", help="only run cases whose name contains this")
+    parser.add_argument("--output", help="write the results as JSON to this file")
+    args = parser.parse_args()
+
+    # traced from the start, otherwise replacing memory allocated before tracing would count as retained
+    tracemalloc.start()
+    results = []
+    over_budget = []
+    print(f"{'case':<30} {'points':>7} {'peak KiB':>9} {'mean KiB':>9} {'budget':>8} {'retained B':>11} {'gen0/ev':>8}")
+    for num_points in args.points:
+        panel = make_panel(num_points)
+        for name, fn in cases(panel).items():
+            if args.filter not in name:
+                continue
+            result = {"case": name, "points": num_points, **measure(fn, panel, args.events)}
+            results.append(result)
+            budget = BUDGETS_KIB.get(name, {}).get(num_points)
+            if budget is not None and result["peak_kib"] > budget or \
+                    result["retained_bytes_per_event"] > RETAINED_BUDGET:
+                over_budget.append(f"{name} with {num_points} points")
+            print(f"{name:<30} {num_points:>7} {result['peak_kib']:>9.1f} {result['mean_peak_kib']:>9.1f} "
+                  f"{'-' if budget is None else budget:>8} {result['retained_bytes_per_event']:>11.1f} "
+                  f"{result['gen0_collections_per_event']:>8.2f}")
+
+    if args.output:
+        with open(args.output, "w") as f:
+            json.dump({"commit": git_commit(), "python": sys.version.split()[0], "results": results}, f, indent=1)
+    if over_budget:
+        print(f"over budget: {', '.join(over_budget)}")
+        sys.exit(1)
+
+
+if __name__ == '__main__':
+    main()
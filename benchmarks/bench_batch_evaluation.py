@@ -0,0 +1,61 @@
+import argparse
+import os
+import sys
+import time
+
+import numpy as np
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from BatchEvaluator import BatchEvaluator
+from SegmentTable import SegmentTable
+
+
+def random_table(num_segments: int, rng: np.random.Generator) -> SegmentTable:
+    xs = np.cumsum(rng.uniform(0.01, 1, num_segments + 1))
+    ys = rng.uniform(-10, 10, num_segments + 1)
+    return SegmentTable.from_points(xs, ys)
+
+
+def best_of(repeats: int, fn) -> float:
+    timings = []
+    for _ in range(repeats):
+        start = time.perf_counter()
+        fn()
+        timings.append(time.perf_counter() - start)
+    return min(timings)
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Scaling of BatchEvaluator over the number of worker processes")
+    parser.add_argument("--size", type=int, default=10_000_000, help="number of x values to evaluate")
+    parser.add_argument("--segments", type=int, default=10_000)
+    parser.add_argument("--workers", type=int, nargs="+", default=[1, 2, 4, 8])
+    parser.add_argument("--repeats", type=int, default=5)
+    args = parser.parse_args()
+
+    rng = np.random.default_rng(0)
+    table = random_table(args.segments, rng)
+    lo, hi = table.breakpoints[0] - 1, table.breakpoints[-1] + 1
+
+    xs = rng.uniform(lo, hi, args.size)
+    expected = table.evaluate_array(xs)
+    inline = best_of(args.repeats, lambda: table.evaluate_array(xs))
+    print(f"{args.size} values, {args.segments} segments, {os.cpu_count()} cpus")
+    print(f"{'workers':>8} {'seconds':>10} {'Mvalues/s':>10} {'speedup':>8}")
+    print(f"{'inline':>8} {inline:>10.4f} {args.size / inline / 1e6:>10.2f} {1:>8.2f}")
+
+    for workers in args.workers:
+        with BatchEvaluator(table, workers=workers) as evaluator:
+            shared_xs = evaluator.empty(args.size)
+            shared_xs[:] = xs
+            shared_ys = evaluator.empty(args.size)
+            evaluator.evaluate(shared_xs, out=shared_ys)  # warm up the pool
+            assert np.array_equal(shared_ys, expected), "BatchEvaluator does not match SegmentTable.evaluate_array"
+            seconds = best_of(args.repeats, lambda: evaluator.evaluate(shared_xs, out=shared_ys))
+            del shared_xs, shared_ys
+        print(f"{workers:>8} {seconds:>10.4f} {args.size / seconds / 1e6:>10.2f} {inline / seconds:>8.2f}")
+
+
+if __name__ == '__main__':
+    main()
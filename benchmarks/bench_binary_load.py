@@ -0,0 +1,55 @@
+import argparse
+import os
+import sys
+import tempfile
+import time
+
+import numpy as np
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from function_exporters.FunctionExporterBin import FunctionExporterBin
+from function_exporters.FunctionExporterPy import FunctionExporterPy
+from SegmentTable import SegmentTable
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Load time of binary segment tables compared to generated source")
+    parser.add_argument("--segments", type=int, nargs="+", default=[1_000, 100_000, 1_000_000])
+    parser.add_argument("--repeats", type=int, default=100)
+    parser.add_argument("--source-limit", type=int, default=100_000,
+                        help="skip compiling the generated source for larger curves")
+    args = parser.parse_args()
+
+    rng = np.random.default_rng(0)
+    print(f"{'segments':>10} {'bin MB':>8} {'bin load us':>12} {'src MB':>8} {'src compile s':>14}")
+    with tempfile.TemporaryDirectory() as tmp:
+        for n in args.segments:
+            table = SegmentTable.from_points(np.cumsum(rng.uniform(0.01, 1, n + 1)), rng.uniform(-10, 10, n + 1))
+            path = os.path.join(tmp, f"{n}.wtfseg")
+            with open(path, "wb") as f:
+                f.write(FunctionExporterBin.to_function(table, "f"))
+
+            timings = []
+            for _ in range(args.repeats):
+                start = time.perf_counter()
+                loaded = FunctionExporterBin.load(path)
+                timings.append(time.perf_counter() - start)
+            assert np.array_equal(loaded.breakpoints, table.breakpoints), "Binary round trip changed the table"
+            assert np.array_equal(loaded.slopes, table.slopes), "Binary round trip changed the table"
+            assert np.array_equal(loaded.intercepts, table.intercepts), "Binary round trip changed the table"
+            del loaded
+
+            src_mb, src_seconds = "-", "-"
+            if n <= args.source_limit:
+                src = FunctionExporterPy.to_function(table, "f")
+                start = time.perf_counter()
+                exec(compile(src, "<export>", "exec"), {})
+                src_seconds = f"{time.perf_counter() - start:.3f}"
+                src_mb = f"{len(src) / 1e6:.2f}"
+            print(f"{n:>10} {os.path.getsize(path) / 1e6:>8.2f} {min(timings) * 1e6:>12.1f} {src_mb:>8} "
+                  f"{src_seconds:>14}")
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,151 @@
+import argparse
+import json
+import os
+import subprocess
+import sys
+import time
+import types
+from typing import Callable, Dict, List, Optional
+
+import numpy as np
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from benchmarks.StubCanvas import StubCanvas
+from DrawingPanel import DrawingPanel, SnapMode
+from misc import CanvasCoord, LocalCoord
+from UIStyle import UIStyle
+
+
+def event(x: float, y: float, delta: int = 0) -> types.SimpleNamespace:
+    return types.SimpleNamespace(x=x, y=y, delta=delta, width=0, height=0)
+
+
+def make_panel(num_points: int, width: int = 800, height: int = 600) -> DrawingPanel:
+    canvas = StubCanvas(width, height)
+    panel = DrawingPanel(canvas, UIStyle())
+    # no undo entries, they would only measure History
+    panel.history = None
+    # spread the points over a bit more than the visible x range
+    half_width = width / 2 / (panel.grid_spacing * panel.zoom_level)
+    xs = np.linspace(-1.2 * half_width, 1.2 * half_width, num_points)
+    with panel.batch() as b:
+        for x, y in zip(xs.tolist(), np.sin(3 * xs).tolist()):
+            b.add(LocalCoord(x, y))
+    panel.redraw_canvas()
+    return panel
+
+
+def measure(fn: Callable[[int], None], canvas: StubCanvas, min_time: float, max_repeats: int) -> Dict:
+    # fn gets the repetition index so it can vary its input
+    fn(0)
+    canvas.reset_calls()
+    repeats = 0
+    start = time.perf_counter()
+    while repeats < max_repeats and (repeats == 0 or time.perf_counter() - start < min_time):
+        fn(repeats)
+        repeats += 1
+    seconds = time.perf_counter() - start
+    tk_calls = {name: count / repeats for name, count in sorted(canvas.calls.items())}
+    return {"repeats": repeats, "ops_per_sec": repeats / seconds, "tk_calls": tk_calls,
+            "tk_calls_total": sum(tk_calls.values())}
+
+
+def cases(panel: DrawingPanel) -> Dict[str, Callable[[int], None]]:
+    canvas = panel.canvas
+    rng = np.random.default_rng(0)
+    xs = rng.uniform(0, canvas.width, 1024).tolist()
+    ys = rng.uniform(0, canvas.height, 1024).tolist()
+
+    def redraw_canvas(_):
+        panel.redraw_canvas()
+
+    def on_panning(i):
+        # wiggle back and forth so the view stays where the points are
+        panel.pan_start = CanvasCoord(100, 100)
+        panel.on_panning(event(100 + (1 if i % 2 == 0 else -1), 100))
+
+    def zoom(i):
+        # alternate in and out so the zoom level stays in range
+        panel.zoom(event(canvas.width / 2, canvas.height / 2, 120 if i % 2 == 0 else -120))
+
+    def snap_and_verify(mode: SnapMode):
+        def fn(i):
+            panel.snap_modes = [mode]
+            panel.snap_and_verify(CanvasCoord(xs[i % 1024], ys[i % 1024]))
+            panel.snap_modes = []
+
+        return fn
+
+    def intersects_point(i):
+        panel.intersects_point(CanvasCoord(xs[i % 1024], ys[i % 1024]))
+
+    def intersects_line(i):
+        panel.intersects_line(CanvasCoord(xs[i % 1024], ys[i % 1024]))
+
+    def get_extrapolate(_):
+        # drop the cached fit, otherwise only the cache lookup would be measured
+        panel.layer.extrapolate_store = None
+        panel.get_extrapolate()
+
+    result = {
+        "redraw_canvas": redraw_canvas,
+        "on_panning": on_panning,
+        "zoom": zoom,
+        "intersects_point": intersects_point,
+        "intersects_line": intersects_line,
+        "get_extrapolate": get_extrapolate,
+    }
+    for mode in SnapMode:
+        result[f"snap_and_verify[{mode.name}]"] = snap_and_verify(mode)
+    return result
+
+
+def git_commit() -> Optional[str]:
+    try:
+        return subprocess.run(["git", "rev-parse", "--short", "HEAD"], capture_output=True, text=True,
+                              cwd=os.path.dirname(os.path.abspath(__file__)), check=True).stdout.strip()
+    except (OSError, subprocess.CalledProcessError):
+        return None
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Headless benchmarks of DrawingPanel on a stub canvas")
+    parser.add_argument("--points", type=int, nargs="+", default=[10, 1_000, 100_000])
+    parser.add_argument("--min-time", type=float, default=0.5, help="seconds to spend on each case")
+    parser.add_argument("--max-repeats", type=int, default=10_000)
+    parser.add_argument("--extrapolate", type=int, default=2, help="points used for extrapolation on each side")
+    parser.add_argument("--filter", default="", help="only run cases whose name contains this")
+    parser.add_argument("--output", help="write the results as JSON to this file")
+    parser.add_argument("--compare", help="JSON file of an earlier run to compare against")
+    args = parser.parse_args()
+
+    baseline = {}
+    if args.compare:
+        with open(args.compare) as f:
+            baseline = {(r["case"], r["points"]): r for r in json.load(f)["results"]}
+
+    results: List[Dict] = []
+    print(f"{'case':<32} {'points':>8} {'ops/s':>12} {'tk calls':>10} {'vs base':>8}")
+    for num_points in args.points:
+        panel = make_panel(num_points)
+        panel.extrapolate_left = panel.extrapolate_right = args.extrapolate
+        for name, fn in cases(panel).items():
+            if args.filter not in name:
+                continue
+            result = {"case": name, "points": num_points,
+                      **measure(fn, panel.canvas, args.min_time, args.max_repeats)}
+            results.append(result)
+            speedup = ""
+            if (base := baseline.get((name, num_points))) is not None:
+                speedup = f"{result['ops_per_sec'] / base['ops_per_sec']:.2f}x"
+            print(f"{name:<32} {num_points:>8} {result['ops_per_sec']:>12.1f} {result['tk_calls_total']:>10.1f} "
+                  f"{speedup:>8}")
+
+    if args.output:
+        with open(args.output, "w") as f:
+            json.dump({"commit": git_commit(), "python": sys.version.split()[0], "results": results}, f, indent=1)
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,214 @@
+import argparse
+import bisect
+import dataclasses
+import importlib
+import json
+import os
+import pkgutil
+import sys
+import tempfile
+import time
+from typing import Callable, Dict, List, Optional, Tuple
+
+import numpy as np
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from benchmarks.bench_batch_evaluation import random_table
+from benchmarks.bench_drawing_panel import git_commit
+import function_exporters
+from function_exporters.FunctionExporter import FunctionExporter
+from function_exporters.FunctionExporterBin import FunctionExporterBin
+from function_exporters.FunctionExporterPyLUT import FunctionExporterPyLUT
+from misc import Line
+from SegmentTable import SegmentTable
+
+
+@dataclasses.dataclass
+class Spec:
+    # what the emitted function computes: "f", "integral" or "inverse" of the curve
+    computes: str = "f"
+    # it takes NumPy arrays as well as floats
+    arrays: bool = False
+    # matches the reference bit for bit, otherwise it may be off by rounding
+    exact: bool = True
+    # absolute error it may have by design, on top of rounding
+    error: Callable[[SegmentTable], float] = lambda _: 0.
+    # keyword arguments of to_function, given a directory for the files of the exporter
+    options: Callable[[str], Dict] = lambda _: {}
+
+
+# every exporter needs a spec, a new one fails the suite until it has one
+SPECS: Dict[str, Spec] = {
+    "Python": Spec(),
+    "Python Integral": Spec("integral", exact=False),
+    "Python Inverse": Spec("inverse", exact=False),
+    "NumPy Inverse": Spec("inverse", arrays=True, exact=False),
+    "Binary": Spec(arrays=True),
+    "Python LUT": Spec(exact=False, error=FunctionExporterPyLUT.error),
+    "NumPy LUT": Spec(arrays=True, exact=False, error=FunctionExporterPyLUT.error),
+    "Python Profiled": Spec(options=lambda _: {"dump_at_exit": False}),
+    # without a profile, a balanced search tree
+    "Python Profile-Guided": Spec(options=lambda directory: {"profile_path": os.path.join(directory, "f.wtfprof")}),
+}
+
+
+class Reference:
+    # Evaluates the curve like DrawingPanel draws it, from the lines of get_lines() instead of the arrays the
+    # exporters read: an x on a breakpoint belongs to the segment left of it and the outer segments extend to infinity
+    def __init__(self, lines: List[Line]):
+        self.lines = lines
+        self.functions = [line.get_function() for line in lines]
+        self.ends = [line.p1.x for line in lines[:-1]]
+        # integral from the leftmost point to the start of every segment
+        self.areas = [0.]
+        for line in lines[:-1]:
+            self.areas.append(self.areas[-1] + (line.p0.y + line.p1.y) / 2 * (line.p1.x - line.p0.x))
+
+    def f(self, x: float) -> float:
+        return self.functions[bisect.bisect_left(self.ends, x)](x)
+
+    def integral(self, x: float) -> float:
+        i = bisect.bisect_left(self.ends, x)
+        p0 = self.lines[i].p0
+        return self.areas[i] + (p0.y + self.functions[i](x)) / 2 * (x - p0.x)
+
+
+def load(exporter, table: SegmentTable, directory: str) -> Tuple[Callable, Optional[Callable], float, int]:
+    # the exported function for floats, for arrays if it takes them, seconds to export and compile or load it and
+    # the size of the export
+    start = time.perf_counter()
+    exported = exporter.to_function(table, "f", **SPECS[exporter.name()].options(directory))
+    if isinstance(exported, bytes):
+        path = os.path.join(directory, f"{len(table)}.wtfseg")
+        with open(path, "wb") as f:
+            f.write(exported)
+        loaded = FunctionExporterBin.load(path)
+        return loaded.evaluate, loaded.evaluate_array, time.perf_counter() - start, len(exported)
+    namespace = {}
+    exec(compile(exported, f"<{exporter.name()}>", "exec"), namespace)
+    fn = namespace["f"]
+    return fn, fn if SPECS[exporter.name()].arrays else None, time.perf_counter() - start, len(exported)
+
+
+def check_values(table: SegmentTable, num_checks: int, rng: np.random.Generator) -> np.ndarray:
+    # the breakpoints and their neighbouring floats, always the two outermost on each side and a sample of the rest,
+    # plus random x reaching beyond the breakpoints
+    xs = table.breakpoints
+    inner = np.arange(2, len(xs) - 2)
+    chosen = np.concatenate([[0, 1, len(xs) - 2, len(xs) - 1],
+                             rng.choice(inner, min(num_checks, len(inner)), replace=False)])
+    at = np.unique(xs[chosen])
+    span = xs[-1] - xs[0]
+    random = rng.uniform(xs[0] - span / 10, xs[-1] + span / 10, num_checks)
+    return np.concatenate([at, np.nextafter(at, -np.inf), np.nextafter(at, np.inf), random])
+
+
+def check(spec: Spec, fn: Callable, array_fn: Optional[Callable], table: SegmentTable, xs: np.ndarray) -> Tuple[
+        float, float]:
+    # largest deviation from the reference and how large it may be
+    reference = Reference(table.to_lines())
+    if spec.computes == "inverse":
+        # f^-1(f(x)) has to give x back
+        args = [reference.f(x) for x in xs.tolist()]
+        expected = xs.tolist()
+    else:
+        args = xs.tolist()
+        expected = [getattr(reference, spec.computes)(x) for x in args]
+    got = np.array([fn(arg) for arg in args])
+    expected = np.array(expected)
+    if array_fn is not None:
+        # an array has to give the same as its elements one by one
+        got_array = np.asarray(array_fn(np.array(args)))
+        if not np.array_equal(got_array, got):
+            return float("inf"), 0.
+    deviation = float(np.max(np.abs(got - expected)))
+    tolerance = spec.error(table)
+    if not spec.exact:
+        # e.g. sums in a different order than the reference
+        tolerance += 1e-9 * (1 + float(np.max(np.abs(expected))))
+    return deviation, tolerance
+
+
+def per_second(fn: Callable, args, min_time: float) -> float:
+    # calls of fn on args in turn, in batches that grow until they are long enough to time
+    calls, elapsed, n = 0, 0., 1
+    while elapsed < min_time:
+        batch = args[:n]
+        start = time.perf_counter()
+        for arg in batch:
+            fn(arg)
+        elapsed += time.perf_counter() - start
+        calls += len(batch)
+        n = min(2 * n, len(args))
+    return calls / elapsed
+
+
+def main():
+    # tests/test_exporters.py checks that the functions match the curve, with the helpers above
+    parser = argparse.ArgumentParser(description="Measures the evaluations per second of the functions every "
+                                                 "exporter emits")
+    parser.add_argument("--segments", type=int, nargs="+", default=[1, 10, 100, 1_000, 10_000, 100_000])
+    parser.add_argument("--array-size", type=int, default=100_000)
+    parser.add_argument("--min-time", type=float, default=0.2, help="seconds to spend on each throughput case")
+    parser.add_argument("--max-load-time", type=float, default=1.,
+                        help="larger curves are skipped for an exporter once exporting and compiling or loading a "
+                             "curve took longer than this many seconds, e.g. compiling the Python exporter's output "
+                             "grows quadratically")
+    parser.add_argument("--filter", default="", help="only run exporters whose name contains this")
+    parser.add_argument("--output", help="write the results as JSON to this file")
+    args = parser.parse_args()
+
+    # every module in function_exporters, the app imports the same ones
+    for module in pkgutil.iter_modules(function_exporters.__path__):
+        importlib.import_module(f"function_exporters.{module.name}")
+    exporters = [e for e in FunctionExporter.__subclasses__() if args.filter in e.name()]
+
+    rng = np.random.default_rng(0)
+    results = []
+    print(f"{'exporter':<22} {'segments':>8} {'load s':>8} {'bytes':>10} {'scalar/s':>10} {'array/s':>10}")
+    with tempfile.TemporaryDirectory(ignore_cleanup_errors=True) as directory:
+        for exporter in exporters:
+            spec = SPECS.get(exporter.name())
+            if spec is None:
+                print(f"{exporter.name()} has no spec, skipped")
+                continue
+            too_slow = False
+            for num_segments in args.segments:
+                result = {"exporter": exporter.name(), "segments": num_segments}
+                results.append(result)
+                if too_slow:
+                    result["skipped"] = True
+                    continue
+                table = random_table(num_segments, rng)
+                if spec.computes == "inverse":
+                    # strictly increasing
+                    ys = np.cumsum(rng.uniform(0.01, 1, num_segments + 1))
+                    table = SegmentTable.from_points(table.breakpoints, ys)
+                fn, array_fn, load_time, size = load(exporter, table, directory)
+                too_slow = load_time > args.max_load_time
+                result.update({"load_seconds": load_time, "bytes": size})
+
+                # the same inputs for every exporter of a kind
+                xs = np.random.default_rng(1).uniform(table.breakpoints[0], table.breakpoints[-1], args.array_size)
+                if spec.computes == "inverse":
+                    xs = table.evaluate_array(xs)
+                scalar = per_second(fn, xs[:1024].tolist(), args.min_time)
+                array = None
+                if array_fn is not None:
+                    array = per_second(array_fn, [xs], args.min_time) * len(xs)
+                result.update({"scalar_per_second": scalar, "array_per_second": array})
+                print(f"{exporter.name():<22} {num_segments:>8} {load_time:>8.3f} {size:>10} {scalar:>10.3g} "
+                      f"{'-' if array is None else f'{array:.3g}':>10}")
+
+    skipped = [f"{r['exporter']} with {r['segments']} segments" for r in results if r.get("skipped")]
+    if skipped:
+        print(f"skipped after exceeding --max-load-time: {', '.join(skipped)}")
+    if args.output:
+        with open(args.output, "w") as f:
+            json.dump({"commit": git_commit(), "python": sys.version.split()[0], "numpy": np.__version__,
+                       "results": results}, f, indent=1)
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,121 @@
+import argparse
+import bisect
+import json
+import os
+import sys
+import tempfile
+from typing import Callable, Dict
+
+import numpy as np
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from benchmarks.bench_batch_evaluation import random_table
+from benchmarks.bench_drawing_panel import git_commit
+from benchmarks.bench_exporters import per_second
+from function_exporters.FunctionExporterPyGuided import FunctionExporterPyGuided
+from function_exporters.FunctionExporterPyProfiled import FunctionExporterPyProfiled
+from SegmentTable import SegmentTable
+
+
+def distributions(table: SegmentTable) -> Dict[str, Callable[[np.random.Generator, int], np.ndarray]]:
+    # x values of calls in production, from evenly spread to concentrated on a few segments
+    xs = table.breakpoints
+    span = xs[-1] - xs[0]
+
+    def uniform(rng, size):
+        return rng.uniform(xs[0], xs[-1], size)
+
+    def normal(rng, size):
+        # around one spot, a few percent of the curve wide
+        return rng.normal(xs[0] + span / 3, span / 50, size)
+
+    def zipf(rng, size):
+        # segments in a random order, the k-th one hit about 1 / k as often as the first one
+        order = np.random.default_rng(len(table)).permutation(len(table))
+        segments = order[np.minimum(rng.zipf(1.5, size), len(table)) - 1]
+        return xs[segments] + rng.uniform(0, 1, size) * (xs[segments + 1] - xs[segments])
+
+    def edge(rng, size):
+        # mostly beyond the rightmost breakpoint, where bisect takes the most comparisons
+        return np.where(rng.uniform(0, 1, size) < 0.9, xs[-1] + rng.exponential(span / 100, size), uniform(rng, size))
+
+    return {"uniform": uniform, "normal": normal, "zipf": zipf, "edge": edge}
+
+
+def bisect_function(table: SegmentTable) -> Callable[[float], float]:
+    # the plain bisection the guided tree competes with
+    xs, ms, cs = tuple(table.breakpoints.tolist()), tuple(table.slopes.tolist()), tuple(table.intercepts.tolist())
+    n = len(table)
+
+    def f(x):
+        i = bisect.bisect_left(xs, x, 1, n) - 1
+        return ms[i] * x + cs[i]
+
+    return f
+
+
+def load(source: str) -> Callable[[float], float]:
+    namespace = {}
+    exec(compile(source, "<bench>", "exec"), namespace)
+    return namespace["f"]
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Evaluations per second of profile-guided search trees against "
+                                                 "plain bisection, on skewed distributions of x")
+    parser.add_argument("--segments", type=int, nargs="+", default=[100, 1_000, 10_000])
+    parser.add_argument("--training", type=int, default=200_000, help="calls to profile")
+    parser.add_argument("--period", type=int, default=64, help="the profiled function counts every period-th call")
+    parser.add_argument("--min-time", type=float, default=0.2, help="seconds to spend on each case")
+    parser.add_argument("--filter", default="", help="only run distributions whose name contains this")
+    parser.add_argument("--output", help="write the results as JSON to this file")
+    args = parser.parse_args()
+
+    rng = np.random.default_rng(0)
+    results = []
+    print(f"{'distribution':<12} {'segments':>8} {'bisect/s':>10} {'profiled/s':>10} {'balanced/s':>10} "
+          f"{'guided/s':>10} {'speedup':>8} {'comparisons':>11}")
+    with tempfile.TemporaryDirectory() as directory:
+        profile_path = os.path.join(directory, "f.wtfprof")
+        for num_segments in args.segments:
+            table = random_table(num_segments, rng)
+            for name, distribution in distributions(table).items():
+                if args.filter not in name:
+                    continue
+                if os.path.exists(profile_path):
+                    os.remove(profile_path)
+                balanced = load(FunctionExporterPyGuided.to_function(table, "f", profile_path=profile_path))
+
+                profiled = load(FunctionExporterPyProfiled.to_function(table, "f", profile_path=profile_path,
+                                                                       period=args.period, dump_at_exit=False))
+                for x in distribution(rng, args.training).tolist():
+                    profiled(x)
+                profiled.dump_profile()
+                guided = load(FunctionExporterPyGuided.to_function(table, "f", profile_path=profile_path))
+                comparisons = FunctionExporterPyGuided.expected_comparisons(table, profile_path)
+
+                # other calls than the profiled ones, from the same distribution
+                xs = distribution(rng, 4096)
+                if not np.array_equal([guided(x) for x in xs.tolist()], table.evaluate_array(xs)):
+                    print(f"the guided function does not match SegmentTable.evaluate_array for {name} with "
+                          f"{num_segments} segments")
+                    sys.exit(1)
+                calls = xs.tolist()
+                result = {"distribution": name, "segments": num_segments, "comparisons": comparisons,
+                          **{f"{kind}_per_second": per_second(fn, calls, args.min_time) for kind, fn in
+                             [("bisect", bisect_function(table)), ("profiled", profiled), ("balanced", balanced),
+                              ("guided", guided)]}}
+                result["speedup"] = result["guided_per_second"] / result["bisect_per_second"]
+                results.append(result)
+                print(f"{name:<12} {num_segments:>8} {result['bisect_per_second']:>10.3g} "
+                      f"{result['profiled_per_second']:>10.3g} {result['balanced_per_second']:>10.3g} "
+                      f"{result['guided_per_second']:>10.3g} {result['speedup']:>8.2f} {comparisons:>11.2f}")
+
+    if args.output:
+        with open(args.output, "w") as f:
+            json.dump({"commit": git_commit(), "python": sys.version.split()[0], "results": results}, f, indent=1)
+
+
+if __name__ == '__main__':
+    main()
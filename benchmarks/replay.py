@@ -0,0 +1,171 @@
+import argparse
+import json
+import math
+import os
+import sys
+import time
+import types
+from typing import Dict, List, Optional
+
+import numpy as np
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from benchmarks.bench_drawing_panel import make_panel
+from benchmarks.StubCanvas import StubCanvas
+from benchmarks.StubInfoPanel import StubInfoPanel
+from DrawingPanel import DrawingPanel
+from EventLog import EventLog
+from UIStyle import UIStyle
+from wtf import canvas_bindings, create_app, root_bindings
+
+# state masks of the mouse buttons while moving
+B1_MASK = 1 << 8
+B2_MASK = 1 << 9
+
+
+def synthetic_scenarios(num_points: int = 1_000) -> Dict[str, EventLog]:
+    # gestures known to be slow, used when no recorded event logs are given
+    panel = make_panel(num_points)
+    header = EventLog.start(panel).header
+
+    def log(events: List[EventLog.Event], snap_modes: Optional[List[str]] = None) -> EventLog:
+        h = dict(header, snap_modes=snap_modes or [])
+        return EventLog(h, [(seq, i * 0.004, *rest) for i, (seq, *rest) in enumerate(events)])
+
+    fast_pan = [("<Button-2>", "ButtonPress", 400, 300, 2, 0, 0, "", 0, 0)]
+    fast_pan += [("<B2-Motion>", "Motion", 400 + int(150 * math.sin(i / 20)), 300 + i % 40, 0, 0, B2_MASK, "", 0, 0)
+                 for i in range(300)]
+    fast_pan += [("<ButtonRelease-2>", "ButtonRelease", 400, 300, 2, 0, 0, "", 0, 0)]
+
+    wheel_burst = []
+    for i in range(120):
+        # bursts of 10 notches, alternating in and out so the zoom level stays in range
+        wheel_burst.append(("<MouseWheel>", "MouseWheel", 400 + i, 300, 0, 120 if i // 10 % 2 == 0 else -120, 0, "",
+                            0, 0))
+        wheel_burst.append(("<Motion>", "Motion", 400 + i, 300, 0, 0, 0, "", 0, 0))
+
+    horizontal_drag = [("<Button-1>", "ButtonPress", 410, 250, 1, 0, 0, "", 0, 0)]
+    horizontal_drag += [("<B1-Motion>", "Motion", 410 + int(5 * math.sin(i / 15)), 250 + i % 100, 0, 0, B1_MASK, "",
+                         0, 0) for i in range(300)]
+    horizontal_drag += [("<ButtonRelease-1>", "ButtonRelease", 410, 300, 1, 0, 0, "", 0, 0)]
+
+    return {"fast_pan": log(fast_pan), "wheel_burst": log(wheel_burst),
+            "horizontal_drag": log(horizontal_drag, ["Horizontal"])}
+
+
+def to_event(e: EventLog.Event, widget) -> types.SimpleNamespace:
+    _, _, type_, x, y, num, delta, state, keysym, width, height = e
+    return types.SimpleNamespace(type=type_, x=x, y=y, num=num, delta=delta, state=state, keysym=keysym, width=width,
+                                 height=height, widget=widget)
+
+
+def replay_headless(log: EventLog) -> List[float]:
+    # latency of every event in seconds, including the callbacks it scheduled on the virtual Tk clock
+    canvas = StubCanvas(log.header["width"], log.header["height"])
+    drawing_panel = DrawingPanel(canvas, UIStyle())
+    info_panel = StubInfoPanel(drawing_panel)
+    log.apply_header(drawing_panel)
+    handlers = {**canvas_bindings(drawing_panel, info_panel), **root_bindings(drawing_panel, info_panel)}
+    latencies = []
+    for e in log.events:
+        # whatever became due since the last event ran while Tk was idle
+        canvas.run_afters(until=e[1])
+        canvas.now = e[1]
+        start = time.perf_counter()
+        handlers[e[0]](to_event(e, canvas))
+        canvas.run_afters(until=e[1])
+        latencies.append(time.perf_counter() - start)
+    canvas.run_afters()
+    return latencies
+
+
+def replay_tk(log: EventLog) -> List[float]:
+    # generates the events on a real window, paced like they were recorded. Needs a display, e.g. xvfb-run
+    import tkinter as tk
+    root = tk.Tk()
+    try:
+        drawing_panel, _, _ = create_app(root)
+        canvas = drawing_panel.canvas
+        canvas.configure(width=log.header["width"], height=log.header["height"])
+        root.update()
+        log.apply_header(drawing_panel)
+        root.update()
+        latencies = []
+        origin = time.perf_counter()
+        for sequence, t, type_, x, y, num, delta, state, keysym, width, height in log.events:
+            while time.perf_counter() - origin < t:
+                root.update()
+            start = time.perf_counter()
+            if type_ == "Configure":
+                canvas.configure(width=width, height=height)
+            elif type_ in ("ButtonPress", "ButtonRelease"):
+                canvas.event_generate(f"<{type_}-{num}>", x=x, y=y, state=state)
+            elif type_ == "MouseWheel":
+                canvas.event_generate("<MouseWheel>", x=x, y=y, state=state, delta=delta)
+            elif type_ == "KeyPress":
+                root.event_generate(f"<KeyPress-{keysym}>", state=state)
+            else:
+                canvas.event_generate(f"<{type_}>", x=x, y=y, state=state)
+            root.update_idletasks()
+            latencies.append(time.perf_counter() - start)
+        return latencies
+    finally:
+        root.destroy()
+
+
+def summarize(latencies: List[float]) -> Dict:
+    ms = np.array(latencies) * 1000
+    return {"events": len(ms), "seconds": float(ms.sum() / 1000), "p50_ms": float(np.percentile(ms, 50)),
+            "p95_ms": float(np.percentile(ms, 95)), "max_ms": float(ms.max())}
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Replays recorded input events (wtf.py --record) and reports the "
+                                                 "end-to-end latency, the synthetic scenarios are used without files")
+    parser.add_argument("logs", nargs="*", help="event logs to replay")
+    parser.add_argument("--tk", action="store_true", help="replay on a real Tk window instead of a stub canvas")
+    parser.add_argument("--repeats", type=int, default=3, help="the fastest replay of each scenario counts")
+    parser.add_argument("--output", help="write the results as JSON to this file")
+    parser.add_argument("--baseline", help="JSON file of an earlier run, fails if a scenario got slower")
+    parser.add_argument("--threshold", type=float, default=0.25, help="allowed slowdown against the baseline")
+    args = parser.parse_args()
+
+    if args.logs:
+        scenarios = {os.path.splitext(os.path.basename(path))[0]: EventLog.load(path) for path in args.logs}
+    else:
+        scenarios = synthetic_scenarios()
+    replay = replay_tk if args.tk else replay_headless
+    mode = "tk" if args.tk else "headless"
+
+    baseline = {}
+    if args.baseline:
+        with open(args.baseline) as f:
+            baseline = {(r["scenario"], r["mode"]): r for r in json.load(f)["results"]}
+
+    results = []
+    regressions = []
+    print(f"{'scenario':<24} {'events':>7} {'seconds':>9} {'p50 ms':>8} {'p95 ms':>8} {'max ms':>8} {'vs base':>8}")
+    for name, log in scenarios.items():
+        result = min((summarize(replay(log)) for _ in range(args.repeats)), key=lambda r: r["seconds"])
+        result = {"scenario": name, "mode": mode, **result}
+        results.append(result)
+        ratio = ""
+        if (base := baseline.get((name, mode))) is not None:
+            ratio = result["seconds"] / base["seconds"]
+            if ratio > 1 + args.threshold:
+                regressions.append(name)
+            ratio = f"{ratio:.2f}x"
+        print(f"{name:<24} {result['events']:>7} {result['seconds']:>9.3f} {result['p50_ms']:>8.2f} "
+              f"{result['p95_ms']:>8.2f} {result['max_ms']:>8.2f} {ratio:>8}")
+
+    if args.output:
+        with open(args.output, "w") as f:
+            json.dump({"results": results}, f, indent=1)
+    if regressions:
+        print(f"slower than the baseline by more than {args.threshold:.0%}: {', '.join(regressions)}")
+        sys.exit(1)
+
+
+if __name__ == '__main__':
+    main()
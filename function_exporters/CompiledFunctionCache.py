@@ -0,0 +1,178 @@
+import collections
+import hashlib
+import importlib.util
+import inspect
+import marshal
+import os
+import stat
+import time
+from types import CodeType
+from typing import Callable, Dict, Optional, OrderedDict, Tuple, Type
+
+import numpy as np
+
+from function_exporters.FunctionExporter import FunctionExporter
+from SegmentTable import SegmentTable
+
+# export and the code compiled from it, None until a callable was asked for
+Entry = Tuple[str | bytes, Optional[CodeType]]
+
+
+class CompiledFunctionCache:
+    # Exports keyed by a hash of the segment table, the exporter, the function name, the keyword arguments of
+    # to_function and the inputs of the exporter.
+    # The most recently used entries are kept in memory, every entry is written to the directory as <key>.wtfc (the
+    # marshalled entry), so exporting an unchanged curve again and other processes asking for the same curve skip
+    # generating and compiling the code. Code objects only load on the Python version that compiled them, which is why
+    # it is part of the key, as are the version of the file format and the source of SegmentTable, whose
+    # stringify_segment and sampled shape the exports.
+    # Loading an entry runs its code, so the directory must only be writable by the user: files owned by someone else or
+    # writable by others are ignored, but a directory that others control is not safe to use at all.
+    # The directory keeps the max_files most recently written entries.
+    FORMAT_VERSION = 1
+    __default: Optional["CompiledFunctionCache"] = None
+
+    __segment_table_hash: Optional[bytes] = None
+
+    def __init__(self, directory: Optional[str] = None, max_entries: int = 64, max_files: int = 1024):
+        # None keeps the entries in memory only
+        self.directory = directory
+        self.max_entries = max_entries
+        self.max_files = max_files
+        # called after every export and function call with the exporter, the name of the call, its start and end
+        # and args telling where the entry came from ("memory", "disk" or "miss"), e.g. to trace what the user
+        # waited for
+        self.observer: Optional[Callable[[Type[FunctionExporter], str, float, float, Dict], None]] = None
+        self.__entries: OrderedDict[str, Entry] = collections.OrderedDict()
+        self.__exporter_hashes: Dict[type, bytes] = {}
+
+    @staticmethod
+    def default() -> "CompiledFunctionCache":
+        # shared by the app and FunctionExporter.compiled, in $WTF_CACHE_DIR or the cache directory of the user
+        if CompiledFunctionCache.__default is None:
+            directory = os.environ.get("WTF_CACHE_DIR")
+            if directory is None:
+                base = os.environ.get("XDG_CACHE_HOME") or os.path.join(os.path.expanduser("~"), ".cache")
+                directory = os.path.join(base, "what-the-function")
+            CompiledFunctionCache.__default = CompiledFunctionCache(directory)
+        return CompiledFunctionCache.__default
+
+    def key(self, exporter: Type[FunctionExporter], table: SegmentTable, name: str, **options) -> str:
+        if (exporter_hash := self.__exporter_hashes.get(exporter)) is None:
+            # a changed exporter emits different code for the same table
+            exporter_hash = hashlib.sha256(inspect.getsource(exporter).encode()).digest()
+            self.__exporter_hashes[exporter] = exporter_hash
+        if CompiledFunctionCache.__segment_table_hash is None:
+            source = inspect.getsource(SegmentTable).encode()
+            CompiledFunctionCache.__segment_table_hash = hashlib.sha256(source).digest()
+        h = hashlib.sha256(importlib.util.MAGIC_NUMBER)
+        h.update(CompiledFunctionCache.FORMAT_VERSION.to_bytes(4, "little"))
+        h.update(CompiledFunctionCache.__segment_table_hash)
+        h.update(exporter_hash)
+        h.update(name.encode() + b"\0")
+        h.update(repr(sorted(options.items())).encode() + b"\0")
+        inputs = exporter.inputs(table, name)
+        h.update(len(inputs).to_bytes(8, "little") + inputs)
+        for arr in (table.breakpoints, table.slopes, table.intercepts):
+            h.update(np.ascontiguousarray(arr, dtype="<f8").data)
+        return h.hexdigest()
+
+    def export(self, exporter: Type[FunctionExporter], table: SegmentTable, name: str, **options) -> str | bytes:
+        # what exporter.to_function(table, name, **options) returns
+        start = time.perf_counter()
+        _, (exported, _), source = self.__get(exporter, table, name, options)
+        if self.observer is not None:
+            self.observer(exporter, "export", start, time.perf_counter(), {"cache": source})
+        return exported
+
+    def function(self, exporter: Type[FunctionExporter], table: SegmentTable, name: str = "f", **options) -> Callable:
+        start = time.perf_counter()
+        key, (exported, code), source = self.__get(exporter, table, name, options)
+        compiled = code is None
+        if compiled:
+            if not isinstance(exported, str):
+                raise ValueError(f"{exporter.name()} does not export source code")
+            code = compile(exported, f"<{exporter.name()} {name}>", "exec")
+            self.__put(key, (exported, code))
+        namespace = {}
+        exec(code, namespace)
+        if self.observer is not None:
+            self.observer(exporter, "function", start, time.perf_counter(), {"cache": source, "compiled": compiled})
+        return namespace[name]
+
+    def __get(self, exporter: Type[FunctionExporter], table: SegmentTable, name: str, options: Dict) \
+            -> Tuple[str, Entry, str]:
+        # the key, the entry and where it came from
+        key = self.key(exporter, table, name, **options)
+        if (entry := self.__entries.get(key)) is not None:
+            self.__entries.move_to_end(key)
+            return key, entry, "memory"
+        if (entry := self.__load(key)) is not None:
+            self.__remember(key, entry)
+            return key, entry, "disk"
+        entry = (exporter.to_function(table, name, **options), None)
+        self.__put(key, entry)
+        return key, entry, "miss"
+
+    def __remember(self, key: str, entry: Entry):
+        self.__entries[key] = entry
+        self.__entries.move_to_end(key)
+        while len(self.__entries) > self.max_entries:
+            self.__entries.popitem(last=False)
+
+    def __put(self, key: str, entry: Entry):
+        self.__remember(key, entry)
+        if self.directory is None:
+            return
+        path = os.path.join(self.directory, f"{key}.wtfc")
+        # processes writing the same entry at once each write a file of their own, the last rename wins
+        tmp_path = f"{path}.{os.getpid()}.tmp"
+        try:
+            os.makedirs(self.directory, mode=0o700, exist_ok=True)
+            with open(tmp_path, "wb") as f:
+                marshal.dump(entry, f)
+            os.replace(tmp_path, path)
+            self.__prune()
+        except OSError as e:
+            # the entry stays in memory
+            print(f"Cannot cache {key}: {e}")
+
+    def __prune(self):
+        # removes the least recently written files beyond max_files
+        files = []
+        with os.scandir(self.directory) as it:
+            for f in it:
+                if f.name.endswith(".wtfc"):
+                    try:
+                        files.append((f.stat().st_mtime, f.path))
+                    except FileNotFoundError:
+                        # pruned by another process meanwhile
+                        pass
+        if len(files) <= self.max_files:
+            return
+        files.sort()
+        for _, path in files[:len(files) - self.max_files]:
+            try:
+                os.remove(path)
+            except FileNotFoundError:
+                pass
+
+    def __load(self, key: str) -> Optional[Entry]:
+        if self.directory is None:
+            return None
+        try:
+            with open(os.path.join(self.directory, f"{key}.wtfc"), "rb") as f:
+                st = os.fstat(f.fileno())
+                # someone else could have planted the code
+                if (hasattr(os, "getuid") and st.st_uid != os.getuid()) or st.st_mode & (stat.S_IWGRP | stat.S_IWOTH):
+                    print(f"Ignoring {f.name}, it is owned or writable by another user")
+                    return None
+                entry = marshal.load(f)
+        except FileNotFoundError:
+            return None
+        except (OSError, EOFError, ValueError, TypeError):
+            # unreadable or torn, the entry is generated again and overwrites it
+            return None
+        if not isinstance(entry, tuple) or len(entry) != 2:
+            return None
+        return entry
@@ -1,16 +1,37 @@
 import abc
-from misc import Line, LocalCoord
-from typing import List, Tuple
+from typing import Callable
+
+from SegmentTable import SegmentTable
 
 
 class FunctionExporter(abc.ABC):
 
     @staticmethod
     @abc.abstractmethod
-    def to_function(lines: List[Line], name: str) -> str:
+    def to_function(table: SegmentTable, name: str) -> str | bytes:
+        # source code, or the file content for binary formats
         pass
 
     @staticmethod
     @abc.abstractmethod
     def name() -> str:
         pass
+
+    @staticmethod
+    def inputs(table: SegmentTable, name: str) -> bytes:
+        # what the export depends on besides table and name, e.g. a file it reads, so CompiledFunctionCache can tell
+        # when a cached export is stale
+        return b""
+
+    @staticmethod
+    def error(table: SegmentTable, **options) -> float:
+        # largest absolute error the export of table with these keyword arguments of to_function has by design,
+        # besides rounding
+        return 0.
+
+    @classmethod
+    def compiled(cls, table: SegmentTable, name: str = "f", cache=None, **options) -> Callable:
+        # the exported function ready to call, generated and compiled only if the cache (by default the shared
+        # CompiledFunctionCache) has not seen this curve before. options are keyword arguments of to_function
+        from function_exporters.CompiledFunctionCache import CompiledFunctionCache
+        return (CompiledFunctionCache.default() if cache is None else cache).function(cls, table, name, **options)
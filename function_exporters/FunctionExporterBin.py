@@ -0,0 +1,48 @@
+import mmap
+import struct
+
+import numpy as np
+
+from function_exporters.FunctionExporter import FunctionExporter
+from SegmentTable import SegmentTable
+
+
+class FunctionExporterBin(FunctionExporter):
+    # Binary segment table, all little endian:
+    #   header (32 bytes): magic, version (uint32), flags (uint32, reserved), number of segments n (uint64), padding
+    #   breakpoints (n + 1 float64), slopes (n float64), intercepts (n float64)
+    # The arrays are 8 byte aligned, so load() can hand out views into the mapped file without copying anything.
+    MAGIC = b"WTFSEG\0\0"
+    VERSION = 1
+    HEADER = struct.Struct("<8sIIQ8x")
+
+    @staticmethod
+    def name() -> str:
+        return "Binary"
+
+    @staticmethod
+    def to_function(table: SegmentTable, name: str) -> bytes:
+        assert len(table) > 0, "Cannot export a curve without segments"
+        header = FunctionExporterBin.HEADER.pack(FunctionExporterBin.MAGIC, FunctionExporterBin.VERSION, 0, len(table))
+        return b"".join([header, *(np.ascontiguousarray(arr, dtype="<f8").tobytes()
+                                   for arr in (table.breakpoints, table.slopes, table.intercepts))])
+
+    @staticmethod
+    def load(path: str) -> SegmentTable:
+        # the returned table is read-only and backed by the page cache, processes loading the same file share it
+        with open(path, "rb") as f:
+            buf = mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ)
+        size = FunctionExporterBin.HEADER.size
+        if len(buf) < size:
+            raise ValueError(f"{path} is not a segment table, it is too short")
+        magic, version, _, n = FunctionExporterBin.HEADER.unpack_from(buf)
+        if magic != FunctionExporterBin.MAGIC:
+            raise ValueError(f"{path} is not a segment table")
+        if version != FunctionExporterBin.VERSION:
+            raise ValueError(f"{path} has version {version}, only version {FunctionExporterBin.VERSION} is supported")
+        if len(buf) != size + 8 * (3 * n + 1):
+            raise ValueError(f"{path} is truncated")
+        breakpoints = np.frombuffer(buf, dtype="<f8", count=n + 1, offset=size)
+        slopes = np.frombuffer(buf, dtype="<f8", count=n, offset=size + 8 * (n + 1))
+        intercepts = np.frombuffer(buf, dtype="<f8", count=n, offset=size + 8 * (2 * n + 1))
+        return SegmentTable(breakpoints, slopes, intercepts)
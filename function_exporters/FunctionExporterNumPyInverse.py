@@ -0,0 +1,35 @@
+from function_exporters.FunctionExporter import FunctionExporter
+from SegmentTable import SegmentTable
+
+
+class FunctionExporterNumPyInverse(FunctionExporter):
+    # Emits x = f^-1(y) for strictly monotone curves that accepts scalars and arrays. The tables are built once
+    # when the snippet is executed, not on every call.
+
+    @staticmethod
+    def name() -> str:
+        return "NumPy Inverse"
+
+    @staticmethod
+    def to_function(table: SegmentTable, name: str) -> str:
+        if not table.is_monotone:
+            raise ValueError("Only strictly monotone curves have an inverse function")
+        run = table.monotone_runs[0]
+
+        def to_array(values) -> str:
+            return "np.array([" + ", ".join(str(float(v)) for v in values) + "], dtype=np.float64)"
+
+        s = f"def _make_{name}():\n"
+        s += "\timport numpy as np\n"
+        # keys are the y values of the inner breakpoints, negated for decreasing curves so that they are ascending
+        s += f"\tkeys = {to_array(run.keys[1:-1])}\n"
+        s += f"\txs = {to_array(table.breakpoints)}\n"
+        s += f"\tys = {to_array(table.ys)}\n"
+        s += f"\tms = {to_array(table.slopes)}\n\n"
+        s += f"\tdef {name}(y):\n"
+        s += "\t\ty = np.asarray(y, dtype=np.float64)\n"
+        s += f"\t\ti = np.searchsorted(keys, {'y' if run.sign > 0 else '-y'})\n"
+        s += "\t\treturn xs[i] + (y - ys[i]) / ms[i]\n\n"
+        s += f"\treturn {name}\n\n\n"
+        s += f"{name} = _make_{name}()\n"
+        return s
@@ -0,0 +1,47 @@
+from typing import Optional
+
+from function_exporters.FunctionExporter import FunctionExporter
+from function_exporters.FunctionExporterPyLUT import FunctionExporterPyLUT
+from SegmentTable import SegmentTable
+
+
+class FunctionExporterNumPyLUT(FunctionExporter):
+    # Emits f(x) for scalars and arrays as a lookup table of evenly spaced samples like FunctionExporterPyLUT, the
+    # index of every x is computed at once instead of searched
+
+    @staticmethod
+    def name() -> str:
+        return "NumPy LUT"
+
+    @staticmethod
+    def error(table: SegmentTable, x_min: Optional[float] = None, x_max: Optional[float] = None,
+              num_samples: int = 1024) -> float:
+        # the same samples as FunctionExporterPyLUT
+        return FunctionExporterPyLUT.error(table, x_min, x_max, num_samples)
+
+    @staticmethod
+    def to_function(table: SegmentTable, name: str, x_min: Optional[float] = None, x_max: Optional[float] = None,
+                    num_samples: int = 1024) -> str:
+        assert len(table) > 0, "Cannot export a curve without segments"
+        x_min, x_max = FunctionExporterPyLUT.sample_range(table, x_min, x_max)
+        ys, error = table.sampled(x_min, x_max, num_samples)
+        scale = (num_samples - 1) / (x_max - x_min)
+        n = len(table) - 1
+
+        s = f"# {num_samples} samples from {x_min} to {x_max}, max absolute error {error}\n"
+        s += f"def _make_{name}():\n"
+        s += "\timport numpy as np\n"
+        s += "\tys = np.array([" + ", ".join(str(float(y)) for y in ys) + "], dtype=np.float64)\n\n"
+        s += f"\tdef {name}(x):\n"
+        s += "\t\tx = np.asarray(x, dtype=np.float64)\n"
+        s += f"\t\tt = np.clip((x - {x_min}) * {scale}, 0, {num_samples - 1})\n"
+        s += f"\t\ti = np.minimum(t.astype(np.intp), {num_samples - 2})\n"
+        s += "\t\ty = ys[i] + (t - i) * (ys[i + 1] - ys[i])\n"
+        # the outer segments beyond the sampled range
+        s += f"\t\ty = np.where(x < {x_min}, {float(table.slopes[0])} * x + {float(table.intercepts[0])}, y)\n"
+        s += f"\t\ty = np.where(x > {x_max}, {float(table.slopes[n])} * x + {float(table.intercepts[n])}, y)\n"
+        # a float for a scalar x, like the other exporters
+        s += "\t\treturn y if y.ndim else float(y)\n\n"
+        s += f"\treturn {name}\n\n\n"
+        s += f"{name} = _make_{name}()\n"
+        return s
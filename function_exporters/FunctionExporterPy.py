@@ -1,6 +1,5 @@
 from function_exporters.FunctionExporter import FunctionExporter
-from misc import Line, LocalCoord
-from typing import List, Tuple
+from SegmentTable import SegmentTable
 
 
 class FunctionExporterPy(FunctionExporter):
@@ -10,26 +9,22 @@ class FunctionExporterPy(FunctionExporter):
         return "Python"
 
     @staticmethod
-    def to_function(lines: List[Line], name: str) -> str:
+    def to_function(table: SegmentTable, name: str) -> str:
         s = f"def {name}(x):\n"
-        lines = sorted(lines, key=lambda l: l.p0.x)
-        tail = ""
+        xs = table.breakpoints
+        n = len(table)
         # special case:
-        if len(lines) == 1:
-            s += f"\treturn ({lines[0].stringify_function()})(x)\n"
+        if n == 1:
+            s += f"\treturn ({table.stringify_segment(0)})(x)\n"
             return s
 
-        if lines:
-            line = lines.pop(0)
-            s += f"\tif(x <= {line.p1.x}):\n\t\treturn ({line.stringify_function()})(x)\n"
+        if n:
+            s += f"\tif(x <= {float(xs[1])}):\n\t\treturn ({table.stringify_segment(0)})(x)\n"
 
-        if lines:
-            line = lines.pop(-1)
-            tail = f"\tif(x >= {line.p0.x}):\n\t\treturn ({line.stringify_function()})(x)\n"
+        for i in range(1, n - 1):
+            s += f"\tif({float(xs[i])} <= x <= {float(xs[i + 1])}):\n\t\treturn ({table.stringify_segment(i)})(x)\n"
 
-        for line in lines:
-            s += f"\tif({line.p0.x} <= x <= {line.p1.x}):\n\t\treturn ({line.stringify_function()})(x)\n"
-
-        s += tail
+        if n > 1:
+            s += f"\tif(x >= {float(xs[n - 1])}):\n\t\treturn ({table.stringify_segment(n - 1)})(x)\n"
 
         return s
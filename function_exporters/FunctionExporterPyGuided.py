@@ -0,0 +1,103 @@
+import bisect
+import json
+from typing import List, Optional, Tuple
+
+import numpy as np
+
+from function_exporters.FunctionExporter import FunctionExporter
+from function_exporters.FunctionExporterPyProfiled import FunctionExporterPyProfiled
+from SegmentTable import SegmentTable
+
+
+class FunctionExporterPyGuided(FunctionExporter):
+    # Emits f(x) as a search tree of nested ifs over the breakpoints, shaped by the hit counts a function exported
+    # with FunctionExporterPyProfiled recorded. Every split halves the weight of the segments below it, so a segment
+    # is about log2(total / its weight) comparisons deep and the hottest ones resolve first. Without a profile every
+    # segment weighs the same and the tree is balanced.
+    # Python does not allow more levels of indentation than this
+    MAX_DEPTH = 90
+
+    @staticmethod
+    def name() -> str:
+        return "Python Profile-Guided"
+
+    @staticmethod
+    def inputs(table: SegmentTable, name: str) -> bytes:
+        # the cached export is stale once the profile changed
+        try:
+            with open(FunctionExporterPyProfiled.profile_path(name), "rb") as f:
+                return f.read()
+        except FileNotFoundError:
+            return b""
+
+    @staticmethod
+    def load_profile(table: SegmentTable, path: str) -> Optional[np.ndarray]:
+        # hits per segment, None if there is no profile at path
+        try:
+            with open(path) as f:
+                profile = json.load(f)
+        except FileNotFoundError:
+            return None
+        if profile.get("table") != FunctionExporterPyProfiled.table_hash(table):
+            raise ValueError(f"{path} was recorded for other breakpoints, export with the same curve and max error")
+        return np.asarray(profile["counts"], dtype=np.float64)
+
+    @staticmethod
+    def search_tree(table: SegmentTable, counts: Optional[np.ndarray]) -> Tuple[List[str], float]:
+        # the lines of the function body and the comparisons per call on average, of the profiled calls if there are
+        # counts and of a call on every segment otherwise
+        if counts is None or counts.sum() == 0:
+            weights = hits = np.ones(len(table))
+        else:
+            # a 16th of the weight is spread over all segments, so inputs the profile never saw are at most about 4
+            # comparisons deeper than in a balanced tree
+            weights = counts + counts.sum() / (16 * len(table))
+            hits = counts
+        # prefix[i] is the weight of the segments left of segment i. Lists, since the tree visits single elements
+        prefix = [0.] + np.cumsum(weights).tolist()
+        xs, slopes, intercepts = table.breakpoints.tolist(), table.slopes.tolist(), table.intercepts.tolist()
+        lines: List[str] = []
+        hits = hits.tolist()
+        comparisons = 0.
+
+        def emit(lo: int, hi: int, depth: int, taken: int):
+            # the segments lo to hi, nested depth ifs deep and reached after taken comparisons
+            nonlocal comparisons
+            indent = "\t" * (depth + 1)
+            if lo == hi:
+                lines.append(f"{indent}return {slopes[lo]} * x + {intercepts[lo]}\n")
+                comparisons += taken * hits[lo]
+                return
+            if depth >= FunctionExporterPyGuided.MAX_DEPTH:
+                raise ValueError(f"The search tree would be deeper than {FunctionExporterPyGuided.MAX_DEPTH} levels")
+            # split at the breakpoint between the segments k - 1 and k, closest to half of the weight
+            half = (prefix[lo] + prefix[hi + 1]) / 2
+            k = bisect.bisect_left(prefix, half, lo + 1, hi)
+            if k > lo + 1 and half - prefix[k - 1] < prefix[k] - half:
+                k -= 1
+            # x on a breakpoint belongs to the segment left of it. The left side returns, so the right side follows
+            # the if without being nested
+            lines.append(f"{indent}if x <= {xs[k]}:\n")
+            emit(lo, k - 1, depth + 1, taken + 1)
+            emit(k, hi, depth, taken + 1)
+
+        emit(0, len(table) - 1, 0, 0)
+        return lines, comparisons / sum(hits)
+
+    @staticmethod
+    def expected_comparisons(table: SegmentTable, profile_path: str) -> float:
+        # what the tree exported with the profile at profile_path takes per call of the profiled ones
+        counts = FunctionExporterPyGuided.load_profile(table, profile_path)
+        return FunctionExporterPyGuided.search_tree(table, counts)[1]
+
+    @staticmethod
+    def to_function(table: SegmentTable, name: str, profile_path: Optional[str] = None) -> str:
+        assert len(table) > 0, "Cannot export a curve without segments"
+        profile_path = FunctionExporterPyProfiled.profile_path(name) if profile_path is None else profile_path
+        counts = FunctionExporterPyGuided.load_profile(table, profile_path)
+        lines, comparisons = FunctionExporterPyGuided.search_tree(table, counts)
+        source = "no profile" if counts is None else f"{int(counts.sum())} sampled calls"
+        s = f"# search tree from {source}, {comparisons:.2f} comparisons per call on average\n"
+        s += f"def {name}(x):\n"
+        s += "".join(lines)
+        return s
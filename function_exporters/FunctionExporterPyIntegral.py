@@ -0,0 +1,33 @@
+from function_exporters.FunctionExporter import FunctionExporter
+from SegmentTable import SegmentTable
+
+
+class FunctionExporterPyIntegral(FunctionExporter):
+    # Emits F(x), the integral of the curve from its leftmost point to x. The prefix areas are embedded as
+    # constant tuples, so every call is one bisection plus one partial segment.
+
+    @staticmethod
+    def name() -> str:
+        return "Python Integral"
+
+    @staticmethod
+    def to_function(table: SegmentTable, name: str) -> str:
+        assert len(table) > 0, "Cannot export a curve without segments"
+
+        def to_tuple(values) -> str:
+            return "(" + ", ".join(str(float(v)) for v in values) + ",)"
+
+        s = f"def _make_{name}():\n"
+        s += "\tfrom bisect import bisect_left\n"
+        s += f"\txs = {to_tuple(table.breakpoints)}\n"
+        s += f"\tys = {to_tuple(table.ys)}\n"
+        s += f"\tms = {to_tuple(table.slopes)}\n"
+        s += f"\tareas = {to_tuple(table.areas)}\n\n"
+        s += f"\tdef {name}(x):\n"
+        # the outer segments take everything beyond the outermost breakpoints
+        s += f"\t\ti = bisect_left(xs, x, 1, {len(table)}) - 1\n"
+        s += "\t\tdx = x - xs[i]\n"
+        s += "\t\treturn areas[i] + dx * (2 * ys[i] + ms[i] * dx) / 2\n\n"
+        s += f"\treturn {name}\n\n\n"
+        s += f"{name} = _make_{name}()\n"
+        return s
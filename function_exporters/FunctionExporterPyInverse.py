@@ -0,0 +1,33 @@
+from function_exporters.FunctionExporter import FunctionExporter
+from SegmentTable import SegmentTable
+
+
+class FunctionExporterPyInverse(FunctionExporter):
+    # Emits x = f^-1(y) for strictly monotone curves as one bisection over the y values of the breakpoints
+
+    @staticmethod
+    def name() -> str:
+        return "Python Inverse"
+
+    @staticmethod
+    def to_function(table: SegmentTable, name: str) -> str:
+        if not table.is_monotone:
+            raise ValueError("Only strictly monotone curves have an inverse function")
+        run = table.monotone_runs[0]
+
+        def to_tuple(values) -> str:
+            return "(" + ", ".join(str(float(v)) for v in values) + ",)"
+
+        s = f"def _make_{name}():\n"
+        s += "\tfrom bisect import bisect_left\n"
+        # keys are the y values of the breakpoints, negated for decreasing curves so that they are ascending
+        s += f"\tkeys = {to_tuple(run.keys)}\n"
+        s += f"\txs = {to_tuple(table.breakpoints)}\n"
+        s += f"\tys = {to_tuple(table.ys)}\n"
+        s += f"\tms = {to_tuple(table.slopes)}\n\n"
+        s += f"\tdef {name}(y):\n"
+        s += f"\t\ti = bisect_left(keys, {'y' if run.sign > 0 else '-y'}, 1, {len(table)}) - 1\n"
+        s += "\t\treturn xs[i] + (y - ys[i]) / ms[i]\n\n"
+        s += f"\treturn {name}\n\n\n"
+        s += f"{name} = _make_{name}()\n"
+        return s
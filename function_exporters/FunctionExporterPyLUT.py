@@ -0,0 +1,46 @@
+from typing import Optional, Tuple
+
+from function_exporters.FunctionExporter import FunctionExporter
+from SegmentTable import SegmentTable
+
+
+class FunctionExporterPyLUT(FunctionExporter):
+    # Emits f(x) as a lookup table of evenly spaced samples, so every call is a bit of index arithmetic and a linear
+    # interpolation instead of a search. Beyond the sampled range the outer segments are evaluated exactly. The
+    # maximum absolute error against the exact curve is returned by error() and noted in the emitted code.
+
+    @staticmethod
+    def name() -> str:
+        return "Python LUT"
+
+    @staticmethod
+    def sample_range(table: SegmentTable, x_min: Optional[float], x_max: Optional[float]) -> Tuple[float, float]:
+        # None stands for the outermost breakpoints
+        return (float(table.breakpoints[0]) if x_min is None else x_min,
+                float(table.breakpoints[-1]) if x_max is None else x_max)
+
+    @staticmethod
+    def error(table: SegmentTable, x_min: Optional[float] = None, x_max: Optional[float] = None,
+              num_samples: int = 1024) -> float:
+        return table.sampled(*FunctionExporterPyLUT.sample_range(table, x_min, x_max), num_samples)[1]
+
+    @staticmethod
+    def to_function(table: SegmentTable, name: str, x_min: Optional[float] = None, x_max: Optional[float] = None,
+                    num_samples: int = 1024) -> str:
+        assert len(table) > 0, "Cannot export a curve without segments"
+        x_min, x_max = FunctionExporterPyLUT.sample_range(table, x_min, x_max)
+        ys, error = table.sampled(x_min, x_max, num_samples)
+        scale = (num_samples - 1) / (x_max - x_min)
+
+        s = f"# {num_samples} samples from {x_min} to {x_max}, max absolute error {error}\n"
+        s += f"def _make_{name}():\n"
+        s += "\tys = (" + ", ".join(str(float(y)) for y in ys) + ",)\n\n"
+        s += f"\tdef {name}(x):\n"
+        s += f"\t\tif x < {x_min}:\n\t\t\treturn ({table.stringify_segment(0)})(x)\n"
+        s += f"\t\tif x > {x_max}:\n\t\t\treturn ({table.stringify_segment(len(table) - 1)})(x)\n"
+        s += f"\t\tt = (x - {x_min}) * {scale}\n"
+        s += f"\t\ti = min(int(t), {num_samples - 2})\n"
+        s += "\t\treturn ys[i] + (t - i) * (ys[i + 1] - ys[i])\n\n"
+        s += f"\treturn {name}\n\n\n"
+        s += f"{name} = _make_{name}()\n"
+        return s
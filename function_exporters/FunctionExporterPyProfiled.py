@@ -0,0 +1,89 @@
+import hashlib
+import os
+from typing import Optional
+
+import numpy as np
+
+from function_exporters.FunctionExporter import FunctionExporter
+from SegmentTable import SegmentTable
+
+
+class FunctionExporterPyProfiled(FunctionExporter):
+    # Emits f(x) as one bisection over the breakpoints that counts which segment every period-th call falls into.
+    # The counts are added to the profile at profile_path (JSON) when the process exits, or whenever
+    # {name}.dump_profile() is called, for FunctionExporterPyGuided to build a search tree around the segments that are
+    # hit most. A profile recorded for other breakpoints or another period is replaced instead.
+
+    @staticmethod
+    def name() -> str:
+        return "Python Profiled"
+
+    @staticmethod
+    def profile_path(name: str) -> str:
+        # where the profile of name goes if not told otherwise
+        return os.path.abspath(f"{name}.wtfprof")
+
+    @staticmethod
+    def table_hash(table: SegmentTable) -> str:
+        # a profile only applies to the breakpoints it was recorded for
+        return hashlib.sha256(np.ascontiguousarray(table.breakpoints, dtype="<f8").data).hexdigest()
+
+    @staticmethod
+    def inputs(table: SegmentTable, name: str) -> bytes:
+        return FunctionExporterPyProfiled.profile_path(name).encode()
+
+    @staticmethod
+    def to_function(table: SegmentTable, name: str, profile_path: Optional[str] = None, period: int = 64,
+                    dump_at_exit: bool = True) -> str:
+        assert len(table) > 0, "Cannot export a curve without segments"
+        profile_path = FunctionExporterPyProfiled.profile_path(name) if profile_path is None else profile_path
+
+        def to_tuple(values) -> str:
+            return "(" + ", ".join(str(float(v)) for v in values) + ",)"
+
+        n = len(table)
+        s = f"def _make_{name}():\n"
+        s += "\tfrom bisect import bisect_left\n"
+        s += f"\txs = {to_tuple(table.breakpoints)}\n"
+        s += f"\tms = {to_tuple(table.slopes)}\n"
+        s += f"\tcs = {to_tuple(table.intercepts)}\n"
+        s += f"\tcounts = [0] * {n}\n"
+        s += f"\tcountdown = {period}\n\n"
+        s += f"\tdef {name}(x):\n"
+        s += "\t\tnonlocal countdown\n"
+        s += f"\t\ti = bisect_left(xs, x, 1, {n}) - 1\n"
+        s += "\t\tcountdown -= 1\n"
+        s += "\t\tif not countdown:\n"
+        s += f"\t\t\tcountdown = {period}\n"
+        s += "\t\t\tcounts[i] += 1\n"
+        s += "\t\treturn ms[i] * x + cs[i]\n\n"
+        # the counts already added to the profile at each path, dumping again only adds the calls made since
+        s += "\tdumped = {}\n\n"
+        s += f"\tdef dump_profile(path={profile_path!r}):\n"
+        s += "\t\timport json\n"
+        s += "\t\timport os\n"
+        s += f"\t\tprofile = {{'table': {FunctionExporterPyProfiled.table_hash(table)!r}, 'period': {period}, " \
+             f"'counts': [0] * {n}}}\n"
+        s += "\t\ttry:\n"
+        s += "\t\t\twith open(path) as f:\n"
+        s += "\t\t\t\trecorded = json.load(f)\n"
+        # a profile of other breakpoints or another period is replaced
+        s += "\t\t\tif all(recorded.get(k) == profile[k] for k in ('table', 'period')):\n"
+        s += "\t\t\t\tprofile['counts'] = recorded['counts']\n"
+        s += "\t\texcept (OSError, ValueError, AttributeError):\n"
+        s += "\t\t\tpass\n"
+        s += "\t\tsnapshot = list(counts)\n"
+        s += "\t\tbefore = dumped.get(path, [0] * len(snapshot))\n"
+        s += "\t\tprofile['counts'] = [c + now - then for c, now, then in zip(profile['counts'], snapshot, before)]\n"
+        s += "\t\ttmp_path = f'{path}.{os.getpid()}.tmp'\n"
+        s += "\t\twith open(tmp_path, 'w') as f:\n"
+        s += "\t\t\tjson.dump(profile, f)\n"
+        s += "\t\tos.replace(tmp_path, path)\n"
+        s += "\t\tdumped[path] = snapshot\n\n"
+        s += f"\t{name}.dump_profile = dump_profile\n"
+        if dump_at_exit:
+            s += "\timport atexit\n"
+            s += "\tatexit.register(dump_profile)\n"
+        s += f"\treturn {name}\n\n\n"
+        s += f"{name} = _make_{name}()\n"
+        return s
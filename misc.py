@@ -90,21 +90,29 @@ class Line:
             return None
         return (self.p1.y - self.p0.y) / (self.p1.x - self.p0.x)
 
+    @property
+    def intercept(self):
+        if (slope := self.slope) is None:
+            return None
+        return self.p0.y - slope * self.p0.x
+
     def get_function(self) -> Callable[[Any], Any | None]:
-        assert self.slope is not None, "Slope cannot be None how did you do this, please write a bug report"
+        slope = self.slope
+        assert slope is not None, "Slope cannot be None how did you do this, please write a bug report"
+        y_intercept = self.p0.y - slope * self.p0.x
 
         def fn(x):
-            y_intercept = self.p0.y - self.slope * self.p0.x
-            return self.slope * x + y_intercept
+            return slope * x + y_intercept
 
         return fn
 
     def stringify_function(self) -> str:
-        assert self.slope is not None, "Slope cannot be None how did you do this, please write a bug report"
+        slope = self.slope
+        assert slope is not None, "Slope cannot be None how did you do this, please write a bug report"
         # def f_to_str(f): return str(round(f, 2)).replace(".", "_").replace("-", "neg")
         # header = f"def x0_{f_to_str(self.p0.x)}_y0_{f_to_str(self.p0.y)}_to_x1_{f_to_str(self.p1.x)}_y1_{f_to_str(self.p1.y)}:"
-        y_intercept = self.p0.y - self.slope * self.p0.x
-        impl = f"lambda x: {self.slope} * x + {y_intercept}"
+        y_intercept = self.p0.y - slope * self.p0.x
+        impl = f"lambda x: {slope} * x + {y_intercept}"
         return impl
 
     @property
@@ -129,7 +137,8 @@ def float_to_str(val, max_len=10):
     if val is None:
         return "None"
 
-    a, _ = str(val).split(".")
+    # str(val) has no "." in scientific notation
+    a = str(val).split(".")[0]
     # if rounding to max_len digits looses too much precision
     if val < 0:
         rounded = round(val, max_len - len(a) - 2)
@@ -0,0 +1,27 @@
+import os
+import sys
+import tracemalloc
+
+import pytest
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from benchmarks.bench_allocations import BUDGETS_KIB, RETAINED_BUDGET, cases, measure
+from benchmarks.bench_drawing_panel import make_panel
+
+NUM_EVENTS = 100
+
+
+@pytest.fixture(scope="module", params=[10, 1_000, 10_000])
+def panel(request):
+    # traced from the start, otherwise replacing memory allocated before tracing would count as retained
+    tracemalloc.start()
+    yield make_panel(request.param)
+    tracemalloc.stop()
+
+
+@pytest.mark.parametrize("name", list(BUDGETS_KIB))
+def test_within_budget(panel, name):
+    result = measure(cases(panel)[name], panel, NUM_EVENTS)
+    assert result["peak_kib"] <= BUDGETS_KIB[name][panel.num_points]
+    assert result["retained_bytes_per_event"] <= RETAINED_BUDGET
@@ -0,0 +1,66 @@
+import importlib
+import os
+import pkgutil
+import sys
+import tempfile
+
+import numpy as np
+import pytest
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from benchmarks.bench_batch_evaluation import random_table
+from benchmarks.bench_exporters import SPECS, check, check_values, load
+import function_exporters
+from function_exporters.CompiledFunctionCache import CompiledFunctionCache
+from function_exporters.FunctionExporter import FunctionExporter
+from function_exporters.FunctionExporterPyLUT import FunctionExporterPyLUT
+from SegmentTable import SegmentTable
+
+# every module in function_exporters, the app imports the same ones
+for module in pkgutil.iter_modules(function_exporters.__path__):
+    importlib.import_module(f"function_exporters.{module.name}")
+EXPORTERS = FunctionExporter.__subclasses__()
+
+
+@pytest.mark.parametrize("exporter", EXPORTERS, ids=lambda e: e.name())
+def test_every_exporter_has_a_spec(exporter):
+    assert exporter.name() in SPECS
+
+
+@pytest.mark.parametrize("num_segments", [1, 2, 10, 100, 1_000])
+@pytest.mark.parametrize("exporter", [e for e in EXPORTERS if e.name() in SPECS], ids=lambda e: e.name())
+def test_matches_reference(exporter, num_segments):
+    spec = SPECS[exporter.name()]
+    rng = np.random.default_rng(num_segments)
+    table = random_table(num_segments, rng)
+    if spec.computes == "inverse":
+        # strictly increasing
+        ys = np.cumsum(rng.uniform(0.01, 1, num_segments + 1))
+        table = SegmentTable.from_points(table.breakpoints, ys)
+    with tempfile.TemporaryDirectory(ignore_cleanup_errors=True) as directory:
+        fn, array_fn, _, _ = load(exporter, table, directory)
+        deviation, tolerance = check(spec, fn, array_fn, table, check_values(table, 1000, rng))
+    assert deviation <= tolerance
+
+
+@pytest.mark.parametrize("exporter", [e for e in EXPORTERS if e.name() in SPECS], ids=lambda e: e.name())
+def test_scalar_gives_float(exporter):
+    table = SegmentTable.from_points(np.array([0., 1., 2.]), np.array([0., 1., 3.]))
+    with tempfile.TemporaryDirectory(ignore_cleanup_errors=True) as directory:
+        fn, _, _, _ = load(exporter, table, directory)
+        assert all(isinstance(fn(x), float) for x in (-1., 0.5, 1., 1.5, 3.))
+
+
+@pytest.mark.parametrize("exporter", [e for e in EXPORTERS if "LUT" in e.name()], ids=lambda e: e.name())
+def test_lut_options(exporter):
+    table = random_table(100, np.random.default_rng(0))
+    cache = CompiledFunctionCache()
+    coarse = exporter.compiled(table, cache=cache, num_samples=16)
+    fine = exporter.compiled(table, cache=cache)
+    xs = np.linspace(table.breakpoints[0], table.breakpoints[-1], 1000)
+    deviation = max(abs(coarse(x) - y) for x, y in zip(xs.tolist(), table.evaluate_array(xs).tolist()))
+    assert deviation == pytest.approx(exporter.error(table, num_samples=16), rel=0.1)
+    assert exporter.error(table, num_samples=16) > exporter.error(table) == FunctionExporterPyLUT.error(table)
+    assert coarse is not fine and cache.export(exporter, table, "f") != cache.export(exporter, table, "f",
+                                                                                       num_samples=16)
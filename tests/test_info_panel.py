@@ -0,0 +1,28 @@
+import os
+import sys
+
+import pytest
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from benchmarks.bench_drawing_panel import make_panel
+from benchmarks.StubInfoPanel import StubInfoPanel
+from misc import CanvasCoord
+
+
+def test_fx_on_quadratic_tail():
+    panel = make_panel(5)
+    panel.layer.extrapolate_left = 3
+    # brings the leftmost point into view, so the tail left of it is drawn
+    panel.pan(300, 0)
+    panel.redraw_canvas()
+    info_panel = StubInfoPanel(panel)
+    # the middle of the leftmost pixel column of the tail, far from the points
+    cac0, cac1 = panel.get_extrapolate()[0]
+    cac = CanvasCoord((cac0.x + cac1.x) / 2, (cac0.y + cac1.y) / 2)
+    info_panel.update_loc_label(cac.x, cac.y)
+    loc = panel.to_local_coords(cac)
+    fx = float(info_panel.texts[info_panel.val_fx])
+    assert fx == pytest.approx(loc.y, abs=1e-3)
+    # the outer segment of the table runs elsewhere, so it would give a different f(x)
+    assert abs(panel.segment_table.evaluate(loc.x) - loc.y) > 1e-2
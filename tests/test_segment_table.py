@@ -0,0 +1,23 @@
+import os
+import sys
+
+import numpy as np
+import pytest
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from SegmentTable import SegmentTable
+
+
+@pytest.mark.parametrize("num_points", [0, 1, 2, 3, 4, 5, 50])
+def test_simplified_does_not_alias(num_points):
+    xs = np.arange(float(num_points))
+    table = SegmentTable.from_points(xs, np.sin(xs))
+    simplified, _ = table.simplified(0.)
+    before = [simplified.breakpoints.copy(), simplified.slopes.copy(), simplified.intercepts.copy()]
+    assert simplified is not table
+    if num_points > 0:
+        # an edit on the live table, like dragging a point
+        table.move_breakpoint(num_points // 2, xs[num_points // 2], 10.)
+    assert all(np.array_equal(a, b) for a, b in zip(before, [simplified.breakpoints, simplified.slopes,
+                                                             simplified.intercepts]))
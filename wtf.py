@@ -1,12 +1,51 @@
+import argparse
+import sys
 import tkinter as tk
+from typing import Callable, Dict, Tuple
+
 from DrawingPanel import DrawingPanel
+from EventLog import EventLog
 from InfoPanel import InfoPanel
+from PerfMonitor import PerfMonitor
+from misc import Line, Point
+from function_exporters.CompiledFunctionCache import CompiledFunctionCache
+from SessionJournal import SessionJournal
+from StreamSource import StreamSource
+from StreamView import StreamView
+from TraceRecorder import TraceRecorder
 from UIStyle import UIStyle
 
-if __name__ == '__main__':
-    root = tk.Tk()
-    root.title("What the Function")
 
+def canvas_bindings(drawing_panel: DrawingPanel, info_panel: InfoPanel) -> Dict[str, Callable]:
+    # sequence -> handler of the drawing canvas, also used to replay recorded events
+    def on_button1_move(event):
+        drawing_panel.on_button1_move(event)
+        info_panel.on_motion(event)
+
+    def on_motion(event):
+        info_panel.on_motion(event)
+
+    def on_zoom(event):
+        drawing_panel.zoom(event)
+        info_panel.on_motion(event)
+
+    return {**drawing_panel.bindings, "<B1-Motion>": on_button1_move, "<Motion>": on_motion,
+            "<MouseWheel>": on_zoom}
+
+
+def root_bindings(drawing_panel: DrawingPanel, info_panel: InfoPanel) -> Dict[str, Callable]:
+    def on_undo(event):
+        drawing_panel.undo()
+        info_panel.on_motion(event)
+
+    def on_redo(event):
+        drawing_panel.redo()
+        info_panel.on_motion(event)
+
+    return {"<Control-z>": on_undo, "<Control-y>": on_redo, "<Control-Z>": on_redo}
+
+
+def create_app(root: tk.Tk) -> Tuple[DrawingPanel, InfoPanel, PerfMonitor]:
     main_frame = tk.Frame(root)
     main_frame.pack(fill=tk.BOTH, expand=True)
 
@@ -23,25 +62,97 @@ if __name__ == '__main__':
     drawing_canvas.grid(row=0, column=1, sticky=tk.N + tk.S + tk.E + tk.W)
     drawing_panel = DrawingPanel(drawing_canvas, UIStyle())
 
+    # disabled until F3 is pressed
+    perf_monitor = PerfMonitor()
+    perf_monitor.add_methods(drawing_panel, [name for name in dir(DrawingPanel) if name.startswith("redraw_")] + [
+        "update_lines"], category="redraw")
+    perf_monitor.add_methods(drawing_panel, ["get_extrapolate"], category="fit")
+    perf_monitor.set_layers(drawing_canvas, {"grid": drawing_panel.grid_tag, "axes": drawing_panel.axes_tag,
+                                             "numbers": drawing_panel.numbers_tag, "points": Point.tag(),
+                                             "lines": Line.tag(), "extrapolate": drawing_panel.extrapolate_tag})
+
     info_panel_canvas = tk.Canvas(master=main_frame, highlightthickness=0)
-    info_panel = InfoPanel(info_panel_canvas, drawing_panel, UIStyle())
+    info_panel = InfoPanel(info_panel_canvas, drawing_panel, UIStyle(), perf_monitor)
+    perf_monitor.add_methods(info_panel, ["update_loc_label"])
+    # exports go through the cache, so cached ones, which skip to_function, are timed as well
+    CompiledFunctionCache.default().observer = lambda exporter, call, start, end, args: perf_monitor.record_span(
+        f"{exporter.name()}.{call}", "export", start, end, args)
     info_panel_canvas.grid(row=0, column=0, sticky=tk.N + tk.S)
 
     # combined binds
-    def on_button1_move(event):
-        drawing_panel.on_button1_move(event)
-        info_panel.on_motion(event)
+    for sequence, func in canvas_bindings(drawing_panel, info_panel).items():
+        perf_monitor.add_binding(drawing_canvas, sequence, func)
+    for sequence, func in root_bindings(drawing_panel, info_panel).items():
+        perf_monitor.add_binding(root, sequence, func)
+    root.bind("<F3>", info_panel.toggle_perf_monitor)
+    return drawing_panel, info_panel, perf_monitor
 
-    def on_motion(event):
-        info_panel.on_motion(event)
 
-    def on_zoom(event):
-        drawing_panel.zoom(event)
-        info_panel.on_motion(event)
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser(description="What the Function")
+    parser.add_argument("session", nargs="?", default=None,
+                        help="directory to restore the points from and to record every edit to")
+    parser.add_argument("--trace", default=None,
+                        help="record a Chrome trace of the session to this file, F4 writes it before closing")
+    parser.add_argument("--record", default=None,
+                        help="F5 starts and stops recording the input events to this file for benchmarks/replay.py")
+    parser.add_argument("--plot", default=None,
+                        help="F6 writes the view to this file as SVG, or as PostScript if it ends in .ps or .eps")
+    parser.add_argument("--stream", default=None,
+                        help="draw live samples (lines of 'x y' or 'y') read from this file, pipe or - for stdin")
+    parser.add_argument("--stream-window", type=float, default=10.,
+                        help="width of the x range of the stream that stays visible")
+    args = parser.parse_args()
+
+    root = tk.Tk()
+    root.title("What the Function")
+    drawing_panel, info_panel, perf_monitor = create_app(root)
+
+    if args.trace is not None:
+        perf_monitor.trace = TraceRecorder()
+        perf_monitor.trace.args = lambda: {"points": drawing_panel.num_points}
+        perf_monitor.trace.counters = perf_monitor.item_counts
+        perf_monitor.enable("trace")
+        root.bind("<F4>", lambda _: perf_monitor.trace.write(args.trace))
+
+    def stop_recording():
+        perf_monitor.events.write(args.record)
+        perf_monitor.events = None
+        perf_monitor.disable("record")
+
+    def on_record(_):
+        if perf_monitor.events is None:
+            perf_monitor.events = EventLog.start(drawing_panel)
+            perf_monitor.enable("record")
+        else:
+            stop_recording()
+
+    if args.record is not None:
+        root.bind("<F5>", on_record)
+
+    if args.plot is not None:
+        root.bind("<F6>", lambda _: drawing_panel.plot_exporter().write(args.plot))
+
+    stream_view = None
+    if args.stream is not None:
+        source = StreamSource(sys.stdin) if args.stream == "-" else StreamSource(args.stream, follow=True)
+        stream_view = StreamView(drawing_panel, source, window=args.stream_window)
+        stream_view.start()
+
+    if args.session is not None:
+        drawing_panel.open_session(SessionJournal(args.session))
+
+    def on_close():
+        if stream_view is not None:
+            stream_view.stop()
+        drawing_panel.close_session()
+        if perf_monitor.trace is not None:
+            perf_monitor.trace.write(args.trace)
+        if perf_monitor.events is not None:
+            stop_recording()
+        root.destroy()
 
-    drawing_canvas.bind("<B1-Motion>", on_button1_move)
-    drawing_canvas.bind("<Motion>", on_motion)
-    drawing_canvas.bind("<MouseWheel>", on_zoom)
+    root.protocol("WM_DELETE_WINDOW", on_close)
 
     root.attributes("-alpha", 0)  # invisible
     drawing_panel.on_resize(None)